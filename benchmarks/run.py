@@ -0,0 +1,199 @@
+"""Measures how the wall time, peak memory and route quality of every solver path of `optimize` scale.
+
+Each run solves one instance with one solver in a fresh process, which reports its wall time, its peak resident set
+size and the route found. Instances are the TSPLIB EUC_2D files in ``benchmarks/instances`` (or ``--tsplib``) and
+random uniform and clustered instances of every ``--sizes``. The gap of a TSPLIB route is measured against the known
+optimum with TSPLIB's rounded distances, and the gap of a uniform route against the Beardwood-Halton-Hammersley
+estimate of the optimum, which is only accurate for large instances.
+
+Run from the root of the repository::
+
+    python benchmarks/run.py --sizes 100 1000 10000 --output results.json
+    python benchmarks/run.py --sizes 100 1000 10000 --baseline results.json
+
+With ``--baseline``, the script exits with status 1 if a run got slower, used more memory or found a longer route
+than in the baseline by more than ``--tolerance``.
+"""
+import argparse
+import json
+import logging
+import math
+import multiprocessing
+import os
+import resource
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+from tsp_hiram.loaders import read_tsplib
+from tsp_hiram.tsp import optimize
+
+# Options of `optimize` for each solver path and the largest instance each one is run on
+SOLVERS = {
+    'nearest_neighbors': (dict(use_nearest_neighbors=True, improve=False), 1000),
+    'nearest_neighbors_improved': (dict(use_nearest_neighbors=True), 1000),
+    'single_start_improved': (dict(use_nearest_neighbors=True, starting_node=0), 10000),
+    'hilbert': (dict(use_nearest_neighbors=True, construction='hilbert', matrix_free=True, improve=False), 10 ** 6),
+    'greedy_improved': (dict(use_nearest_neighbors=True, construction='greedy', matrix_free=True), 10 ** 5),
+    'matrix_free': (dict(use_nearest_neighbors=True, matrix_free=True, starting_node=0, improve=False), 10 ** 6),
+    'anytime': (dict(anytime=True, matrix_free=True), 10 ** 5),
+    'branch_and_cut': (dict(candidate_neighbors=8), 1000),
+    'orienteering': (dict(max_distance=None), 10 ** 5),
+    'decomposed': (dict(anytime=True, matrix_free=True, cell_size=1000, workers=None), 10 ** 6),
+}
+
+# Optimal route lengths of TSPLIB EUC_2D instances
+TSPLIB_OPTIMA = {
+    'a280': 2579, 'berlin52': 7542, 'bier127': 118282, 'ch130': 6110, 'ch150': 6528, 'd198': 15780, 'd493': 35002,
+    'd657': 48912, 'd1291': 50801, 'eil51': 426, 'eil76': 538, 'eil101': 629, 'fl417': 11861, 'kroA100': 21282,
+    'kroA150': 26524, 'kroA200': 29368, 'kroB100': 22141, 'kroC100': 20749, 'kroD100': 21294, 'kroE100': 22068,
+    'lin105': 14379, 'lin318': 42029, 'pcb442': 50778, 'pr76': 108159, 'pr107': 44303, 'pr124': 59030, 'pr136': 96772,
+    'pr144': 58537, 'pr152': 73682, 'pr226': 80369, 'pr264': 49135, 'pr299': 48191, 'pr439': 107217, 'pr1002': 259045,
+    'pr2392': 378032, 'rat99': 1211, 'rat195': 2323, 'rat575': 6773, 'rat783': 8806, 'rd100': 7910, 'rd400': 15281,
+    'st70': 675, 'ts225': 126643, 'tsp225': 3916, 'u159': 42080, 'u574': 36905, 'u724': 41910, 'u1060': 224094,
+}
+
+# Asymptotic ratio between the optimal route through n uniform random points and sqrt(n * area)
+BHH_CONSTANT = 0.7124
+
+# Number of points per cluster of the clustered instances
+CLUSTER_SIZE = 100
+
+# Columns of the printed table and their widths
+COLUMNS = {'instance': -16, 'n': 8, 'solver': -27, 'seconds': 9, 'peak_rss_mb': 12, 'distance': 11, 'visited': 8, 'gap': 8}
+
+
+def uniform_instance(n: int, seed: int = 0) -> np.ndarray:
+    """Points drawn uniformly in a square whose side grows with sqrt(n), so the nearest neighbors are ~100 apart."""
+    side = 100 * math.sqrt(n)
+    return np.random.default_rng(seed).uniform(0, side, size=(n, 2))
+
+
+def clustered_instance(n: int, seed: int = 0) -> np.ndarray:
+    """Points drawn normally around centers drawn uniformly, as in the clustered instances of the DIMACS challenge."""
+    rng = np.random.default_rng(seed)
+    side = 100 * math.sqrt(n)
+    centers = rng.uniform(0, side, size=(max(1, n // CLUSTER_SIZE), 2))
+    points = centers[rng.integers(0, len(centers), size=n)] + rng.normal(0, side / 10 / math.sqrt(len(centers)), size=(n, 2))
+    return np.clip(points, 0, side)
+
+
+def rounded_length(coordinates: np.ndarray, route) -> int:
+    """Length of the route with distances rounded to the nearest integer, like TSPLIB's EUC_2D."""
+    if not route:
+        return 0
+    edges = np.asarray(route)
+    delta = coordinates[edges[:, 0]] - coordinates[edges[:, 1]]
+    return int(np.floor(np.sqrt(np.einsum('ij,ij->i', delta, delta)) + 0.5).sum())
+
+
+def _measure(coordinates: np.ndarray, options: dict):
+    """Solves the instance in this process, returning the wall time, peak RSS in MiB and the route found."""
+    # keep the log and CBC's output from flooding the table
+    logging.disable(logging.INFO)
+    os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+    started = time.perf_counter()
+    route, distance = optimize(coordinates, **options)
+    seconds = time.perf_counter() - started
+    # kilobytes on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (2 ** 20 if sys.platform == 'darwin' else 2 ** 10)
+    return seconds, peak, route, int(distance)
+
+
+def run(name: str, coordinates: np.ndarray, solver: str, max_seconds: float, seed: int, optimum: float = None) -> dict:
+    """Runs one solver on one instance in a new process and returns its measurements."""
+    options, _ = SOLVERS[solver]
+    options = dict(options, max_seconds=max_seconds, seed=seed)
+    n = len(coordinates)
+    if 'max_distance' in options:
+        # a budget of half a route through every point of a uniform instance of the same area
+        low, high = coordinates.min(axis=0), coordinates.max(axis=0)
+        options['max_distance'] = int(BHH_CONSTANT * math.sqrt(n * np.prod(high - low)) / 2)
+
+    # spawned processes start from a clean heap, so their peak RSS is the one of the solve
+    with multiprocessing.get_context('spawn').Pool(1) as pool:
+        seconds, peak, route, distance = pool.apply(_measure, (coordinates, options))
+
+    result = dict(instance=name, n=n, solver=solver, seconds=round(seconds, 3), peak_rss_mb=round(peak, 1),
+                  distance=distance, visited=len({i for edge in route for i in edge}), gap=None)
+    if optimum is not None and 'max_distance' not in options:
+        result['gap'] = round(rounded_length(coordinates, route) / optimum - 1, 4)
+    return result
+
+
+def instances(sizes, tsplib: Path, seed: int):
+    """Yields the name, coordinates and optimal route length, or an estimate of it, of every instance."""
+    for path in sorted(tsplib.glob('*.tsp')):
+        yield path.stem, read_tsplib(path), TSPLIB_OPTIMA.get(path.stem)
+    for n in sizes:
+        coordinates = uniform_instance(n, seed)
+        yield f'uniform{n}', coordinates, BHH_CONSTANT * math.sqrt(n) * (100 * math.sqrt(n))
+        yield f'clustered{n}', clustered_instance(n, seed), None
+
+
+def regressions(results, baseline, tolerance: float):
+    """Returns a message for every result worse than the same run of the baseline by more than the tolerance."""
+    previous = {(result['instance'], result['solver']): result for result in baseline}
+    messages = []
+    for result in results:
+        before = previous.get((result['instance'], result['solver']))
+        if before is None:
+            continue
+        run_name = f"{result['solver']} on {result['instance']}"
+        # timings under half a second are mostly noise
+        if result['seconds'] > max(before['seconds'] * (1 + tolerance), before['seconds'] + 0.5):
+            messages.append(f"{run_name} took {result['seconds']}s instead of {before['seconds']}s")
+        if result['peak_rss_mb'] > before['peak_rss_mb'] * (1 + tolerance):
+            messages.append(f"{run_name} used {result['peak_rss_mb']} MiB instead of {before['peak_rss_mb']} MiB")
+        longer = result['distance'] > before['distance'] * (1 + tolerance)
+        if result['visited'] < before['visited'] or (result['visited'] == before['visited'] and longer):
+            messages.append(f"{run_name} found a route of {result['distance']} through {result['visited']} nodes "
+                            f"instead of {before['distance']} through {before['visited']}")
+    return messages
+
+
+def _align(width: int) -> str:
+    """Format spec of a column, negative widths being left aligned."""
+    return f'<{-width}' if width < 0 else f'>{width}'
+
+
+parser = argparse.ArgumentParser(description='Benchmark the solvers of tsp-hiram')
+parser.add_argument('--sizes', type=int, nargs='*', default=[100, 1000, 10000, 100000, 1000000],
+                    help='Numbers of points of the random instances')
+parser.add_argument('--solvers', nargs='*', choices=sorted(SOLVERS), default=sorted(SOLVERS), help='Solvers to run')
+parser.add_argument('--tsplib', type=Path, default=Path(__file__).parent / 'instances',
+                    help='Directory of the TSPLIB .tsp instances')
+parser.add_argument('--max-seconds', type=float, default=10, help='Time budget of branch and cut and the anytime search')
+parser.add_argument('--seed', type=int, default=0, help='Seed of the random instances and of the solvers')
+parser.add_argument('--output', type=Path, default=None, help='Write the results to this JSON file')
+parser.add_argument('--baseline', type=Path, default=None, help='Compare the results to this JSON file')
+parser.add_argument('--tolerance', type=float, default=0.2, help='Relative slowdown or growth reported as a regression')
+
+
+def main(args=None):
+    args = parser.parse_args(args)
+    print(' '.join(f'{column:{_align(width)}}' for column, width in COLUMNS.items()))
+    results = []
+    for name, coordinates, optimum in instances(args.sizes, args.tsplib, args.seed):
+        for solver in args.solvers:
+            if len(coordinates) > SOLVERS[solver][1]:
+                continue
+            result = run(name, coordinates, solver, args.max_seconds, args.seed, optimum)
+            results.append(result)
+            print(' '.join(f'{"-" if result[column] is None else result[column]!s:{_align(width)}}'
+                           for column, width in COLUMNS.items()), flush=True)
+
+    if args.output is not None:
+        args.output.write_text(json.dumps(results, indent=1))
+    if args.baseline is not None:
+        messages = regressions(results, json.loads(args.baseline.read_text()), args.tolerance)
+        for message in messages:
+            print(f'Regression: {message}')
+        return 1 if messages else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,132 @@
+import logging
+import random
+import time
+from typing import Callable, Iterator, Tuple
+
+from tsp_hiram.candidates import DEFAULT_K, CandidateGraph, knn_candidates, knn_candidates_from_matrix
+from tsp_hiram.local_search import MIN_GAIN, LocalSearch, distance_function
+from tsp_hiram.metrics import Metrics
+from tsp_hiram.tour import Tour
+
+logger = logging.getLogger(__name__)
+
+
+def improving_tours(tour: Tour, distance_matrix=None, coordinates=None, candidates: CandidateGraph = None,
+                    max_seconds: float = None, max_iterations: int = None,
+                    rng: random.Random = None, metrics: Metrics = None,
+                    target: float = None) -> Iterator[Tuple[Tour, int]]:
+    """Iterated local search yielding every new best route, starting with the local optimum reached from `tour`.
+
+    Each iteration kicks the current route with a double-bridge move, then repairs it with 2-opt and Or-opt moves
+    from the nodes around the kick only. The result is kept if it is not longer, and undone otherwise. The search
+    stops once a budget is exhausted, or when the caller stops iterating, so the best route so far is always at hand.
+
+    :param tour: The closed route to start from, such as returned from `nearest_neighbor_path`
+    :type tour: Tour
+    :param distance_matrix: Distance matrix such as returned from `compute_euclidean_distance_matrix`, or None to
+        compute truncated euclidean distances from `coordinates`, defaults to None
+    :type distance_matrix: Matrix, optional
+    :param coordinates: Coordinates of the nodes, only used when `distance_matrix` is None, defaults to None
+    :type coordinates: CoordinatesVector, optional
+    :param candidates: The neighbors each node may be moved next to, defaults to its DEFAULT_K nearest neighbors
+    :type candidates: CandidateGraph, optional
+    :param max_seconds: Wall-clock budget, defaults to None to run until the caller stops
+    :type max_seconds: float, optional
+    :param max_iterations: The maximum number of kicks, defaults to None
+    :type max_iterations: int, optional
+    :param rng: Random number generator choosing the kicks, defaults to the `random` module
+    :type rng: random.Random, optional
+    :param metrics: Counts the moves, the kicks and the new best routes, once the search stops, defaults to None
+    :type metrics: Metrics, optional
+    :param target: Stop once a route at most this long is found, e.g. one within a gap of a lower bound from
+        `tsp_hiram.bounds`, defaults to None
+    :type target: float, optional
+    :return: The successive best routes and their distances
+    :rtype: Iterator[Tuple[Tour, int]]
+    """
+    deadline = None if max_seconds is None else time.monotonic() + max_seconds
+    if rng is None:
+        rng = random
+
+    distance, n = distance_function(distance_matrix, coordinates)
+    if candidates is None:
+        if distance_matrix is None:
+            candidates = knn_candidates(coordinates, DEFAULT_K)
+        else:
+            candidates = knn_candidates_from_matrix(distance_matrix, DEFAULT_K)
+
+    search = LocalSearch(tour, distance, candidates)
+    moves = search.run(deadline=deadline)
+    best = search.cost
+    iteration = improvements = 0
+    try:
+        yield search.tour(), best
+
+        while max_iterations is None or iteration < max_iterations:
+            if deadline is not None and time.monotonic() >= deadline:
+                break
+            if target is not None and best <= target:
+                break
+            iteration += 1
+
+            search.checkpoint()
+            if not search.double_bridge(rng):
+                break
+            moves += search.run(deadline=deadline)
+
+            if search.cost > best + MIN_GAIN:
+                search.rollback()
+            elif search.cost < best - MIN_GAIN:
+                best = search.cost
+                improvements += 1
+                logger.debug(f'Iteration {iteration} found a route of length {best}.')
+                yield search.tour(), best
+    finally:
+        # also when the caller stops iterating
+        if metrics is not None:
+            metrics.count('moves', moves)
+            metrics.count('kicks', iteration)
+            metrics.count('improvements', improvements)
+
+
+def iterated_local_search(tour: Tour, distance_matrix=None, coordinates=None, candidates: CandidateGraph = None,
+                          max_seconds: float = 10, max_iterations: int = None, rng: random.Random = None,
+                          callback: Callable[[Tour, int], None] = None, metrics: Metrics = None,
+                          target: float = None) -> Tuple[Tour, int]:
+    """Improves a closed route with `improving_tours` until the time or iteration budget is exhausted.
+
+    :param tour: The closed route to start from, such as returned from `nearest_neighbor_path`
+    :type tour: Tour
+    :param distance_matrix: Distance matrix such as returned from `compute_euclidean_distance_matrix`, or None to
+        compute truncated euclidean distances from `coordinates`, defaults to None
+    :type distance_matrix: Matrix, optional
+    :param coordinates: Coordinates of the nodes, only used when `distance_matrix` is None, defaults to None
+    :type coordinates: CoordinatesVector, optional
+    :param candidates: The neighbors each node may be moved next to, defaults to its DEFAULT_K nearest neighbors
+    :type candidates: CandidateGraph, optional
+    :param max_seconds: Wall-clock budget, defaults to 10
+    :type max_seconds: float, optional
+    :param max_iterations: The maximum number of kicks, defaults to None
+    :type max_iterations: int, optional
+    :param rng: Random number generator choosing the kicks, defaults to the `random` module
+    :type rng: random.Random, optional
+    :param callback: Called with every new best route and its distance, defaults to None
+    :type callback: Callable[[Tour, int], None], optional
+    :param metrics: Counts the moves, the kicks and the new best routes, defaults to None
+    :type metrics: Metrics, optional
+    :param target: Stop once a route at most this long is found, which is the only stop without a budget, defaults to
+        None
+    :type target: float, optional
+    :return: The best route found, its distance
+    :rtype: Tuple[Tour, int]
+    """
+    assert max_seconds is not None or max_iterations is not None or target is not None, \
+        'A time or iteration budget or a target is required.'
+
+    best = None
+    for best in improving_tours(tour, distance_matrix, coordinates=coordinates, candidates=candidates,
+                                max_seconds=max_seconds, max_iterations=max_iterations, rng=rng, metrics=metrics,
+                                target=target):
+        if callback is not None:
+            callback(*best)
+    return best
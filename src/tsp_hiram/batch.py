@@ -0,0 +1,225 @@
+import multiprocessing
+import pickle
+import time
+from multiprocessing.connection import wait
+from typing import Iterable, Iterator, List, NamedTuple, Tuple
+
+from tsp_hiram.parallel import resolve_workers, spawn_seed
+
+# Extra time given to an instance past its time limit to return the best route found before its worker is killed
+KILL_GRACE_SECONDS = 5
+
+
+class BatchResult(NamedTuple):
+    """The outcome of one instance of a batch.
+
+    :param index: Position of the instance in the batch
+    :param route: The edges of the route as returned from `optimize`, or None if solving failed
+    :param distance: The distance of the route, or None if solving failed
+    :param error: The exception raised while solving the instance, or None
+    :param seconds: Wall-clock time spent on the instance
+    :param bound: Lower bound on the distance when solving with ``full_output=True``, see `OptimizeResult`, or None
+    :param gap: Relative gap between the distance and the bound, or None
+    """
+    index: int
+    route: List[Tuple[int, int]]
+    distance: int
+    error: BaseException
+    seconds: float
+    bound: float = None
+    gap: float = None
+
+
+def _serve(connection):
+    """Worker loop solving the instances sent over `connection` until it receives None."""
+    from tsp_hiram.tsp import optimize
+
+    while True:
+        task = connection.recv()
+        if task is None:
+            break
+        index, coordinates, options = task
+        try:
+            solution = optimize(coordinates, **options)
+            bound, gap = solution[2:] if options.get('full_output') else (None, None)
+            result = (index, solution[0], solution[1], None, bound, gap)
+        except Exception as e:
+            result = (index, None, None, e, None, None)
+
+        try:
+            connection.send(result)
+        except (pickle.PicklingError, TypeError, AttributeError) as e:
+            connection.send((index, None, None, RuntimeError(f'{result[3]!r} could not be sent back: {e}'), None, None))
+
+
+class _Worker:
+    """A worker process, the instance it is solving and when it must be done."""
+
+    __slots__ = ('process', 'connection', 'index', 'started', 'deadline')
+
+    def __init__(self, context):
+        self.connection, child = context.Pipe()
+        self.process = context.Process(target=_serve, args=(child,), daemon=True)
+        self.process.start()
+        child.close()
+        self.index = None
+        self.started = None
+        self.deadline = None
+
+    def submit(self, index: int, coordinates, options: dict, time_limit: float):
+        self.connection.send((index, coordinates, options))
+        self.index = index
+        self.started = time.monotonic()
+        self.deadline = None if time_limit is None else self.started + time_limit + KILL_GRACE_SECONDS
+
+    def result(self) -> BatchResult:
+        try:
+            index, route, distance, error, bound, gap = self.connection.recv()
+        except (EOFError, OSError):
+            self.process.join()
+            index, route, distance, bound, gap = self.index, None, None, None, None
+            error = RuntimeError(f'The worker solving instance {self.index} exited with code {self.process.exitcode}.')
+        result = BatchResult(index, route, distance, error, time.monotonic() - self.started, bound, gap)
+        self.index = self.started = self.deadline = None
+        return result
+
+    def kill(self):
+        self.process.kill()
+        self.process.join()
+        self.connection.close()
+
+    def stop(self):
+        try:
+            self.connection.send(None)
+        except OSError:
+            pass
+        self.process.join(1)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join()
+        self.connection.close()
+
+
+class BatchSolver:
+    """Pool of worker processes solving many independent instances with `optimize`.
+
+    The workers are started once and reused by every call to `solve`, so each instance only pays for its own solve.
+    Every worker runs one instance at a time: an instance raising an error is reported without affecting the others,
+    and a worker which crashes or runs past the time limit of its instance is killed and replaced.
+
+    :param workers: Number of worker processes, all available CPUs if None, defaults to None
+    :type workers: int, optional
+    """
+
+    def __init__(self, workers: int = None):
+        self.workers = resolve_workers(workers)
+        self._context = multiprocessing.get_context()
+        self._pool = []
+
+    def __enter__(self) -> 'BatchSolver':
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def solve(self, instances: Iterable, time_limit: float = None, seed: int = None, **options) -> Iterator[BatchResult]:
+        """Solves every instance and yields the results as they finish, in completion order.
+
+        Instances are read from `instances` only as workers become free, so it may be a long-running generator.
+        Stopping the iteration early kills the workers still solving an instance.
+
+        :param instances: The coordinates of each instance
+        :type instances: Iterable[CoordinatesVector]
+        :param time_limit: Seconds each instance may take, given to `optimize` as `max_seconds`. Workers still running
+            KILL_GRACE_SECONDS later are killed and the instance fails with a TimeoutError, defaults to None
+        :type time_limit: float, optional
+        :param seed: Seed of the batch, each instance being solved with its own seed derived from it and its index, so
+            the results don't depend on the number of workers or the order instances finish in, defaults to None
+        :type seed: int, optional
+        :param options: Keyword arguments of `optimize`, the same for every instance
+        :return: The result of every instance
+        :rtype: Iterator[BatchResult]
+        """
+        if time_limit is not None:
+            options = dict(options, max_seconds=time_limit)
+        while len(self._pool) < self.workers:
+            self._pool.append(_Worker(self._context))
+
+        pending = enumerate(instances)
+        exhausted = False
+        try:
+            while True:
+                for worker in self._pool:
+                    # an instance failing to submit leaves the worker free for the next one
+                    while worker.index is None and not exhausted:
+                        task = next(pending, None)
+                        if task is None:
+                            exhausted = True
+                            break
+                        index, coordinates = task
+                        instance_options = options if seed is None else dict(options, seed=spawn_seed(seed, index))
+                        try:
+                            worker.submit(index, coordinates, instance_options, time_limit)
+                        except (pickle.PicklingError, TypeError, AttributeError) as e:
+                            yield BatchResult(index, None, None, e, 0.)
+
+                busy = [worker for worker in self._pool if worker.index is not None]
+                if exhausted and not busy:
+                    break
+
+                deadlines = [worker.deadline for worker in busy if worker.deadline is not None]
+                timeout = max(min(deadlines) - time.monotonic(), 0) if deadlines else None
+                ready = wait([worker.connection for worker in busy], timeout)
+
+                for worker in busy:
+                    if worker.connection in ready:
+                        result = worker.result()
+                        if result.error is not None and not worker.process.is_alive():
+                            self._replace(worker)
+                        yield result
+                    elif worker.deadline is not None and time.monotonic() >= worker.deadline:
+                        index, seconds = worker.index, time.monotonic() - worker.started
+                        self._replace(worker)
+                        yield BatchResult(index, None, None, TimeoutError(f'Instance {index} ran for {seconds:.1f}s.'),
+                                          seconds)
+        finally:
+            # workers still solving an abandoned instance would send its result to the next call
+            for worker in list(self._pool):
+                if worker.index is not None:
+                    self._replace(worker)
+
+    def _replace(self, worker: _Worker):
+        worker.kill()
+        self._pool[self._pool.index(worker)] = _Worker(self._context)
+
+    def close(self):
+        """Stops the worker processes."""
+        for worker in self._pool:
+            if worker.index is None:
+                worker.stop()
+            else:
+                worker.kill()
+        self._pool = []
+
+
+def optimize_many(instances: Iterable, workers: int = None, time_limit: float = None, seed: int = None,
+                  **options) -> Iterator[BatchResult]:
+    """Solves many independent instances with `optimize` in a pool of worker processes.
+
+    The pool is shut down once every result has been yielded or the iteration is stopped. Use a `BatchSolver` to keep
+    the pool across several batches.
+
+    :param instances: The coordinates of each instance
+    :type instances: Iterable[CoordinatesVector]
+    :param workers: Number of worker processes, all available CPUs if None, defaults to None
+    :type workers: int, optional
+    :param time_limit: Seconds each instance may take, see `BatchSolver.solve`, defaults to None
+    :type time_limit: float, optional
+    :param seed: Seed of the batch, see `BatchSolver.solve`, defaults to None
+    :type seed: int, optional
+    :param options: Keyword arguments of `optimize`, the same for every instance
+    :return: The result of every instance, in completion order
+    :rtype: Iterator[BatchResult]
+    """
+    with BatchSolver(workers) as solver:
+        yield from solver.solve(instances, time_limit=time_limit, seed=seed, **options)
@@ -0,0 +1,181 @@
+import hashlib
+import os
+from typing import Iterator, Tuple
+
+import numpy as np
+
+from tsp_hiram.candidates import DEFAULT_K, CandidateGraph, knn_candidates
+from tsp_hiram.distance import distance_matrix
+
+# Default bound on the total size of the cached files, in bytes
+DEFAULT_MAX_BYTES = 4 * 2 ** 30
+
+_SUFFIX = '.npy'
+
+
+class DistanceCache:
+    """Persistent cache of distance matrices and candidate graphs, stored as ``.npy`` files in a directory.
+
+    Entries are keyed by a hash of the coordinates and of the metric they were computed with, and are memory mapped
+    read-only when found, so repeated solves of the same points skip building the matrix and every process using the
+    cache shares the same pages. Files are written under a temporary name and moved in place, so processes filling
+    the cache at the same time never see a partial entry. Once the files exceed `max_bytes`, the least recently used
+    ones are deleted.
+
+    :param directory: The directory holding the cached files, created if missing
+    :type directory: str or os.PathLike
+    :param max_bytes: Bound on the total size of the cached files, defaults to DEFAULT_MAX_BYTES
+    :type max_bytes: int, optional
+    """
+
+    def __init__(self, directory, max_bytes: int = DEFAULT_MAX_BYTES):
+        assert max_bytes >= 0, 'max_bytes must not be negative.'
+        self.directory = os.fspath(directory)
+        self.max_bytes = max_bytes
+        os.makedirs(self.directory, exist_ok=True)
+
+    @staticmethod
+    def key(coordinates, metric: str, **params) -> str:
+        """Returns the hex digest identifying the entry computed from the coordinates with the given metric.
+
+        :param coordinates: A sequence or array of 2D coordinates
+        :type coordinates: CoordinatesVector or np.ndarray
+        :param metric: Name of what is computed from the coordinates
+        :type metric: str
+        :rtype: str
+        """
+        points = np.ascontiguousarray(coordinates, dtype=np.float64).reshape(-1, 2)
+        digest = hashlib.sha256()
+        digest.update(repr((metric, sorted(params.items()), points.shape)).encode())
+        digest.update(points.tobytes())
+        return digest.hexdigest()
+
+    def path(self, key: str) -> str:
+        """Returns the file holding the entry of `key`."""
+        return os.path.join(self.directory, key + _SUFFIX)
+
+    def get(self, key: str) -> np.ndarray:
+        """Memory maps the entry of `key` read-only and marks it as recently used.
+
+        :param key: The key returned by `key`
+        :type key: str
+        :return: The cached array, or None if it is not in the cache
+        :rtype: np.ndarray
+        """
+        path = self.path(key)
+        try:
+            array = np.load(path, mmap_mode='r')
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return array
+
+    def put(self, key: str, array: np.ndarray) -> np.ndarray:
+        """Stores the entry of `key`, then evicts the least recently used entries above `max_bytes`.
+
+        :param key: The key returned by `key`
+        :type key: str
+        :param array: The array to store
+        :type array: np.ndarray
+        :return: The stored array, memory mapped read-only
+        :rtype: np.ndarray
+        """
+        path = self.path(key)
+        temporary = f'{path}.{os.getpid()}.tmp'
+        try:
+            with open(temporary, 'wb') as f:
+                np.save(f, np.ascontiguousarray(array))
+            os.replace(temporary, path)
+        finally:
+            if os.path.exists(temporary):
+                os.remove(temporary)
+
+        self.evict(keep=path)
+        return np.load(path, mmap_mode='r')
+
+    def distance_matrix(self, coordinates, dtype=None, truncate: bool = True, metric: str = 'euclidean') -> np.ndarray:
+        """Returns the distance matrix of the coordinates, computing and storing it if it is not cached.
+
+        :param coordinates: A sequence or array of 2D coordinates
+        :type coordinates: CoordinatesVector or np.ndarray
+        :param dtype: dtype of the matrix, defaults to int32 when truncating and float64 otherwise
+        :type dtype: np.dtype, optional
+        :param truncate: Truncate distances to integers, defaults to True
+        :type truncate: bool, optional
+        :param metric: The name of a metric of `tsp_hiram.distance.METRICS`, defaults to 'euclidean'
+        :type metric: str, optional
+        :return: The read-only matrix, see `tsp_hiram.distance.distance_matrix`
+        :rtype: np.ndarray
+        """
+        if dtype is None:
+            dtype = np.int32 if truncate else np.float64
+        key = self.key(coordinates, metric, dtype=np.dtype(dtype).str, truncate=truncate)
+        matrix = self.get(key)
+        if matrix is None:
+            matrix = self.put(key, distance_matrix(coordinates, metric, dtype=dtype, truncate=truncate))
+        return matrix
+
+    def knn_candidates(self, coordinates, k: int = DEFAULT_K) -> CandidateGraph:
+        """Returns the candidate graph of the k nearest neighbors of every coordinate, computing and storing it if it
+        is not cached.
+
+        :param coordinates: A sequence or array of 2D coordinates
+        :type coordinates: CoordinatesVector or np.ndarray
+        :param k: The number of nearest neighbors of each node, defaults to DEFAULT_K
+        :type k: int, optional
+        :return: The candidate graph, see `knn_candidates`
+        :rtype: CandidateGraph
+        """
+        key = self.key(coordinates, 'knn', k=k)
+        neighbors = self.get(key)
+        if neighbors is None:
+            graph = knn_candidates(coordinates, k)
+            n = len(graph)
+            neighbors = self.put(key, graph.indices.reshape(n, len(graph.neighbors(0)) if n else 0))
+        return CandidateGraph.from_neighbors(neighbors)
+
+    def _entries(self) -> Iterator[Tuple[float, int, str]]:
+        """Yields the last use time, size and path of every cached file."""
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(_SUFFIX):
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                yield stat.st_mtime, stat.st_size, entry.path
+
+    def size(self) -> int:
+        """Returns the total size of the cached files in bytes."""
+        return sum(size for _, size, _ in self._entries())
+
+    def evict(self, keep: str = None):
+        """Deletes the least recently used files until the cache fits in `max_bytes`.
+
+        Processes which mapped a deleted file keep reading it until they release it.
+
+        :param keep: A file which is never deleted, such as the one just stored, defaults to None
+        :type keep: str, optional
+        """
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            except OSError:
+                # still mapped on platforms which forbid deleting it
+                continue
+            total -= size
+
+    def clear(self):
+        """Deletes every cached file."""
+        for _, _, path in list(self._entries()):
+            try:
+                os.remove(path)
+            except OSError:
+                continue
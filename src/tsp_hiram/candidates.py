@@ -0,0 +1,143 @@
+import numpy as np
+
+from tsp_hiram.spatial import GridIndex
+
+# Default number of nearest neighbors kept as candidates of each node
+DEFAULT_K = 10
+
+
+class CandidateGraph:
+    """Sparse set of candidate edges, stored as CSR arrays.
+
+    The candidates of node ``i`` are ``indices[indptr[i]:indptr[i + 1]]``, sorted by increasing distance. Solvers
+    only consider edges between a node and its candidates, which is what lets them scale past a few hundred nodes.
+
+    :param indptr: Offsets of each node's candidates in `indices`, of length n + 1
+    :type indptr: np.ndarray
+    :param indices: The candidates of all nodes, one node after another
+    :type indices: np.ndarray
+    """
+
+    __slots__ = ('indptr', 'indices')
+
+    def __init__(self, indptr, indices):
+        self.indptr = np.ascontiguousarray(indptr, dtype=np.int64)
+        self.indices = np.ascontiguousarray(indices, dtype=np.int32)
+
+    @classmethod
+    def from_neighbors(cls, neighbors: np.ndarray) -> 'CandidateGraph':
+        """Creates the graph from an (n, k) array holding the k candidates of each node."""
+        neighbors = np.asarray(neighbors)
+        n, k = neighbors.shape
+        return cls(np.arange(n + 1) * k, neighbors.ravel())
+
+    def __len__(self):
+        """Number of nodes."""
+        return len(self.indptr) - 1
+
+    def neighbors(self, i: int) -> np.ndarray:
+        """Returns the candidates of node ``i``, nearest first."""
+        return self.indices[self.indptr[i]:self.indptr[i + 1]]
+
+    def edges(self) -> np.ndarray:
+        """Returns the undirected candidate edges as an (m, 2) array of unique (i, j) pairs with i < j."""
+        from_nodes = np.repeat(np.arange(len(self), dtype=np.int32), np.diff(self.indptr))
+        pairs = np.stack([np.minimum(from_nodes, self.indices), np.maximum(from_nodes, self.indices)], axis=1)
+        pairs = pairs[pairs[:, 0] != pairs[:, 1]]
+        return np.unique(pairs, axis=0)
+
+    def with_edges(self, edges, distance_matrix) -> 'CandidateGraph':
+        """Returns a graph which also has the given undirected edges, each node's candidates sorted by distance.
+
+        :param edges: (i, j) edges to add in both directions
+        :type edges: Sequence[Tuple[int, int]]
+        :param distance_matrix: Distance matrix used to sort the candidates
+        :type distance_matrix: Matrix
+        :rtype: CandidateGraph
+        """
+        distance_matrix = np.asarray(distance_matrix)
+        pairs = self._pairs_with(edges)
+        return _from_pairs(pairs, distance_matrix[pairs[:, 0], pairs[:, 1]], len(self))
+
+    def _pairs_with(self, edges) -> np.ndarray:
+        """Returns the unique directed (i, j) candidate pairs plus both directions of the given edges."""
+        edges = np.asarray(edges, dtype=np.int64).reshape(-1, 2)
+        from_nodes = np.concatenate([np.repeat(np.arange(len(self)), np.diff(self.indptr)), edges[:, 0], edges[:, 1]])
+        to_nodes = np.concatenate([self.indices, edges[:, 1], edges[:, 0]])
+        keep = from_nodes != to_nodes
+        return np.unique(np.stack([from_nodes[keep], to_nodes[keep]], axis=1), axis=0)
+
+
+def _from_pairs(pairs: np.ndarray, lengths: np.ndarray, n: int) -> CandidateGraph:
+    """Builds the graph from directed (i, j) pairs, sorting each node's candidates by length then index."""
+    order = np.lexsort((pairs[:, 1], lengths, pairs[:, 0]))
+    pairs = pairs[order]
+    return CandidateGraph(np.searchsorted(pairs[:, 0], np.arange(n + 1)), pairs[:, 1])
+
+
+def edge_candidates(edges, distance_matrix) -> CandidateGraph:
+    """Builds the candidate graph of the given edges, such as the allowed edges of a sparse distance matrix.
+
+    :param edges: (i, j) edges, each added in both directions
+    :type edges: Sequence[Tuple[int, int]]
+    :param distance_matrix: Distance matrix used to sort the candidates
+    :type distance_matrix: Matrix
+    :return: The candidate graph, each node's candidates sorted by distance
+    :rtype: CandidateGraph
+    """
+    empty = CandidateGraph(np.zeros(len(distance_matrix) + 1), np.empty(0))
+    return empty.with_edges(edges, distance_matrix)
+
+
+def knn_candidates(coordinates, k: int = DEFAULT_K, delaunay: bool = False) -> CandidateGraph:
+    """Builds the candidate graph of the k nearest neighbors of every coordinate with a `GridIndex`.
+
+    :param coordinates: A sequence or array of 2D coordinates
+    :type coordinates: CoordinatesVector or np.ndarray
+    :param k: The number of nearest neighbors of each node, defaults to DEFAULT_K
+    :type k: int, optional
+    :param delaunay: Also add the edges of the Delaunay triangulation, which requires scipy, defaults to False
+    :type delaunay: bool, optional
+    :return: The candidate graph, each node's candidates sorted by distance
+    :rtype: CandidateGraph
+    """
+    points = np.asarray(coordinates, dtype=np.float64).reshape(-1, 2)
+    neighbors, _ = GridIndex(points).k_nearest(k)
+    graph = CandidateGraph.from_neighbors(neighbors)
+    if not delaunay or len(points) < 3:
+        return graph
+
+    try:
+        from scipy.spatial import Delaunay
+    except ImportError as e:
+        raise ImportError('Delaunay candidates require scipy, install tsp-hiram[delaunay].') from e
+
+    simplices = Delaunay(points).simplices
+    pairs = graph._pairs_with(np.concatenate([simplices[:, [0, 1]], simplices[:, [1, 2]], simplices[:, [0, 2]]]))
+    lengths = np.hypot(*(points[pairs[:, 0]] - points[pairs[:, 1]]).T)
+    return _from_pairs(pairs, lengths, len(points))
+
+
+def knn_candidates_from_matrix(distance_matrix, k: int = DEFAULT_K, block_size: int = 1024) -> CandidateGraph:
+    """Builds the candidate graph of the k nearest neighbors of every node from a distance matrix.
+
+    :param distance_matrix: Distance matrix such as returned from `compute_euclidean_distance_matrix`
+    :type distance_matrix: Matrix
+    :param k: The number of nearest neighbors of each node, defaults to DEFAULT_K
+    :type k: int, optional
+    :param block_size: Number of rows processed at once, defaults to 1024
+    :type block_size: int, optional
+    :return: The candidate graph, each node's candidates sorted by distance then index
+    :rtype: CandidateGraph
+    """
+    distance_matrix = np.asarray(distance_matrix)
+    n = len(distance_matrix)
+    k = max(min(k, n - 1), 0)
+    neighbors = np.empty((n, k), dtype=np.int32)
+    for start in range(0, n, block_size):
+        stop = min(start + block_size, n)
+        rows = np.arange(start, stop)
+        block = distance_matrix[start:stop].astype(np.float64)
+        block[rows - start, rows] = np.inf
+        neighbors[start:stop] = np.argsort(block, axis=1, kind='stable')[:, :k]
+    return CandidateGraph.from_neighbors(neighbors)
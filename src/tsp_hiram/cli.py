@@ -1,25 +1,81 @@
 import argparse
-import csv
+import logging
+import sys
 
 from tsp_hiram import tsp
+from tsp_hiram.cache import DistanceCache
+from tsp_hiram.construct import CONSTRUCTIONS
+from tsp_hiram.distance import METRICS
+from tsp_hiram.loaders import load_coordinates
+from tsp_hiram.metrics import Metrics
 
 parser = argparse.ArgumentParser(description='Solve Traveling Salesman Problem given a list of coordinates')
-parser.add_argument('filename', metavar='FILENAME', type=str, help="File containing the coordinates.")
+parser.add_argument('filename', metavar='FILENAME', type=str, help="CSV, .npy or binary file containing the coordinates.")
 parser.add_argument('--max', type=int, default=None, help='Max distance of the route')
 parser.add_argument('--closed', type=bool, default=False, help='Whether a constrained solutions should be an open or closed loop')
+parser.add_argument('--max-seconds', type=float, default=20, help='Time budget of the solver in seconds')
+parser.add_argument('--anytime', action='store_true',
+                    help='Improve a quick route until the time budget is exhausted instead of searching for the optimal one')
+parser.add_argument('--cache-dir', type=str, default=None,
+                    help='Directory caching the distance matrices of the coordinates between runs')
+parser.add_argument('--metric', choices=sorted(METRICS), default='euclidean',
+                    help='Distance between the coordinates, haversine taking (latitude, longitude) in degrees and measuring meters')
+parser.add_argument('--max-gap', type=float, default=None,
+                    help='Stop once the route is within this fraction of a lower bound on the optimal distance, and report the gap')
+parser.add_argument('--construction', choices=CONSTRUCTIONS, default='nearest_neighbors',
+                    help='Heuristic building the first route, improved by local search or used to start branch and cut')
+parser.add_argument('--cell-size', type=int, default=None,
+                    help='Solve cells of at most this many points on their own and join their routes, for very large inputs')
+parser.add_argument('--workers', type=int, default=1, help='Number of solver processes, 0 for all CPUs')
+parser.add_argument('--seed', type=int, default=None, help='Seed of the random choices, to get the same route on every run')
+parser.add_argument('-v', '--verbose', action='store_true', help='Log the progress of the solver and the time spent in each phase')
+
+serve_parser = argparse.ArgumentParser(prog='tsp-hiram serve', description='Solve JSON requests posted to a local HTTP endpoint')
+serve_parser.add_argument('--host', type=str, default='127.0.0.1', help='Interface to listen on')
+serve_parser.add_argument('--port', type=int, default=8000, help='Port to listen on')
+serve_parser.add_argument('--workers', type=int, default=None, help='Number of solver processes, defaults to all CPUs')
+serve_parser.add_argument('--max-pending', type=int, default=None,
+                          help='Number of requests accepted at once before new ones are rejected, defaults to 64')
 
 
 def main(args=None):
-    args = parser.parse_args(args=args)
-    with open(args.filename, newline='') as csvfile:
-        reader = csv.reader(csvfile, delimiter=',')
-        # TODO: More robust handling of csvreader. Currently just drops first row as header and makes a lot of assumptions
-        coordinates = [(int(x), int(y)) for [x, y] in [row for row in reader][1:]]
-        route, distance = tsp.optimize(coordinates, max_distance=args.max, closed=args.closed)
-
-        if args.max is not None:
-            print(f'{len(route)} nodes could be touched with max distance of {args.max}')
-        else:
-            print(f'Solution with distance of {distance} found: {route}')
-
-        return route, distance
+    argv = sys.argv[1:] if args is None else list(args)
+    if argv[:1] == ['serve']:
+        return serve_main(argv[1:])
+
+    args = parser.parse_args(args=argv)
+    if args.verbose:
+        logging.basicConfig(format='%(process)d-%(levelname)s-%(message)s', level=logging.INFO)
+    metrics = Metrics()
+    coordinates = load_coordinates(args.filename)
+    solution = tsp.optimize(coordinates, max_distance=args.max, closed=args.closed, max_seconds=args.max_seconds,
+                            anytime=args.anytime, cache=None if args.cache_dir is None else DistanceCache(args.cache_dir),
+                            seed=args.seed, metrics=metrics, metric=args.metric,
+                            cell_size=args.cell_size, workers=args.workers or None, construction=args.construction,
+                            max_gap=args.max_gap, full_output=args.max_gap is not None)
+    route, distance = solution[:2]
+    logging.getLogger(__name__).info(f'{metrics}')
+
+    if args.max is not None:
+        print(f'{len(route)} nodes could be touched with max distance of {args.max}')
+    else:
+        print(f'Solution with distance of {distance} found: {route}')
+        if args.max_gap is not None and solution.gap is not None:
+            print(f'The distance is within {solution.gap:.2%} of the lower bound {solution.bound:g}')
+
+    return route, distance
+
+
+def serve_main(args=None):
+    # asyncio and the service are only imported when serving, so solving a file starts faster
+    import asyncio
+
+    from tsp_hiram.service import DEFAULT_MAX_PENDING, serve
+
+    args = serve_parser.parse_args(args=args)
+    max_pending = DEFAULT_MAX_PENDING if args.max_pending is None else args.max_pending
+    print(f'Serving on http://{args.host}:{args.port}/solve')
+    try:
+        asyncio.run(serve(args.host, args.port, workers=args.workers, max_pending=max_pending))
+    except KeyboardInterrupt:
+        pass
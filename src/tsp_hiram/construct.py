@@ -0,0 +1,257 @@
+import random
+from typing import List, Tuple
+
+import numpy as np
+
+from tsp_hiram.candidates import DEFAULT_K, CandidateGraph, knn_candidates, knn_candidates_from_matrix
+from tsp_hiram.metrics import Metrics
+from tsp_hiram.spatial import GridIndex, hilbert_order
+from tsp_hiram.tour import Tour
+
+# Names of the construction heuristics accepted by `construct`
+CONSTRUCTIONS = ('nearest_neighbors', 'hilbert', 'greedy', 'mst')
+
+
+def _length(order: np.ndarray, distance_matrix, points: np.ndarray) -> int:
+    """Length of the closed route visiting the nodes in order, with distances truncated like `distance_function`."""
+    following = np.roll(order, -1)
+    if distance_matrix is not None:
+        return np.asarray(distance_matrix)[order, following].sum().item()
+    delta = points[order] - points[following]
+    return int(np.trunc(np.sqrt(np.einsum('ij,ij->i', delta, delta))).sum())
+
+
+def _sorted_edges(distance_matrix, points: np.ndarray, candidates: CandidateGraph) -> List[Tuple[int, int]]:
+    """The undirected candidate edges, shortest first, ties broken by nodes."""
+    edges = candidates.edges()
+    if distance_matrix is not None:
+        lengths = np.asarray(distance_matrix)[edges[:, 0], edges[:, 1]]
+    else:
+        delta = points[edges[:, 0]] - points[edges[:, 1]]
+        lengths = np.einsum('ij,ij->i', delta, delta)
+    return edges[np.lexsort((edges[:, 1], edges[:, 0], lengths))].tolist()
+
+
+def _find(parent: List[int], i: int) -> int:
+    """Root of the set of ``i`` in a union-find forest, halving the path on the way."""
+    while parent[i] != i:
+        parent[i] = parent[parent[i]]
+        i = parent[i]
+    return i
+
+
+def _join_paths(paths: List[List[int]], distance_matrix, points: np.ndarray) -> np.ndarray:
+    """Visits the paths one after the other, each time going to the nearest end of a path not visited yet.
+
+    :return: The order of the nodes on the closed route
+    """
+    ends = np.array([end for path in paths for end in (path[0], path[-1])], dtype=np.int64)
+    if distance_matrix is None:
+        index = GridIndex(points[ends])
+
+        def nearest(e):
+            return int(index.nearest(e)[0][0])
+        remove = index.remove
+    else:
+        distance_matrix = np.asarray(distance_matrix)
+        alive = np.ones(len(ends), dtype=bool)
+
+        def nearest(e):
+            row = distance_matrix[ends[e], ends].astype(np.float64)
+            row[~alive] = np.inf
+            return int(np.argmin(row))
+
+        def remove(e):
+            alive[e] = False
+
+    n = sum(len(path) for path in paths)
+    order = []
+    e = 0
+    for _ in range(len(paths)):
+        path = paths[e // 2]
+        order.extend(path if e % 2 == 0 else reversed(path))
+        remove(e)
+        remove(e ^ 1)
+        if len(order) < n:
+            # leave from the other end of the path
+            e = nearest(e ^ 1)
+    return np.asarray(order, dtype=np.int64)
+
+
+def hilbert_tour(coordinates) -> Tuple[Tour, int]:
+    """Visits the points in the order of a Hilbert curve, see `tsp_hiram.spatial.hilbert_order`.
+
+    It takes O(n log n) time with NumPy only and is typically 30-40% longer than the optimal route on evenly spread
+    points, which makes it a quick start for local search on inputs too large for anything else.
+
+    :param coordinates: A sequence or array of 2D coordinates
+    :type coordinates: CoordinatesVector or np.ndarray
+    :return: The closed route, its distance
+    :rtype: Tuple[Tour, int]
+    """
+    points = np.asarray(coordinates, dtype=np.float64).reshape(-1, 2)
+    order = hilbert_order(points)
+    return Tour.from_order(order, len(points)), _length(order, None, points)
+
+
+def greedy_tour(distance_matrix=None, coordinates=None, candidates: CandidateGraph = None) -> Tuple[Tour, int]:
+    """Builds a closed route from the shortest edges, the greedy matching heuristic.
+
+    The candidate edges are added shortest first unless one of their nodes already has two edges or they would close
+    a cycle, which a union-find of the paths built so far tells. The paths left when the candidates run out are then
+    joined nearest end first. It takes O(n log n) time with a sparse candidate graph and its routes are usually
+    5-10% shorter than nearest neighbors routes.
+
+    :param distance_matrix: Distance matrix such as returned from `compute_euclidean_distance_matrix`, or None to
+        compute truncated euclidean distances from `coordinates`, defaults to None
+    :type distance_matrix: Matrix, optional
+    :param coordinates: Coordinates of the nodes, only used when `distance_matrix` is None, defaults to None
+    :type coordinates: CoordinatesVector, optional
+    :param candidates: The edges to build the route from, defaults to the DEFAULT_K nearest neighbors of each node
+    :type candidates: CandidateGraph, optional
+    :return: The closed route, its distance
+    :rtype: Tuple[Tour, int]
+    """
+    points, candidates = _inputs(distance_matrix, coordinates, candidates)
+    n = len(candidates)
+
+    parent = list(range(n))
+    links = [[] for _ in range(n)]
+    added = 0
+    for i, j in _sorted_edges(distance_matrix, points, candidates):
+        if len(links[i]) == 2 or len(links[j]) == 2:
+            continue
+        root_i, root_j = _find(parent, i), _find(parent, j)
+        if root_i == root_j:
+            continue
+        parent[root_i] = root_j
+        links[i].append(j)
+        links[j].append(i)
+        added += 1
+        if added == n - 1:
+            break
+
+    paths = []
+    seen = [False] * n
+    for end in range(n):
+        if seen[end] or len(links[end]) == 2:
+            continue
+        path, previous, node = [end], -1, end
+        seen[end] = True
+        while True:
+            following = [m for m in links[node] if m != previous]
+            if not following:
+                break
+            previous, node = node, following[0]
+            path.append(node)
+            seen[node] = True
+        paths.append(path)
+
+    order = _join_paths(paths, distance_matrix, points)
+    return Tour.from_order(order, n), _length(order, distance_matrix, points)
+
+
+def mst_tour(distance_matrix=None, coordinates=None, candidates: CandidateGraph = None) -> Tuple[Tour, int]:
+    """Builds a closed route by walking around a minimum spanning tree, the double-tree heuristic.
+
+    The tree is built from the candidate edges with Kruskal's algorithm and its nodes are visited in depth-first
+    order, shorter edges first, which shortcuts every node visited twice by walking around the tree. With every edge
+    as a candidate, the tree is a minimum spanning tree of the whole graph and the route is at most twice the optimal
+    one for metric distances, like Christofides' algorithm without the matching. Over nearest neighbors candidates the
+    tree may be longer, and the route too, so there is no such guarantee. The trees of a candidate graph which is not
+    connected are walked one after the other, nearest end first.
+
+    :param distance_matrix: Distance matrix such as returned from `compute_euclidean_distance_matrix`, or None to
+        compute truncated euclidean distances from `coordinates`, defaults to None
+    :type distance_matrix: Matrix, optional
+    :param coordinates: Coordinates of the nodes, only used when `distance_matrix` is None, defaults to None
+    :type coordinates: CoordinatesVector, optional
+    :param candidates: The edges to build the tree from, defaults to the DEFAULT_K nearest neighbors of each node
+    :type candidates: CandidateGraph, optional
+    :return: The closed route, its distance
+    :rtype: Tuple[Tour, int]
+    """
+    points, candidates = _inputs(distance_matrix, coordinates, candidates)
+    n = len(candidates)
+
+    parent = list(range(n))
+    children = [[] for _ in range(n)]
+    for i, j in _sorted_edges(distance_matrix, points, candidates):
+        root_i, root_j = _find(parent, i), _find(parent, j)
+        if root_i != root_j:
+            parent[root_i] = root_j
+            children[i].append(j)
+            children[j].append(i)
+
+    paths = []
+    seen = [False] * n
+    for root in range(n):
+        if seen[root]:
+            continue
+        path, stack = [], [root]
+        seen[root] = True
+        while stack:
+            node = stack.pop()
+            path.append(node)
+            # the shortest edge is the first one added, and is explored first
+            for child in reversed(children[node]):
+                if not seen[child]:
+                    seen[child] = True
+                    stack.append(child)
+        paths.append(path)
+
+    order = _join_paths(paths, distance_matrix, points)
+    return Tour.from_order(order, n), _length(order, distance_matrix, points)
+
+
+def _inputs(distance_matrix, coordinates, candidates: CandidateGraph) -> Tuple[np.ndarray, CandidateGraph]:
+    """The coordinates as an array if distances are computed from them, and the candidate graph."""
+    points = None if distance_matrix is not None else np.asarray(coordinates, dtype=np.float64).reshape(-1, 2)
+    if candidates is None:
+        if distance_matrix is None:
+            candidates = knn_candidates(points, DEFAULT_K)
+        else:
+            candidates = knn_candidates_from_matrix(distance_matrix, DEFAULT_K)
+    return points, candidates
+
+
+def construct(construction: str, distance_matrix=None, coordinates=None, candidates: CandidateGraph = None,
+              rng: random.Random = None, metrics: Metrics = None) -> Tuple[Tour, int]:
+    """Builds a closed route through every node with one of the CONSTRUCTIONS.
+
+    :param construction: 'nearest_neighbors' for `nearest_neighbor_path` from a random node, 'hilbert' for
+        `hilbert_tour`, 'greedy' for `greedy_tour` or 'mst' for `mst_tour`
+    :type construction: str
+    :param distance_matrix: Distance matrix such as returned from `compute_euclidean_distance_matrix`, or None to
+        compute truncated euclidean distances from `coordinates`, defaults to None
+    :type distance_matrix: Matrix, optional
+    :param coordinates: Coordinates of the nodes, required by 'hilbert' and when `distance_matrix` is None, defaults to
+        None
+    :type coordinates: CoordinatesVector, optional
+    :param candidates: The edges the greedy and tree heuristics build the route from, defaults to the DEFAULT_K
+        nearest neighbors of each node
+    :type candidates: CandidateGraph, optional
+    :param rng: Random number generator of the nearest neighbors route, defaults to the `random` module
+    :type rng: random.Random, optional
+    :param metrics: Counts the nodes visited by the nearest neighbors route, defaults to None
+    :type metrics: Metrics, optional
+    :raises ValueError: If the construction is unknown or needs coordinates which are not given
+    :return: The closed route, its distance
+    :rtype: Tuple[Tour, int]
+    """
+    if construction == 'nearest_neighbors':
+        from tsp_hiram.tsp import nearest_neighbor_path
+
+        return nearest_neighbor_path(distance_matrix, closed=True, coordinates=coordinates, rng=rng, metrics=metrics)
+    if construction == 'hilbert':
+        if coordinates is None:
+            raise ValueError('The hilbert construction requires coordinates.')
+        tour, distance = hilbert_tour(coordinates)
+        if distance_matrix is not None:
+            distance = tour.length(distance_matrix)
+        return tour, distance
+    if construction == 'greedy':
+        return greedy_tour(distance_matrix, coordinates, candidates)
+    if construction == 'mst':
+        return mst_tour(distance_matrix, coordinates, candidates)
+    raise ValueError(f'Unknown construction {construction!r}, expected one of {list(CONSTRUCTIONS)}.')
@@ -0,0 +1,197 @@
+import logging
+import time
+from typing import List, Tuple
+
+import numpy as np
+
+from tsp_hiram.batch import optimize_many
+from tsp_hiram.candidates import DEFAULT_K, CandidateGraph, knn_candidates
+from tsp_hiram.local_search import LocalSearch, distance_function
+from tsp_hiram.metrics import Metrics
+from tsp_hiram.parallel import resolve_workers, spawn_seed
+from tsp_hiram.spatial import hilbert_order
+from tsp_hiram.tour import Tour
+
+logger = logging.getLogger(__name__)
+
+# Default number of points of each cell solved on its own
+DEFAULT_CELL_SIZE = 1000
+
+# Share of the time budget given to solving the cells, the rest going to the local search over the joined route
+CELL_BUDGET_SHARE = 0.8
+
+
+def partition(coordinates, cell_size: int = DEFAULT_CELL_SIZE) -> List[np.ndarray]:
+    """Splits the coordinates into cells of consecutive points along a Hilbert curve.
+
+    The cells hold between half and all of ``cell_size`` points each, cover compact regions of the plane, and
+    consecutive cells are next to each other.
+
+    :param coordinates: A sequence or array of 2D coordinates
+    :type coordinates: CoordinatesVector or np.ndarray
+    :param cell_size: The maximum number of points of a cell, defaults to DEFAULT_CELL_SIZE
+    :type cell_size: int, optional
+    :return: The nodes of every cell, in the order of the curve
+    :rtype: List[np.ndarray]
+    """
+    assert cell_size > 0, 'Cells must hold at least one point.'
+    order = hilbert_order(coordinates)
+    return np.array_split(order, max(1, -(-len(order) // cell_size)))
+
+
+def _solve_cells(points: np.ndarray, cells: List[np.ndarray], workers: int, time_limit: float, seed: int,
+                 options: dict) -> List[np.ndarray]:
+    """Returns the nodes of every cell in the order of its closed route, solved with `optimize`."""
+    from tsp_hiram.tsp import optimize
+
+    # cells of up to 3 points have a single closed route
+    orders = list(cells)
+    pending = [c for c, cell in enumerate(cells) if len(cell) > 3]
+    instances = [points[cells[c]] for c in pending]
+    options = dict(options, closed=True)
+    if time_limit is not None:
+        options['max_seconds'] = time_limit
+
+    if workers == 1:
+        for index, instance in enumerate(instances):
+            instance_options = options if seed is None else dict(options, seed=spawn_seed(seed, index))
+            route, _ = optimize(instance, **instance_options)
+            orders[pending[index]] = cells[pending[index]][Tour.from_edges(route, len(instance)).order()]
+        return orders
+
+    for result in optimize_many(instances, workers=workers, seed=seed, **options):
+        cell = cells[pending[result.index]]
+        if isinstance(result.error, TimeoutError):
+            # the cell keeps the order of the curve, which is a valid if long route
+            logger.warning(f'The cell of {len(cell)} points starting at node {cell[0]} ran out of time: {result.error}')
+            continue
+        if result.error is not None:
+            raise result.error
+        orders[pending[result.index]] = cell[Tour.from_edges(result.route, len(cell)).order()]
+    return orders
+
+
+def _lengths(points: np.ndarray, a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Truncated euclidean distances between the nodes of `a` and `b`, like `distance_function`."""
+    delta = points[a] - points[b]
+    return np.trunc(np.sqrt(np.einsum('ij,ij->i', delta, delta)))
+
+
+def _join(points: np.ndarray, orders: List[np.ndarray], candidates: CandidateGraph) -> Tuple[np.ndarray, List[int]]:
+    """Joins the closed routes of the cells into one, merging each cell with the route of the previous ones.
+
+    Two routes are merged by removing an edge (a, b) of the cell and an edge (c, d) of the route and adding (a, d) and
+    (c, b), possibly after reversing the cell, with a and c candidates of each other. The pair lengthening the route
+    the least is chosen, which is usually on the boundary of two consecutive cells.
+
+    :return: The successor of every node on the joined route, and the nodes of the added edges
+    """
+    n = len(points)
+    succ = np.empty(n, dtype=np.int64)
+    pred = np.empty(n, dtype=np.int64)
+    for order in orders:
+        succ[order] = np.roll(order, -1)
+        pred[order] = np.roll(order, 1)
+
+    joined = np.zeros(n, dtype=bool)
+    joined[orders[0]] = True
+    seams = []
+    for order in orders[1:]:
+        counts = candidates.indptr[order + 1] - candidates.indptr[order]
+        a = np.repeat(order, counts)
+        offsets = np.arange(len(a)) - np.repeat(np.cumsum(counts) - counts, counts)
+        c = candidates.indices[np.repeat(candidates.indptr[order], counts) + offsets].astype(np.int64)
+        keep = joined[c]
+        a, c = a[keep], c[keep]
+        if not len(a):
+            # the cell is not next to the route, e.g. a cluster far from the others: link it to the nearest node
+            joined_nodes = np.flatnonzero(joined)
+            centroid = points[order].mean(axis=0)
+            nearest = joined_nodes[np.argmin(np.einsum('ij,ij->i', points[joined_nodes] - centroid, points[joined_nodes] - centroid))]
+            a, c = order, np.full(len(order), nearest)
+
+        d = succ[c]
+        removed = _lengths(points, c, d)
+        forward = _lengths(points, a, d) + _lengths(points, c, succ[a]) - _lengths(points, a, succ[a]) - removed
+        backward = _lengths(points, a, d) + _lengths(points, c, pred[a]) - _lengths(points, a, pred[a]) - removed
+        best = int(np.argmin(np.minimum(forward, backward)))
+        if backward[best] < forward[best]:
+            succ[order], pred[order] = pred[order], succ[order]
+
+        a, c = int(a[best]), int(c[best])
+        b, d = int(succ[a]), int(succ[c])
+        succ[a], pred[d] = d, a
+        succ[c], pred[b] = b, c
+        joined[order] = True
+        seams.extend((a, b, c, d))
+    return succ, seams
+
+
+def solve_decomposed(coordinates, cell_size: int = DEFAULT_CELL_SIZE, workers: int = None, max_seconds: float = None,
+                     seed: int = None, metrics: Metrics = None, **options) -> Tuple[Tour, int]:
+    """Finds a closed route through many points by solving cells of the plane independently, then joining their routes.
+
+    The points are split into cells of consecutive points along a Hilbert curve with `partition`, and each cell is
+    solved with `optimize` and the given options, in parallel. The routes of the cells are then merged one after the
+    other along the curve, and a final pass of local search over the joined route repairs the seams and the
+    boundaries of the cells, where the routes of the cells could not see each other.
+
+    The cells take the time of solving instances of ``cell_size`` points, so the whole solve grows linearly with the
+    number of points, at the cost of a slightly longer route than solving it as a whole.
+
+    :param coordinates: A sequence or array of 2D coordinates
+    :type coordinates: CoordinatesVector or np.ndarray
+    :param cell_size: The maximum number of points of a cell, defaults to DEFAULT_CELL_SIZE
+    :type cell_size: int, optional
+    :param workers: Number of processes solving the cells, all available CPUs if None, defaults to None
+    :type workers: int, optional
+    :param max_seconds: Wall-clock budget, CELL_BUDGET_SHARE of which is shared by the cells and the rest given to
+        the final local search, defaults to None
+    :type max_seconds: float, optional
+    :param seed: Seed of the solve, each cell being solved with its own seed derived from it, defaults to None
+    :type seed: int, optional
+    :param metrics: Times the ``decomposition`` into cells and their joining, the ``cells`` and the final
+        ``improvement``, defaults to None
+    :type metrics: Metrics, optional
+    :param options: Keyword arguments of `optimize` solving every cell, which always returns a closed route
+    :return: The route, its distance
+    :rtype: Tuple[Tour, int]
+    """
+    deadline = None if max_seconds is None else time.monotonic() + max_seconds
+    workers = resolve_workers(workers)
+    if metrics is None:
+        metrics = Metrics()
+    points = np.asarray(coordinates, dtype=np.float64).reshape(-1, 2)
+    n = len(points)
+    if n == 0:
+        return Tour(np.empty(0, dtype=np.int32)), 0
+
+    with metrics.timer('decomposition'):
+        cells = partition(points, cell_size)
+    logger.info(f'Solving {len(cells)} cells of up to {cell_size} points.')
+
+    time_limit = None
+    if max_seconds is not None:
+        # the cells solved one after the other by each worker share its part of the budget
+        rounds = -(-len(cells) // workers)
+        time_limit = max_seconds * CELL_BUDGET_SHARE / rounds
+    with metrics.timer('cells'):
+        orders = _solve_cells(points, cells, workers, time_limit, seed, options)
+
+    with metrics.timer('matrix'):
+        candidates = knn_candidates(points, DEFAULT_K)
+    with metrics.timer('decomposition'):
+        succ, seams = _join(points, orders, candidates)
+        # the nodes with candidates in other cells were only searched against the nodes of their own cell
+        cell_of = np.empty(n, dtype=np.int64)
+        for index, cell in enumerate(cells):
+            cell_of[cell] = index
+        from_nodes = np.repeat(np.arange(n), np.diff(candidates.indptr))
+        boundary = np.unique(from_nodes[cell_of[from_nodes] != cell_of[candidates.indices]])
+
+    with metrics.timer('improvement'):
+        distance, _ = distance_function(None, points)
+        search = LocalSearch(Tour(succ, start=0), distance, candidates, active=seams + boundary.tolist())
+        moves = search.run(deadline=deadline)
+        metrics.count('moves', moves)
+    return search.tour(), search.cost
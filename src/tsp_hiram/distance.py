@@ -0,0 +1,172 @@
+from typing import Callable, Dict, Tuple
+
+import numpy as np
+
+# Upper bound on the number of matrix entries held in temporaries while a block of rows is computed.
+DEFAULT_BLOCK_ENTRIES = 2 ** 22
+
+# Mean radius of the Earth in meters, the unit of haversine distances
+EARTH_RADIUS = 6371008.8
+
+
+# Vectorized kernel of a metric, computing the float64 distances between m and n points as an (m, n) array
+Kernel = Callable[[np.ndarray, np.ndarray], np.ndarray]
+
+
+def _euclidean(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    # sqrt(dx**2 + dy**2) in place is several times faster than np.hypot and identical for integer coordinates
+    block = a[:, 0, None] - b[None, :, 0]
+    dy = a[:, 1, None] - b[None, :, 1]
+    np.multiply(block, block, out=block)
+    np.multiply(dy, dy, out=dy)
+    np.add(block, dy, out=block)
+    return np.sqrt(block, out=block)
+
+
+def _manhattan(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    block = np.abs(a[:, 0, None] - b[None, :, 0])
+    return np.add(block, np.abs(a[:, 1, None] - b[None, :, 1]), out=block)
+
+
+def _chebyshev(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    block = np.abs(a[:, 0, None] - b[None, :, 0])
+    return np.maximum(block, np.abs(a[:, 1, None] - b[None, :, 1]), out=block)
+
+
+def _haversine(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    lat_a, lon_a = np.radians(a[:, 0, None]), np.radians(a[:, 1, None])
+    lat_b, lon_b = np.radians(b[None, :, 0]), np.radians(b[None, :, 1])
+    block = np.sin((lat_b - lat_a) / 2) ** 2 + np.cos(lat_a) * np.cos(lat_b) * np.sin((lon_b - lon_a) / 2) ** 2
+    # rounding can push the haversine of antipodal points slightly above 1
+    np.minimum(block, 1, out=block)
+    np.sqrt(block, out=block)
+    np.arcsin(block, out=block)
+    return np.multiply(block, 2 * EARTH_RADIUS, out=block)
+
+
+# Kernels of the metrics by name, see `register_metric`. Haversine distances are in meters between
+# (latitude, longitude) coordinates in degrees
+METRICS: Dict[str, Kernel] = {
+    'euclidean': _euclidean,
+    'manhattan': _manhattan,
+    'chebyshev': _chebyshev,
+    'haversine': _haversine,
+}
+
+
+def register_metric(name: str, kernel: Kernel):
+    """Registers a metric under ``name``, so it can be passed to `distance_matrix` and `optimize`.
+
+    :param name: The name of the metric, replacing any metric registered under it
+    :type name: str
+    :param kernel: Vectorized function computing the float64 distances between each of m points and each of n
+        points, given as (m, 2) and (n, 2) arrays, as an (m, n) array it may overwrite
+    :type kernel: Callable[[np.ndarray, np.ndarray], np.ndarray]
+    """
+    METRICS[name] = kernel
+
+
+def get_metric(name: str) -> Kernel:
+    """Returns the kernel of the metric registered under ``name``.
+
+    :raises ValueError: If no metric has this name
+    :rtype: Callable[[np.ndarray, np.ndarray], np.ndarray]
+    """
+    try:
+        return METRICS[name]
+    except KeyError:
+        raise ValueError(f'Unknown metric {name!r}, expected one of {sorted(METRICS)}.') from None
+
+
+def distance_matrix(coordinates, metric: str = 'euclidean', dtype=None, truncate: bool = True,
+                    block_size: int = None) -> np.ndarray:
+    """Computes the matrix of distances between the coordinates with the vectorized kernel of a metric.
+
+    The matrix is filled ``block_size`` rows at a time so the temporaries never grow beyond
+    ``block_size * n`` entries, regardless of the number of coordinates.
+
+    :param coordinates: A sequence or array of 2D coordinates
+    :type coordinates: CoordinatesVector or np.ndarray
+    :param metric: The name of a metric of METRICS, defaults to 'euclidean'
+    :type metric: str, optional
+    :param dtype: dtype of the returned matrix, defaults to int32 when truncating and float64 otherwise
+    :type dtype: np.dtype, optional
+    :param truncate: Truncate each distance to an integer like ``int(math.hypot(dx, dy))``, defaults to True
+    :type truncate: bool, optional
+    :param block_size: Number of rows computed at once, defaults to a size keeping temporaries around 32MB
+    :type block_size: int, optional
+    :raises ValueError: If the metric is unknown or a distance does not fit in an integer dtype
+    :return: C-contiguous n x n matrix of distances with zeros on the diagonal
+    :rtype: np.ndarray
+    """
+    kernel = get_metric(metric)
+    points = np.asarray(coordinates, dtype=np.float64).reshape(-1, 2)
+    n = len(points)
+
+    if dtype is None:
+        dtype = np.int32 if truncate else np.float64
+    dtype = np.dtype(dtype)
+    largest = np.iinfo(dtype).max if dtype.kind in 'iu' else None
+    if largest is not None and metric == 'euclidean' and n and np.hypot(*np.ptp(points, axis=0)) <= largest:
+        # no euclidean distance is longer than the diagonal of the bounding box, so no block needs to be checked
+        largest = None
+
+    if block_size is None:
+        block_size = max(1, DEFAULT_BLOCK_ENTRIES // max(n, 1))
+
+    distances = np.empty((n, n), dtype=dtype)
+    for start in range(0, n, block_size):
+        stop = min(start + block_size, n)
+        block = kernel(points[start:stop], points)
+        if truncate:
+            np.trunc(block, out=block)
+        if largest is not None and block.size and block.max() > largest:
+            raise ValueError(f'Distances up to {block.max()} do not fit in {dtype}')
+        distances[start:stop] = block
+
+    return distances
+
+
+def euclidean_distance_matrix(coordinates, dtype=None, truncate: bool = True, block_size: int = None) -> np.ndarray:
+    """Computes the matrix of euclidean distances between the coordinates with NumPy, see `distance_matrix`.
+
+    :param coordinates: A sequence or array of 2D coordinates
+    :type coordinates: CoordinatesVector or np.ndarray
+    :param dtype: dtype of the returned matrix, defaults to int32 when truncating and float64 otherwise
+    :type dtype: np.dtype, optional
+    :param truncate: Truncate each distance to an integer like ``int(math.hypot(dx, dy))``, defaults to True
+    :type truncate: bool, optional
+    :param block_size: Number of rows computed at once, defaults to a size keeping temporaries around 32MB
+    :type block_size: int, optional
+    :return: C-contiguous n x n matrix of distances with zeros on the diagonal
+    :rtype: np.ndarray
+    """
+    return distance_matrix(coordinates, 'euclidean', dtype=dtype, truncate=truncate, block_size=block_size)
+
+
+def from_sparse(matrix, missing: float = None) -> Tuple[np.ndarray, np.ndarray]:
+    """Converts a sparse matrix of the costs of the allowed edges, such as a ``scipy.sparse`` matrix, to a dense one.
+
+    :param matrix: Sparse matrix with a ``tocoo()`` method whose stored entries are the costs of the allowed edges
+    :type matrix: scipy.sparse.spmatrix
+    :param missing: The cost of the edges which are not stored, defaults to a cost larger than any route over allowed
+        edges so they are only used when no such route exists
+    :type missing: float, optional
+    :raises ValueError: If the matrix is not square
+    :return: The dense matrix, the (m, 2) array of the (i, j) allowed edges
+    :rtype: Tuple[np.ndarray, np.ndarray]
+    """
+    coo = matrix.tocoo()
+    n, m = coo.shape
+    if n != m:
+        raise ValueError(f'The distance matrix must be square, not {n} x {m}.')
+
+    costs = np.asarray(coo.data)
+    if missing is None:
+        missing = (max(costs.max(), 0) + 1) * n if costs.size else 1
+    dtype = np.result_type(costs.dtype, np.min_scalar_type(missing))
+    dense = np.full((n, n), missing, dtype=dtype)
+    dense[coo.row, coo.col] = costs
+    np.fill_diagonal(dense, 0)
+    edges = np.stack([coo.row, coo.col], axis=1).astype(np.int64)
+    return dense, edges[edges[:, 0] != edges[:, 1]]
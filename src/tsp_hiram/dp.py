@@ -0,0 +1,136 @@
+import logging
+from typing import List, Tuple
+
+import numpy as np
+
+from tsp_hiram.tour import Tour
+
+logger = logging.getLogger(__name__)
+
+# Largest number of nodes `optimize` solves with `held_karp`, which is faster than starting branch and cut up to there
+DP_MAX_NODES = 12
+
+
+def _layers(m: int) -> List[np.ndarray]:
+    """The subsets of m nodes as bitmasks, grouped by their number of nodes."""
+    masks = np.arange(1 << m, dtype=np.int64)
+    sizes = ((masks[:, None] >> np.arange(m)) & 1).sum(axis=1)
+    return [masks[sizes == size] for size in range(m + 1)]
+
+
+def _paths(first: np.ndarray, costs: np.ndarray) -> Tuple[np.ndarray, np.ndarray, List[np.ndarray]]:
+    """Computes the shortest path from a root through every subset of m nodes, ending at each node of the subset.
+
+    The paths through the subsets of one size are extended by one node at a time for all of them at once: the shortest
+    path through subset S ending at k is the shortest one through S without k, ending at any j, plus the cost from j
+    to k. It takes O(2^m m²) time and O(2^m m) memory.
+
+    :param first: The cost from the root to each node
+    :param costs: The m x m costs between the nodes
+    :return: The length of the shortest path through each subset ending at each node, inf if the node isn't in the
+        subset, the node before the last one on it, and the subsets grouped by size
+    """
+    m = len(first)
+    layers = _layers(m)
+    lengths = np.full((1 << m, m), np.inf)
+    previous = np.full((1 << m, m), -1, dtype=np.int8)
+    nodes = np.arange(m)
+    lengths[1 << nodes, nodes] = first
+    for layer in layers[2:]:
+        rows, last = np.nonzero((layer[:, None] >> nodes) & 1)
+        subsets = layer[rows]
+        extended = lengths[subsets ^ (1 << last)] + costs[:, last].T
+        before = np.argmin(extended, axis=1)
+        lengths[subsets, last] = extended[np.arange(len(before)), before]
+        previous[subsets, last] = before
+    return lengths, previous, layers
+
+
+def _order(previous: np.ndarray, subset: int, last: int) -> List[int]:
+    """The nodes of the shortest path through the subset ending at `last`, in the order they are visited."""
+    order = []
+    while subset:
+        order.append(last)
+        subset, last = subset ^ (1 << last), int(previous[subset, last])
+    return order[::-1]
+
+
+def _best(lengths: np.ndarray, layers: List[np.ndarray], back: np.ndarray, max_distance) -> Tuple[int, int, float]:
+    """The subset, last node and length of the route visiting the most nodes within max_distance, shortest first.
+
+    :return: The largest subset if max_distance is None, or (0, -1, 0.) if no node fits within max_distance
+    """
+    for layer in reversed(layers[1:] if max_distance is not None else layers[-1:]):
+        totals = lengths[layer] + back
+        subset, last = np.unravel_index(np.argmin(totals), totals.shape)
+        if max_distance is None or totals[subset, last] <= max_distance:
+            return int(layer[subset]), int(last), float(totals[subset, last])
+    return 0, -1, 0.
+
+
+def held_karp(distance_matrix, closed: bool = True, start: int = None, max_distance=None) -> Tuple[Tour, int]:
+    """Finds the optimal route with the Held-Karp dynamic program over the subsets of nodes, vectorized with NumPy.
+
+    Unlike `tsp_hiram.tsp.branch_and_cut`, there is no model to build nor solver to start, which makes it the
+    fastest way to prove a route optimal for a dozen or so nodes, a few milliseconds, but the time and memory it takes
+    double with each node. The matrix may be asymmetric.
+
+    With a max distance, the route visits as many nodes as possible within it, like `tsp_hiram.orienteering`, the
+    shortest such route being returned.
+
+    :param distance_matrix: Distance matrix such as returned from `compute_euclidean_distance_matrix`
+    :type distance_matrix: Matrix
+    :param closed: Whether the route returns to its start, defaults to True
+    :type closed: bool, optional
+    :param start: The node the route starts from, defaults to any node
+    :type start: int, optional
+    :param max_distance: The maximum distance of a route visiting as many nodes as possible, defaults to None to visit
+        every node
+    :type max_distance: int, optional
+    :return: The optimal route, its distance
+    :rtype: Tuple[Tour, int]
+    """
+    distance_matrix = np.asarray(distance_matrix)
+    n = len(distance_matrix)
+    if start is not None:
+        assert 0 <= start < n, f'Starting node ({start}) must be within range 0 to {n}'
+    if n == 0:
+        return Tour(np.empty(0, dtype=np.int32)), 0
+    costs = distance_matrix.astype(np.float64)
+
+    if not closed and start is None:
+        # paths from a root at no cost to every node start anywhere
+        lengths, previous, layers = _paths(np.zeros(n), costs)
+        subset, last, _ = _best(lengths, layers, 0., max_distance)
+        order = _order(previous, subset, last)
+        return _tour(order, n, closed, distance_matrix)
+
+    if start is not None or max_distance is None:
+        roots = [start if start is not None else 0]
+    else:
+        # a closed route leaving out some nodes is found from its lowest node, through higher ones only
+        roots = range(n)
+    best = None
+    for root in roots:
+        others = np.delete(np.arange(n), root) if len(roots) == 1 else np.arange(root + 1, n)
+        order = [root]
+        if len(others):
+            lengths, previous, layers = _paths(costs[root, others], costs[np.ix_(others, others)])
+            back = costs[others, root] if closed else np.zeros(len(others))
+            subset, last, length = _best(lengths, layers, back, max_distance)
+            order += others[_order(previous, subset, last)].tolist()
+        else:
+            length = 0.
+        if best is None or (len(order), -length) > (len(best[0]), -best[1]):
+            best = order, length
+    return _tour(best[0], n, closed, distance_matrix)
+
+
+def _tour(order: List[int], n: int, closed: bool, distance_matrix: np.ndarray) -> Tuple[Tour, int]:
+    """The route visiting the nodes in order, a single node being a route without edges, and its distance."""
+    if len(order) == 1:
+        successors = np.full(n, -1, dtype=np.int32)
+        return Tour(successors, start=order[0]), 0
+    tour = Tour.from_order(order, n, closed=closed)
+    logger.debug(f'Optimal route through {len(order)} of {n} nodes.')
+    return tour, tour.length(distance_matrix)
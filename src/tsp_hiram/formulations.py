@@ -0,0 +1,340 @@
+from typing import Dict, List, Tuple
+
+import numpy as np
+from mip import BINARY, ConstrsGenerator, CutPool, Model, Var, maximize, minimize, xsum
+
+from tsp_hiram.tour import Tour
+
+# Cuts violated by less than this are not added to the model
+CUT_VIOLATION_TOLERANCE = 1e-3
+
+
+def _arc_costs(distance_matrix: np.ndarray, arcs) -> List[float]:
+    """Gathers the costs of the (i, j) arcs from the matrix, 0 for arcs to or from the extra node n of open routes.
+
+    Only the entries of the arcs are read, so building a model over a few candidate arcs never copies the matrix.
+    """
+    n = len(distance_matrix)
+    arcs = np.asarray(arcs, dtype=np.int64).reshape(-1, 2)
+    real = (arcs < n).all(axis=1)
+    costs = np.zeros(len(arcs), dtype=distance_matrix.dtype)
+    costs[real] = distance_matrix[arcs[real, 0], arcs[real, 1]]
+    return costs.tolist()
+
+
+def mtz_model(distance_matrix, arcs: List[Tuple[int, int]] = None) -> Tuple[Model, Dict[Tuple[int, int], Var]]:
+    """Builds the asymmetric formulation with Miller-Tucker-Zemlin subtour elimination constraints.
+
+    :param distance_matrix: Distance matrix such as returned from `compute_euclidean_distance_matrix`
+    :type distance_matrix: Matrix
+    :param arcs: The (i, j) arcs which may be used by the route, defaults to every arc
+    :type arcs: List[Tuple[int, int]], optional
+    :return: The model, the binary variable of each arc (i, j)
+    :rtype: Tuple[Model, Dict[Tuple[int, int], Var]]
+    """
+    distance_matrix = np.asarray(distance_matrix)
+    n = len(distance_matrix)
+    model = Model()
+
+    if arcs is None:
+        arcs = [(i, j) for i in range(n) for j in range(n) if i != j]
+
+    # binary variables indicating if arc (i,j) is used on the route or not
+    x = {(i, j): model.add_var(name=f'x({i},{j})', var_type=BINARY) for i, j in arcs}
+    arcs_in = [[] for _ in range(n)]
+    arcs_out = [[] for _ in range(n)]
+    for i, j in x:
+        arcs_out[i].append(x[i, j])
+        arcs_in[j].append(x[i, j])
+
+    # continuous variable to prevent subtours: each city will have a
+    # different sequential id in the planned route except the first one
+    y = [model.add_var(name=f'y({i})') for i in range(n)]
+
+    # objective function: minimize the distance
+    model.objective = minimize(xsum(cost * var for cost, var in zip(_arc_costs(distance_matrix, list(x)), x.values())))
+
+    # constraint : enter each city coming from another city
+    for i in range(n):
+        model += xsum(arcs_in[i]) == 1
+
+    # constraint : leave each city coming from another city
+    for i in range(n):
+        model += xsum(arcs_out[i]) == 1
+
+    # subtour elimination
+    for (i, j), var in x.items():
+        if i != 0 and j != 0:
+            model += y[i] - (n+1)*var >= y[j]-n, 'noSub({},{})'.format(i, j)
+
+    return model, x
+
+
+def symmetric_model(distance_matrix, edges: List[Tuple[int, int]] = None) -> Tuple[Model, Dict[Tuple[int, int], Var]]:
+    """Builds the symmetric formulation with one variable per edge (i, j), i < j, and degree constraints only.
+
+    Subtours are eliminated lazily by a `SubtourCutGenerator` attached to the model, so the model starts with
+    n (n - 1) / 2 variables and n constraints.
+
+    :param distance_matrix: Symmetric distance matrix such as returned from `compute_euclidean_distance_matrix`
+    :type distance_matrix: Matrix
+    :param edges: The (i, j) edges with i < j which may be used by the route, defaults to every edge
+    :type edges: List[Tuple[int, int]], optional
+    :raises ValueError: If the distance matrix is not symmetric
+    :return: The model, the binary variable of each edge (i, j) with i < j
+    :rtype: Tuple[Model, Dict[Tuple[int, int], Var]]
+    """
+    distance_matrix = np.asarray(distance_matrix)
+    if not np.array_equal(distance_matrix, distance_matrix.T):
+        raise ValueError('The symmetric formulation requires a symmetric distance matrix.')
+
+    n = len(distance_matrix)
+    model = Model()
+
+    if edges is None:
+        edges = [(i, j) for i in range(n) for j in range(i + 1, n)]
+
+    # variables are named so the cut generator can translate them to the preprocessed model
+    x = {(i, j): model.add_var(name=f'x({i},{j})', var_type=BINARY) for i, j in edges}
+    incident = [[] for _ in range(n)]
+    for i, j in x:
+        incident[i].append(x[i, j])
+        incident[j].append(x[i, j])
+
+    model.objective = minimize(xsum(cost * var for cost, var in zip(_arc_costs(distance_matrix, list(x)), x.values())))
+
+    # every city is entered and left through exactly two edges
+    for i in range(n):
+        model += xsum(incident[i]) == 2
+
+    generator = SubtourCutGenerator(x, n)
+    model.cuts_generator = generator
+    model.lazy_constrs_generator = generator
+
+    return model, x
+
+
+def orienteering_model(distance_matrix, max_distance, closed: bool = False,
+                       start: int = None) -> Tuple[Model, Dict[Tuple[int, int], Var], Dict[int, Var]]:
+    """Builds the formulation maximizing the number of nodes visited by a route of at most `max_distance`.
+
+    Each visited node is entered and left once, and a single-commodity flow sent from the first node of the route
+    along the arcs used, of which every other visited node keeps one unit, connects the route. Open routes are loops
+    through an extra depot node n at distance 0 from every node. Among the routes visiting the most nodes, the
+    shortest one is preferred.
+
+    :param distance_matrix: Distance matrix such as returned from `compute_euclidean_distance_matrix`
+    :type distance_matrix: Matrix
+    :param max_distance: The maximum distance of the route
+    :type max_distance: int
+    :param closed: Whether the route returns to its start, defaults to False
+    :type closed: bool, optional
+    :param start: The node the route starts from, defaults to any node
+    :type start: int, optional
+    :return: The model, the binary variable of each arc (i, j), the binary variable of each node visited
+    :rtype: Tuple[Model, Dict[Tuple[int, int], Var], Dict[int, Var]]
+    """
+    distance_matrix = np.asarray(distance_matrix)
+    n = len(distance_matrix)
+    size = n if closed else n + 1
+    model = Model()
+
+    # a fixed start of an open route comes right after the depot
+    arcs = [(i, j) for i in range(size) for j in range(size) if i != j and not (i == n and start is not None and j != start)]
+    x = {(i, j): model.add_var(name=f'x({i},{j})', var_type=BINARY) for i, j in arcs}
+    flow = {(i, j): model.add_var(name=f'f({i},{j})', ub=size - 1) for i, j in arcs}
+    y = {i: model.add_var(name=f'y({i})', var_type=BINARY) for i in range(n)}
+    arcs_in = [[] for _ in range(size)]
+    arcs_out = [[] for _ in range(size)]
+    for i, j in arcs:
+        arcs_out[i].append((i, j))
+        arcs_in[j].append((i, j))
+
+    # the node sending the flow is the depot of an open route, the fixed start, or any visited node
+    if not closed:
+        root = {n: 1}
+        visited = {**y, n: 1}
+    elif start is not None:
+        root = {start: 1}
+        visited = y
+        model += y[start] == 1
+    else:
+        root = {i: model.add_var(name=f'root({i})', var_type=BINARY) for i in range(n)}
+        visited = y
+        model += xsum(root.values()) <= 1
+        for i in range(n):
+            model += root[i] <= y[i]
+
+    for i in range(size):
+        model += xsum(x[arc] for arc in arcs_in[i]) == visited[i]
+        model += xsum(x[arc] for arc in arcs_out[i]) == visited[i]
+        if i in root:
+            model += xsum(flow[arc] for arc in arcs_in[i]) - xsum(flow[arc] for arc in arcs_out[i]) >= visited[i] - size * root[i]
+        else:
+            model += xsum(flow[arc] for arc in arcs_in[i]) - xsum(flow[arc] for arc in arcs_out[i]) >= visited[i]
+    for arc in arcs:
+        model += flow[arc] <= (size - 1) * x[arc]
+
+    length = xsum(cost * var for cost, var in zip(_arc_costs(distance_matrix, arcs), x.values()))
+    model += length <= max_distance
+
+    # every route is shorter than max_distance + 1, so a shorter route never beats one more node
+    model.objective = maximize(xsum(y.values()) - length / (max_distance + 1))
+
+    return model, x, y
+
+
+def tour_from_orienteering_solution(x: Dict[Tuple[int, int], Var], y: Dict[int, Var], n: int, closed: bool,
+                                    start: int = None) -> Tour:
+    """Reads the route from the variables of a solved `orienteering_model`.
+
+    :param x: The binary variable of each arc (i, j)
+    :type x: Dict[Tuple[int, int], Var]
+    :param y: The binary variable of each node visited
+    :type y: Dict[int, Var]
+    :param n: The number of nodes
+    :type n: int
+    :param closed: Whether the route returns to its start
+    :type closed: bool
+    :param start: The node the route starts from, defaults to the lowest node of a closed route
+    :type start: int, optional
+    :rtype: Tour
+    """
+    successors = np.full(n + 1, -1, dtype=np.int32)
+    for (i, j), var in x.items():
+        if var.x >= 0.99:
+            successors[i] = j
+
+    if closed:
+        visited = [i for i, var in y.items() if var.x >= 0.99]
+        return Tour(successors[:n], start=start if start is not None else (min(visited) if visited else None))
+
+    order = []
+    node = successors[n]
+    while node != n:
+        order.append(int(node))
+        node = successors[node]
+    return Tour.from_order(order, n, closed=False)
+
+
+def connected_components(edges: List[Tuple[int, int]], n: int) -> List[List[int]]:
+    """Returns the connected components of the graph with the given edges, using union-find.
+
+    :param edges: The (i, j) edges of the graph
+    :type edges: List[Tuple[int, int]]
+    :param n: The number of nodes
+    :type n: int
+    :return: The nodes of each component
+    :rtype: List[List[int]]
+    """
+    parent = list(range(n))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for i, j in edges:
+        root_i, root_j = find(i), find(j)
+        if root_i != root_j:
+            parent[root_i] = root_j
+
+    components = {}
+    for i in range(n):
+        components.setdefault(find(i), []).append(i)
+    return list(components.values())
+
+
+class SubtourCutGenerator(ConstrsGenerator):
+    """Separates subtour elimination constraints for the symmetric formulation.
+
+    Every connected component S of the edges with a positive value in the current solution, other than the whole
+    graph, violates ``sum(x[e] for e inside S) <= |S| - 1``. The constraint is added for the smaller of S and its
+    complement, which is equally valid and has fewer terms.
+
+    :param x: The binary variable of each edge (i, j) with i < j
+    :type x: Dict[Tuple[int, int], Var]
+    :param n: The number of nodes
+    :type n: int
+    """
+
+    def __init__(self, x: Dict[Tuple[int, int], Var], n: int):
+        self.x = x
+        self.n = n
+
+    def generate_constrs(self, model: Model, depth: int = 0, npass: int = 0):
+        x = model.translate(self.x)
+        support = [edge for edge, var in x.items() if var is not None and var.x >= CUT_VIOLATION_TOLERANCE]
+        components = connected_components(support, self.n)
+        if len(components) == 1:
+            return
+
+        label = [0] * self.n
+        for c, component in enumerate(components):
+            for i in component:
+                label[i] = c
+
+        # the edges inside each component, and those outside of it for the components larger than half the graph
+        inside = [[] for _ in components]
+        outside = [[] if 2 * len(component) > self.n else None for component in components]
+        large = [c for c, edges in enumerate(outside) if edges is not None]
+        for (i, j), var in x.items():
+            if var is None:
+                continue
+            if label[i] == label[j]:
+                inside[label[i]].append(var)
+            for c in large:
+                if label[i] != c and label[j] != c:
+                    outside[c].append(var)
+
+        cuts = CutPool()
+        for c, component in enumerate(components):
+            if outside[c] is None:
+                cut = xsum(inside[c]) <= len(component) - 1
+            else:
+                cut = xsum(outside[c]) <= self.n - len(component) - 1
+            if cut.violation > CUT_VIOLATION_TOLERANCE:
+                cuts.add(cut)
+
+        for cut in cuts.cuts:
+            model += cut
+
+
+def tour_from_solution(x: Dict[Tuple[int, int], Var], n: int, directed: bool, solution: int = None) -> Tour:
+    """Reads the closed tour from the arc or edge variables of a solved model.
+
+    :param x: The binary variable of each arc or edge (i, j)
+    :type x: Dict[Tuple[int, int], Var]
+    :param n: The number of nodes
+    :type n: int
+    :param directed: Whether the variables are arcs from i to j rather than edges between i and j
+    :type directed: bool
+    :param solution: Read this solution of the solution pool instead of the best one, defaults to None
+    :type solution: int, optional
+    :raises ValueError: If the solution is not a single tour through every node
+    :rtype: Tour
+    """
+    used = [edge for edge, var in x.items() if (var.x if solution is None else var.xi(solution)) >= 0.99]
+    if directed:
+        tour = Tour.from_edges(used, n)
+        if len(tour) != n or len(tour.order()) != n:
+            raise ValueError('The solution is not a single tour through every node.')
+        return tour
+
+    neighbors = [[] for _ in range(n)]
+    for i, j in used:
+        neighbors[i].append(j)
+        neighbors[j].append(i)
+    if n > 2 and any(len(nodes) != 2 for nodes in neighbors):
+        raise ValueError('The solution is not a single tour through every node.')
+
+    # walk the loop from node 0, leaving each node through the neighbor it wasn't entered from
+    order = [0]
+    previous, node = None, 0
+    while len(order) < n:
+        previous, node = node, next(j for j in neighbors[node] if j != previous)
+        if node == 0:
+            raise ValueError('The solution is not a single tour through every node.')
+        order.append(node)
+    return Tour.from_order(order, n, closed=True)
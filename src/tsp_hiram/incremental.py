@@ -0,0 +1,204 @@
+import bisect
+import math
+import time
+from typing import Iterable, Tuple
+
+import numpy as np
+
+from tsp_hiram.candidates import DEFAULT_K, knn_candidates
+from tsp_hiram.local_search import LocalSearch
+from tsp_hiram.tour import Tour
+
+
+class IncrementalTour:
+    """A closed route through a changing set of points, repaired around each change instead of solved again.
+
+    Added points get new node numbers after every node seen so far and removed ones keep theirs, so the nodes of the
+    route stay stable across updates. Distances are computed from the coordinates on demand, and the k nearest
+    neighbors of every point are updated only for the points within their k-th nearest neighbor of a change, so an
+    update costs a few vectorized O(n) scans plus local search around the change.
+
+    Each added point is inserted where it lengthens the route the least next to one of its neighbors, each removed one
+    is spliced out, then 2-opt and Or-opt moves are searched from the nodes around the changes only.
+
+    :param coordinates: The initial 2D coordinates
+    :type coordinates: CoordinatesVector or np.ndarray
+    :param tour: A closed route through every initial point, defaults to a nearest neighbors route improved by local
+        search
+    :type tour: Tour, optional
+    :param k: The number of nearest neighbors of each point, defaults to DEFAULT_K
+    :type k: int, optional
+    """
+
+    def __init__(self, coordinates, tour: Tour = None, k: int = DEFAULT_K):
+        points = np.asarray(coordinates, dtype=np.float64).reshape(-1, 2)
+        n = len(points)
+        self.k = k
+        self._points = np.empty((max(2 * n, 16), 2))
+        self._points[:n] = points
+        self._active = np.zeros(len(self._points), dtype=bool)
+        self._active[:n] = True
+        self._n = n
+        self._xs = points[:, 0].tolist()
+        self._ys = points[:, 1].tolist()
+
+        graph = knn_candidates(points, k)
+        self._neighbors = [graph.neighbors(i).tolist() for i in range(n)]
+        self._neighbor_distances = [self._distances(i, neighbors).tolist() for i, neighbors in enumerate(self._neighbors)]
+        # the neighbors of each node are all the other points closer than its radius, at most k of them
+        self._radius = np.full(len(self._points), np.inf)
+        if n > k:
+            self._radius[:n] = [distances[-1] for distances in self._neighbor_distances]
+        # the nodes having each node among their neighbors
+        self._listed_by = [set() for _ in range(n)]
+        for i, neighbors in enumerate(self._neighbors):
+            for j in neighbors:
+                self._listed_by[j].add(i)
+
+        if tour is None:
+            from tsp_hiram.tsp import nearest_neighbor_path
+            tour, _ = nearest_neighbor_path(None, closed=True, coordinates=points)
+        elif len(tour) != n:
+            raise ValueError(f'The route must visit the {n} points.')
+
+        self._search = LocalSearch(tour, self._distance, graph)
+        # share the neighbor lists so the search sees their updates
+        self._search.neighbors = self._neighbors
+        self._search.run()
+
+    def __len__(self):
+        """Number of points on the route."""
+        return len(self._search)
+
+    @property
+    def distance(self) -> int:
+        """The length of the route."""
+        return self._search.cost
+
+    def tour(self) -> Tour:
+        """Returns the current route over all the nodes ever added, the removed ones left out."""
+        return self._search.tour()
+
+    def coordinates(self) -> np.ndarray:
+        """Returns the coordinates of every node ever added, including the removed ones."""
+        return self._points[:self._n].copy()
+
+    def update(self, add=None, remove: Iterable[int] = None, max_seconds: float = None) -> Tuple[np.ndarray, Tour, int]:
+        """Removes and adds points, then improves the route around the changes.
+
+        :param add: The coordinates of the points to add, defaults to None
+        :type add: CoordinatesVector or np.ndarray, optional
+        :param remove: The nodes to remove, defaults to None
+        :type remove: Iterable[int], optional
+        :param max_seconds: Budget of the local search, defaults to None to run until no move improves the route
+        :type max_seconds: float, optional
+        :return: The nodes of the added points, the route, its distance
+        :rtype: Tuple[np.ndarray, Tour, int]
+        """
+        deadline = None if max_seconds is None else time.monotonic() + max_seconds
+        for node in [] if remove is None else remove:
+            self._remove(int(node))
+        added = [] if add is None else [self._add(x, y) for x, y in np.asarray(add, dtype=np.float64).reshape(-1, 2)]
+        self._search.run(deadline=deadline)
+        return np.asarray(added, dtype=np.int64), self.tour(), self.distance
+
+    def _distance(self, a: int, b: int) -> int:
+        """Truncated distance between nodes ``a`` and ``b``, like `distance_function`."""
+        dx = self._xs[a] - self._xs[b]
+        dy = self._ys[a] - self._ys[b]
+        return int(math.sqrt(dx * dx + dy * dy))
+
+    def _distances(self, i: int, nodes) -> np.ndarray:
+        """Untruncated distances from node ``i`` to the nodes, which order the neighbors."""
+        delta = self._points[nodes] - self._points[i]
+        return np.sqrt(np.einsum('ij,ij->i', delta, delta))
+
+    def _nearest(self, i: int) -> Tuple[list, list]:
+        """Finds the k nearest active nodes of node ``i`` with one scan of every point."""
+        others = np.flatnonzero(self._active[:self._n])
+        others = others[others != i]
+        distances = self._distances(i, others)
+        if len(others) > self.k:
+            keep = np.argpartition(distances, self.k - 1)[:self.k]
+            others, distances = others[keep], distances[keep]
+        order = np.lexsort((others, distances))
+        return others[order].tolist(), distances[order].tolist()
+
+    def _link(self, i: int, neighbors: list, distances: list):
+        for j in self._neighbors[i]:
+            self._listed_by[j].discard(i)
+        self._neighbors[i][:] = neighbors
+        self._neighbor_distances[i] = distances
+        self._radius[i] = distances[-1] if len(distances) >= self.k else np.inf
+        for j in neighbors:
+            self._listed_by[j].add(i)
+
+    def _add(self, x: float, y: float) -> int:
+        node = self._n
+        if node == len(self._points):
+            self._points = np.concatenate([self._points, np.empty_like(self._points)])
+            self._active = np.concatenate([self._active, np.zeros_like(self._active)])
+            self._radius = np.concatenate([self._radius, np.full_like(self._radius, np.inf)])
+        self._points[node] = x, y
+        self._xs.append(x)
+        self._ys.append(y)
+        self._n += 1
+        self._neighbors.append([])
+        self._neighbor_distances.append([])
+        self._listed_by.append(set())
+
+        neighbors, distances = self._nearest(node)
+        self._link(node, neighbors, distances)
+
+        # the new point becomes a neighbor of the points it is closer to than their k-th nearest one
+        active = np.flatnonzero(self._active[:node])
+        to_new = self._distances(node, active)
+        closer = to_new < self._radius[active]
+        for i, d in zip(active[closer].tolist(), to_new[closer].tolist()):
+            p = bisect.bisect(self._neighbor_distances[i], d)
+            self._neighbors[i].insert(p, node)
+            self._neighbor_distances[i].insert(p, d)
+            self._listed_by[node].add(i)
+            if len(self._neighbors[i]) > self.k:
+                self._listed_by[self._neighbors[i].pop()].discard(i)
+                self._neighbor_distances[i].pop()
+                self._radius[i] = self._neighbor_distances[i][-1]
+        self._active[node] = True
+
+        self._search.insert(node, self._cheapest_edge(node), self._neighbors[node])
+        self._search.activate(neighbors)
+        return node
+
+    def _cheapest_edge(self, node: int) -> int:
+        """Returns the node of the route after which inserting ``node`` lengthens the route the least."""
+        search = self._search
+        distance = search.distance
+        best, best_after = math.inf, None
+        for c in self._neighbors[node]:
+            for a in (search._pred(c), c):
+                b = search._succ(a)
+                increase = distance(a, node) + distance(node, b) - distance(a, b)
+                if increase < best:
+                    best, best_after = increase, a
+        return best_after
+
+    def _remove(self, node: int):
+        if not (0 <= node < self._n and self._active[node]):
+            raise ValueError(f'Node {node} is not on the route.')
+        self._active[node] = False
+        self._link(node, [], [])
+
+        listed_by = self._listed_by[node]
+        self._listed_by[node] = set()
+        for i in listed_by:
+            p = self._neighbors[i].index(node)
+            # the neighbors are still every point within the radius, only fewer of them
+            del self._neighbors[i][p]
+            del self._neighbor_distances[i][p]
+        self._search.remove(node)
+
+        # refill the neighbors of the points which lost half of them
+        for i in listed_by:
+            if 2 * len(self._neighbors[i]) < self.k:
+                self._link(i, *self._nearest(i))
+        self._search.activate(listed_by)
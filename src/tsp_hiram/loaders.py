@@ -0,0 +1,205 @@
+import itertools
+import os
+import struct
+import warnings
+from typing import Tuple
+
+import numpy as np
+
+# Number of CSV lines parsed at once, which bounds the memory used on top of the coordinates themselves
+DEFAULT_CHUNK_SIZE = 1 << 16
+
+# Suffix of the binary format written by `save_coordinates`
+BINARY_SUFFIX = '.tspb'
+
+# Suffix of TSPLIB instances
+TSPLIB_SUFFIX = '.tsp'
+
+# Magic, format version, number of columns, dtype and number of rows, padded so the data is 16-byte aligned
+_BINARY_MAGIC = b'TSPHIRAM'
+_BINARY_VERSION = 1
+_BINARY_HEADER = struct.Struct('<8sHH4sQ8x')
+_NPY_MAGIC = b'\x93NUMPY'
+
+
+def load_coordinates(path, chunk_size: int = DEFAULT_CHUNK_SIZE, columns: Tuple[int, int] = (0, 1)) -> np.ndarray:
+    """Loads 2D coordinates from a CSV, ``.npy``, TSPLIB or binary file into an (n, 2) array.
+
+    The format is detected from the first bytes of the file. ``.npy`` files and the binary format written by
+    `save_coordinates` are memory mapped, so loading them is instant and reads no data until it is used. Files ending
+    in ``.tsp`` are read with `read_tsplib`, and any other file is parsed as delimited text, see `read_csv`.
+
+    :param path: The file to load
+    :type path: str or os.PathLike
+    :param chunk_size: Number of text lines parsed at once, defaults to DEFAULT_CHUNK_SIZE
+    :type chunk_size: int, optional
+    :param columns: The columns of the x and y coordinates in a text file, defaults to (0, 1)
+    :type columns: Tuple[int, int], optional
+    :raises ValueError: If the file does not hold 2D coordinates
+    :return: The coordinates, one row per node
+    :rtype: np.ndarray
+    """
+    with open(path, 'rb') as f:
+        magic = f.read(len(_BINARY_MAGIC))
+
+    if magic.startswith(_NPY_MAGIC):
+        coordinates = np.load(path, mmap_mode='r')
+    elif magic == _BINARY_MAGIC:
+        coordinates = _load_binary(path)
+    elif os.fspath(path).lower().endswith(TSPLIB_SUFFIX):
+        return read_tsplib(path)
+    else:
+        return read_csv(path, chunk_size=chunk_size, columns=columns)
+
+    if coordinates.ndim != 2 or coordinates.shape[1] != 2:
+        raise ValueError(f'{path} holds an array of shape {coordinates.shape} instead of (n, 2) coordinates.')
+    return coordinates
+
+
+def read_csv(path, chunk_size: int = DEFAULT_CHUNK_SIZE, columns: Tuple[int, int] = (0, 1)) -> np.ndarray:
+    """Parses delimited text coordinates into a float array, `chunk_size` lines at a time.
+
+    The delimiter is a comma, semicolon or tab if the first line has one, and any whitespace otherwise. The first line
+    is skipped as a header if its coordinates are not numbers. Blank lines and ``#`` comments are ignored.
+
+    :param path: The file to parse
+    :type path: str or os.PathLike
+    :param chunk_size: Number of lines parsed at once, defaults to DEFAULT_CHUNK_SIZE
+    :type chunk_size: int, optional
+    :param columns: The columns of the x and y coordinates, defaults to (0, 1)
+    :type columns: Tuple[int, int], optional
+    :raises ValueError: If a line other than the header does not hold numbers in `columns`
+    :return: The coordinates, one row per line
+    :rtype: np.ndarray
+    """
+    assert chunk_size > 0, 'chunk_size must be positive.'
+    chunks = []
+    with open(path, newline='') as f:
+        first = ''
+        line_number = 0
+        for first in f:
+            line_number += 1
+            if first.strip() and not first.lstrip().startswith('#'):
+                break
+        delimiter = next((c for c in ',;\t' if c in first), None)
+
+        lines = [] if _is_header(first, delimiter, columns) else [first]
+        start = line_number if lines else line_number + 1
+        # loadtxt warns about chunks made of blank lines only, which are fine here
+        with warnings.catch_warnings():
+            warnings.filterwarnings('ignore', message='.*[Ee]mpty input.*|.*no data.*')
+            while True:
+                lines.extend(itertools.islice(f, chunk_size - len(lines)))
+                if not lines:
+                    break
+                try:
+                    chunk = np.loadtxt(lines, dtype=np.float64, delimiter=delimiter, usecols=columns, ndmin=2)
+                except ValueError as e:
+                    raise ValueError(f'Could not read coordinates from {path} in lines {start} to '
+                                     f'{start + len(lines) - 1}: {e}') from e
+                chunks.append(chunk)
+                start += len(lines)
+                lines = []
+
+    if not chunks:
+        return np.empty((0, 2))
+    return np.concatenate(chunks) if len(chunks) > 1 else chunks[0]
+
+
+def read_tsplib(path) -> np.ndarray:
+    """Reads the node coordinates of a TSPLIB instance, such as the EUC_2D instances of the TSPLIB library.
+
+    Only the coordinates are read: the package computes euclidean distances truncated to integers, while EUC_2D
+    instances round them to the nearest integer, so routes are measured slightly differently than by TSPLIB.
+
+    :param path: The ``.tsp`` file to read
+    :type path: str or os.PathLike
+    :raises ValueError: If the file has no 2D node coordinates or fewer than its DIMENSION
+    :return: The coordinates, one row per node in the order of the file
+    :rtype: np.ndarray
+    """
+    specification = {}
+    with open(path) as f:
+        for line in f:
+            key, _, value = line.partition(':')
+            key = key.strip().upper()
+            if key == 'NODE_COORD_SECTION':
+                break
+            if key == 'EOF':
+                raise ValueError(f'{path} has no NODE_COORD_SECTION, only instances with node coordinates are supported.')
+            specification[key] = value.strip()
+        else:
+            raise ValueError(f'{path} has no NODE_COORD_SECTION, only instances with node coordinates are supported.')
+
+        if specification.get('NODE_COORD_TYPE', 'TWOD_COORDS').upper() != 'TWOD_COORDS':
+            raise ValueError(f'{path} has {specification["NODE_COORD_TYPE"]} instead of 2D coordinates.')
+        try:
+            dimension = int(specification['DIMENSION'])
+            lines = itertools.takewhile(lambda line: line.strip().upper() not in ('EOF', ''), f)
+            coordinates = np.loadtxt(lines, dtype=np.float64, usecols=(1, 2), max_rows=dimension, ndmin=2)
+        except (KeyError, ValueError) as e:
+            raise ValueError(f'Could not read the node coordinates of {path}: {e!r}') from e
+
+    if len(coordinates) != dimension:
+        raise ValueError(f'{path} has {len(coordinates)} node coordinates instead of its DIMENSION {dimension}.')
+    return coordinates
+
+
+def _is_header(line: str, delimiter: str, columns: Tuple[int, int]) -> bool:
+    """Whether the coordinates of the first line are not numbers."""
+    fields = line.split(delimiter)
+    try:
+        for column in columns:
+            float(fields[column].strip().strip('"\''))
+    except (ValueError, IndexError):
+        return True
+    return False
+
+
+def save_coordinates(path, coordinates, dtype=np.float64):
+    """Writes coordinates to the binary format read by `load_coordinates`, or to a ``.npy`` file.
+
+    The binary format is a 32-byte header followed by the raw little-endian (n, 2) array, so it is loaded without
+    parsing or copying. The file is written next to `path` first and moved in place once complete.
+
+    :param path: The file to write, a ``.npy`` file if it has that suffix and the binary format otherwise
+    :type path: str or os.PathLike
+    :param coordinates: A sequence or array of 2D coordinates
+    :type coordinates: CoordinatesVector or np.ndarray
+    :param dtype: The type of the coordinates in the file, defaults to np.float64
+    :type dtype: np.dtype, optional
+    """
+    dtype = np.dtype(dtype).newbyteorder('<')
+    coordinates = np.ascontiguousarray(coordinates, dtype=dtype).reshape(-1, 2)
+    path = os.fspath(path)
+    temporary = f'{path}.{os.getpid()}.tmp'
+
+    try:
+        with open(temporary, 'wb') as f:
+            if path.endswith('.npy'):
+                np.save(f, coordinates)
+            else:
+                f.write(_BINARY_HEADER.pack(_BINARY_MAGIC, _BINARY_VERSION, 2, dtype.str.encode(), len(coordinates)))
+                coordinates.tofile(f)
+        os.replace(temporary, path)
+    finally:
+        if os.path.exists(temporary):
+            os.remove(temporary)
+
+
+def _load_binary(path) -> np.ndarray:
+    """Memory maps a file written by `save_coordinates`."""
+    with open(path, 'rb') as f:
+        header = f.read(_BINARY_HEADER.size)
+    if len(header) < _BINARY_HEADER.size:
+        raise ValueError(f'{path} is truncated.')
+
+    _, version, n_columns, dtype, n = _BINARY_HEADER.unpack(header)
+    if version != _BINARY_VERSION:
+        raise ValueError(f'{path} has unsupported format version {version}.')
+    dtype = np.dtype(dtype.rstrip(b'\0').decode())
+    if os.path.getsize(path) < _BINARY_HEADER.size + n * n_columns * dtype.itemsize:
+        raise ValueError(f'{path} is truncated.')
+    if n == 0:
+        return np.empty((0, n_columns), dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode='r', offset=_BINARY_HEADER.size, shape=(n, n_columns))
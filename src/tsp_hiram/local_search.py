@@ -0,0 +1,452 @@
+import math
+import time
+from collections import deque
+from typing import Iterable, List, Tuple
+
+import numpy as np
+
+from tsp_hiram.candidates import DEFAULT_K, CandidateGraph, knn_candidates, knn_candidates_from_matrix
+from tsp_hiram.metrics import Metrics
+from tsp_hiram.tour import Tour
+
+# Moves must shorten the route by more than this, so rounding errors of float distances can't make them cycle
+MIN_GAIN = 1e-9
+
+
+def distance_function(distance_matrix=None, coordinates=None, truncate: bool = True):
+    """Returns a function computing the distance between two nodes, from a distance matrix or from coordinates.
+
+    :param distance_matrix: Distance matrix such as returned from `compute_euclidean_distance_matrix`, defaults to None
+    :type distance_matrix: Matrix, optional
+    :param coordinates: Coordinates to compute euclidean distances from when `distance_matrix` is None, defaults to None
+    :type coordinates: CoordinatesVector, optional
+    :param truncate: Truncate the distances computed from coordinates to integers, defaults to True
+    :type truncate: bool, optional
+    :return: The distance function taking the two nodes, and the number of nodes
+    :rtype: Tuple[Callable[[int, int], float], int]
+    """
+    if distance_matrix is not None:
+        distance_matrix = np.asarray(distance_matrix)
+        return distance_matrix.item, len(distance_matrix)
+
+    points = np.asarray(coordinates, dtype=np.float64).reshape(-1, 2)
+    xs = points[:, 0].tolist()
+    ys = points[:, 1].tolist()
+
+    def distance(a, b):
+        dx = xs[a] - xs[b]
+        dy = ys[a] - ys[b]
+        d = math.sqrt(dx * dx + dy * dy)
+        return int(d) if truncate else d
+
+    return distance, len(points)
+
+
+class LocalSearch:
+    """2-opt and Or-opt local search over a closed route, stored as the array of its nodes in visiting order.
+
+    Only moves adding an edge between a node and one of its candidates are tried, and a queue of the nodes whose
+    neighborhood changed replaces the usual don't-look bits: a node is only searched again once a move touches one
+    of its edges. Each pass over the queue is therefore close to linear in the number of nodes, the cost of a move
+    being the reversal or shift of at most half the route.
+
+    The length of the route is kept up to date in `cost`, and the changes made after a `checkpoint` can be undone
+    with `rollback`, which is what perturbation-based searches such as `tsp_hiram.anytime` build on.
+
+    :param tour: The closed route to improve. It may leave out some nodes
+    :type tour: Tour
+    :param distance: Function returning the distance between two nodes, such as returned from `distance_function`
+    :type distance: Callable[[int, int], float]
+    :param candidates: The candidate neighbors of every node
+    :type candidates: CandidateGraph
+    :param active: The nodes searched for improving moves, e.g. those around the changes to an otherwise locally
+        optimal route, defaults to every node of the route
+    :type active: Iterable[int], optional
+    :raises ValueError: If the route is not closed
+    """
+
+    def __init__(self, tour: Tour, distance, candidates: CandidateGraph, active: Iterable[int] = None):
+        if len(tour) and not tour.closed:
+            raise ValueError('Local search requires a closed route.')
+        self.distance = distance
+        self.start = tour.start
+        self.order = tour.order().tolist()
+        self.pos = [-1] * len(tour.successors)
+        for p, node in enumerate(self.order):
+            self.pos[node] = p
+
+        # candidates outside the route can't be moved next to
+        indptr, indices = candidates.indptr.tolist(), candidates.indices.tolist()
+        self.neighbors = [
+            [c for c in indices[indptr[i]:indptr[i + 1]] if self.pos[c] >= 0] if self.pos[i] >= 0 else []
+            for i in range(len(candidates))
+        ]
+
+        self._queue = deque()
+        self._queued = [False] * len(self.pos)
+        self.activate(self.order if active is None else active)
+
+        self.cost = self.length()
+        self._journal = None
+        self._checkpoint_cost = None
+
+    def __len__(self):
+        """Number of nodes in the route."""
+        return len(self.order)
+
+    def tour(self) -> Tour:
+        """Returns the current route, starting from the same node as the initial one."""
+        n = len(self.order)
+        if not n:
+            return Tour(np.full(len(self.pos), -1, dtype=np.int32))
+        p = self.pos[self.start]
+        return Tour.from_order(self.order[p:] + self.order[:p], len(self.pos), closed=True)
+
+    def length(self):
+        """Returns the total distance of the current route."""
+        order = self.order
+        return sum(self.distance(order[p - 1], order[p]) for p in range(len(order)))
+
+    def checkpoint(self):
+        """Records the current route so the changes made from now on can be undone with `rollback`."""
+        self._journal = []
+        self._checkpoint_cost = self.cost
+
+    def rollback(self):
+        """Restores the route recorded by the last `checkpoint`, and empties the queue of nodes to search."""
+        order, pos = self.order, self.pos
+        n = len(order)
+        for start, nodes in reversed(self._journal):
+            for k, node in enumerate(nodes):
+                order[(start + k) % n] = node
+                pos[node] = (start + k) % n
+        self._journal = []
+        self.cost = self._checkpoint_cost
+
+        for node in self._queue:
+            self._queued[node] = False
+        self._queue.clear()
+
+    def _save(self, start: int, size: int):
+        """Journals the ``size`` nodes from position ``start`` before they are overwritten, if a checkpoint is set."""
+        if self._journal is not None:
+            n = len(self.order)
+            self._journal.append((start, [self.order[(start + k) % n] for k in range(size)]))
+
+    def double_bridge(self, rng, max_segment: int = 50) -> bool:
+        """Swaps two random consecutive sections of the route, a kick that local search moves can't easily undo.
+
+        Both sections hold at most ``max_segment`` nodes, so a kick takes constant time on large routes.
+
+        :param rng: Random number generator choosing the sections
+        :type rng: random.Random
+        :param max_segment: The maximum number of nodes of each section, defaults to 50
+        :type max_segment: int, optional
+        :return: Whether the route was changed, which requires at least 8 nodes
+        :rtype: bool
+        """
+        order, pos = self.order, self.pos
+        n = len(order)
+        if n < 8:
+            return False
+
+        # the route goes a, [b1 ... b2], [c1 ... c2], d and becomes a, [c1 ... c2], [b1 ... b2], d
+        longest = min(max_segment, n // 3)
+        i = rng.randrange(n)
+        size_b, size_c = rng.randint(1, longest), rng.randint(1, longest)
+        a, b1, b2 = order[i], order[(i + 1) % n], order[(i + size_b) % n]
+        c1, c2, d = order[(i + size_b + 1) % n], order[(i + size_b + size_c) % n], order[(i + size_b + size_c + 1) % n]
+
+        distance = self.distance
+        self.cost += (distance(a, c1) + distance(c2, b1) + distance(b2, d)
+                      - distance(a, b1) - distance(b2, c1) - distance(c2, d))
+
+        self._save((i + 1) % n, size_b + size_c)
+        sections = [order[(i + 1 + k) % n] for k in range(size_b + size_c)]
+        for k, node in enumerate(sections[size_b:] + sections[:size_b]):
+            order[(i + 1 + k) % n] = node
+            pos[node] = (i + 1 + k) % n
+        self.activate((a, b1, b2, c1, c2, d))
+        return True
+
+    def insert(self, node: int, after: int = None, neighbors: List[int] = None):
+        """Inserts a node which is not on the route between node ``after`` and its successor.
+
+        Nodes past the number of nodes the search was created with are added as needed. Other nodes only move next to
+        the inserted one once it is added to their `neighbors`. Insertions can't be undone, so the checkpoint is
+        cleared.
+
+        :param node: The node to insert
+        :type node: int
+        :param after: The node of the route to insert it after, unused if the route is empty
+        :type after: int
+        :param neighbors: The candidates of the node, nearest first, which must be on the route, defaults to none
+        :type neighbors: List[int], optional
+        """
+        order, pos = self.order, self.pos
+        for nodes, missing in ((pos, -1), (self._queued, False)):
+            nodes.extend([missing] * (node + 1 - len(nodes)))
+        self.neighbors.extend([] for _ in range(node + 1 - len(self.neighbors)))
+        assert pos[node] < 0, f'Node {node} is already on the route.'
+        self.neighbors[node] = [] if neighbors is None else neighbors
+        self._journal = None
+
+        if not order:
+            order.append(node)
+            pos[node] = 0
+            self.start = node
+            self.cost = 0
+            return
+
+        before, after = after, self._succ(after)
+        distance = self.distance
+        self.cost += distance(before, node) + distance(node, after) - distance(before, after)
+        p = pos[before] + 1
+        order.insert(p, node)
+        if 2 * p < len(order):
+            # the route is a cycle, so moving the first node to the end shifts the shorter side instead
+            order.append(order.pop(0))
+            self._renumber(0, p)
+            pos[order[-1]] = len(order) - 1
+        else:
+            self._renumber(p, len(order))
+        self.activate((before, node, after))
+
+    def remove(self, node: int):
+        """Removes a node from the route, joining its predecessor and successor.
+
+        The node must first be removed from the `neighbors` of the other nodes. Removals can't be undone, so the
+        checkpoint is cleared.
+
+        :param node: The node of the route to remove
+        :type node: int
+        """
+        order, pos = self.order, self.pos
+        p = pos[node]
+        assert p >= 0, f'Node {node} is not on the route.'
+        before, after = self._pred(node), self._succ(node)
+        distance = self.distance
+        self.cost += distance(before, after) - distance(before, node) - distance(node, after)
+        self._journal = None
+
+        del order[p]
+        pos[node] = -1
+        if order and 2 * p < len(order):
+            # the route is a cycle, so moving the last node to the front shifts the shorter side instead
+            order.insert(0, order.pop())
+            self._renumber(0, p + 1)
+        else:
+            self._renumber(p, len(order))
+        self.neighbors[node] = []
+        if self.start == node:
+            self.start = after if order else None
+        if order:
+            self.activate((before, after))
+
+    def _renumber(self, start: int, stop: int):
+        """Updates the positions of the nodes from position ``start`` to ``stop``, excluded."""
+        pos = self.pos
+        for p, node in enumerate(self.order[start:stop], start):
+            pos[node] = p
+
+    def activate(self, nodes: Iterable[int]):
+        """Queues nodes to be searched for improving moves, e.g. after the route was changed around them."""
+        for node in nodes:
+            if not self._queued[node] and self.pos[node] >= 0:
+                self._queued[node] = True
+                self._queue.append(node)
+
+    def run(self, two_opt: bool = True, or_opt: bool = True, deadline: float = None, max_iterations: int = None) -> int:
+        """Applies improving moves until none is left or a budget is exhausted.
+
+        :param two_opt: Try 2-opt moves, reversing a section of the route, defaults to True
+        :type two_opt: bool, optional
+        :param or_opt: Try Or-opt moves, moving up to 3 consecutive nodes elsewhere, defaults to True
+        :type or_opt: bool, optional
+        :param deadline: Stop at this `time.monotonic()` value, defaults to None
+        :type deadline: float, optional
+        :param max_iterations: Stop after this many moves, defaults to None
+        :type max_iterations: int, optional
+        :return: The number of moves applied
+        :rtype: int
+        """
+        iterations = 0
+        while self._queue:
+            if max_iterations is not None and iterations >= max_iterations:
+                break
+            if deadline is not None and time.monotonic() >= deadline:
+                break
+
+            node = self._queue.popleft()
+            self._queued[node] = False
+            if self.pos[node] < 0:
+                continue
+            if (two_opt and self._improve_2opt(node)) or (or_opt and self._improve_or_opt(node)):
+                iterations += 1
+                self.activate([node])
+
+        return iterations
+
+    def _succ(self, node: int) -> int:
+        p = self.pos[node] + 1
+        return self.order[p if p < len(self.order) else 0]
+
+    def _pred(self, node: int) -> int:
+        return self.order[self.pos[node] - 1]
+
+    def _reverse(self, first: int, last: int):
+        """Reverses the section of the route from node ``first`` to node ``last``, or the rest of the route if shorter.
+
+        Both give the same closed route, only travelled in opposite directions.
+        """
+        order, pos = self.order, self.pos
+        n = len(order)
+        i, j = pos[first], pos[last]
+        size = (j - i) % n + 1
+        if 2 * size > n:
+            i, j = (j + 1) % n, (i - 1) % n
+            size = n - size
+        self._save(i, size)
+        for _ in range(size // 2):
+            a, b = order[i], order[j]
+            order[i], order[j] = b, a
+            pos[b], pos[a] = i, j
+            i = i + 1 if i + 1 < n else 0
+            j = j - 1 if j > 0 else n - 1
+
+    def _improve_2opt(self, a: int) -> bool:
+        """Looks for a 2-opt move replacing an edge of node ``a`` with an edge to one of its candidates."""
+        distance = self.distance
+        for forward in (True, False):
+            b = self._succ(a) if forward else self._pred(a)
+            d_ab = distance(a, b)
+            for c in self.neighbors[a]:
+                d_ac = distance(a, c)
+                if d_ac >= d_ab:
+                    break
+                d = self._succ(c) if forward else self._pred(c)
+                if c == b or d == a:
+                    continue
+                gain = d_ab + distance(c, d) - d_ac - distance(b, d)
+                if gain > MIN_GAIN:
+                    self.cost -= gain
+                    # replace (a, b) and (c, d) with (a, c) and (b, d)
+                    if forward:
+                        self._reverse(b, c)
+                    else:
+                        self._reverse(a, d)
+                    self.activate((a, b, c, d))
+                    return True
+        return False
+
+    def _move_segment(self, first: int, size: int, after: int, reverse: bool):
+        """Moves the ``size`` nodes starting at node ``first`` between node ``after`` and its successor.
+
+        The nodes between the section and its new place are shifted, from whichever side has fewer of them.
+        """
+        order, pos = self.order, self.pos
+        n = len(order)
+        i = pos[first]
+        segment = [order[(i + k) % n] for k in range(size)]
+        if reverse:
+            segment.reverse()
+
+        forward = (pos[after] - i - size + 1) % n
+        backward = (i - pos[after] - 1) % n
+        if forward <= backward:
+            self._save(i, forward + size)
+            for k in range(forward):
+                node = order[(i + size + k) % n]
+                order[(i + k) % n] = node
+                pos[node] = (i + k) % n
+            start = (i + forward) % n
+        else:
+            self._save((i - backward) % n, backward + size)
+            for k in range(backward):
+                node = order[(i - 1 - k) % n]
+                order[(i - 1 - k + size) % n] = node
+                pos[node] = (i - 1 - k + size) % n
+            start = (i - backward) % n
+
+        for k, node in enumerate(segment):
+            order[(start + k) % n] = node
+            pos[node] = (start + k) % n
+
+    def _improve_or_opt(self, a: int) -> bool:
+        """Looks for an Or-opt move taking the 1 to 3 nodes starting at node ``a`` next to a candidate of an end."""
+        distance = self.distance
+        segment = [a]
+        for size in (1, 2, 3):
+            if size > 1:
+                segment.append(self._succ(segment[-1]))
+            first, last = a, segment[-1]
+            before, after = self._pred(first), self._succ(last)
+            if after == before or after in segment:
+                return False
+
+            removal_gain = distance(before, first) + distance(last, after) - distance(before, after)
+            if removal_gain <= MIN_GAIN:
+                continue
+
+            # connect either end of the section to one of its candidates c, on either side of c
+            for end, other in ((first, last), (last, first)):
+                for c in self.neighbors[end]:
+                    d_c = distance(end, c)
+                    if d_c >= removal_gain:
+                        break
+                    if c in segment:
+                        continue
+                    for e, is_successor in ((self._succ(c), True), (self._pred(c), False)):
+                        if e in segment:
+                            continue
+                        gain = removal_gain + distance(c, e) - d_c - distance(other, e)
+                        if gain > MIN_GAIN:
+                            # the route goes c, end, ..., other, e when e follows c and e, other, ..., end, c otherwise
+                            reverse = (end == first) != is_successor
+                            self.cost -= gain
+                            self._move_segment(first, size, c if is_successor else e, reverse)
+                            self.activate((before, after, c, e, first, last))
+                            return True
+        return False
+
+
+def improve_tour(tour: Tour, distance_matrix=None, coordinates=None, candidates: CandidateGraph = None,
+                 two_opt: bool = True, or_opt: bool = True, max_seconds: float = None,
+                 max_iterations: int = None, metrics: Metrics = None) -> Tuple[Tour, int]:
+    """Improves a closed route, such as returned from `nearest_neighbor_path`, with 2-opt and Or-opt moves.
+
+    :param tour: The closed route to improve
+    :type tour: Tour
+    :param distance_matrix: Distance matrix such as returned from `compute_euclidean_distance_matrix`, or None to
+        compute truncated euclidean distances from `coordinates`, defaults to None
+    :type distance_matrix: Matrix, optional
+    :param coordinates: Coordinates of the nodes, only used when `distance_matrix` is None, defaults to None
+    :type coordinates: CoordinatesVector, optional
+    :param candidates: The neighbors each node may be moved next to, defaults to its DEFAULT_K nearest neighbors
+    :type candidates: CandidateGraph, optional
+    :param two_opt: Try 2-opt moves, defaults to True
+    :type two_opt: bool, optional
+    :param or_opt: Try Or-opt moves, defaults to True
+    :type or_opt: bool, optional
+    :param max_seconds: Return the best route found after this time, defaults to None to run until no move improves it
+    :type max_seconds: float, optional
+    :param max_iterations: Return after this many moves, defaults to None
+    :type max_iterations: int, optional
+    :param metrics: Counts the moves applied, defaults to None
+    :type metrics: Metrics, optional
+    :return: The improved route, its distance
+    :rtype: Tuple[Tour, int]
+    """
+    deadline = None if max_seconds is None else time.monotonic() + max_seconds
+    distance, n = distance_function(distance_matrix, coordinates)
+    if candidates is None:
+        if distance_matrix is None:
+            candidates = knn_candidates(coordinates, DEFAULT_K)
+        else:
+            candidates = knn_candidates_from_matrix(distance_matrix, DEFAULT_K)
+
+    search = LocalSearch(tour, distance, candidates)
+    moves = search.run(two_opt=two_opt, or_opt=or_opt, deadline=deadline, max_iterations=max_iterations)
+    if metrics is not None:
+        metrics.count('moves', moves)
+    return search.tour(), search.length()
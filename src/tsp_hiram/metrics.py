@@ -0,0 +1,59 @@
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict
+
+
+class Metrics:
+    """Wall-clock time spent in each phase of a solve and counters of what the algorithms did.
+
+    Pass an instance as the ``metrics`` argument of `optimize` or of an algorithm to fill it in. Phases run several
+    times, such as branch and cut solving again with more candidate edges, add up. Counters are only updated once per
+    algorithm run, never inside its loops, so collecting them costs nothing measurable.
+
+    Phases: ``matrix`` (distance matrix and candidate neighbors), ``construction`` (the first route), ``improvement``
+    (local search), ``bound`` (the lower bound of max_gap and full_output), ``orienteering``, ``mip_build``,
+    ``mip_optimize`` and ``route_extraction`` (branch and cut), ``decomposition`` and ``cells`` (splitting the
+    points into cells and joining their routes, and solving them), and ``dynamic_programming`` (the exact solver of
+    small problems).
+
+    Counters: ``nodes_visited`` and ``ties`` (nearest neighbors steps, and those with several nearest neighbors),
+    ``starts`` (nearest neighbors routes built), ``moves`` (improving local search moves), ``kicks`` and
+    ``improvements`` (iterated local search perturbations, and those leading to a new best route) and ``mip_rounds``.
+
+    :param sink: Called with the name and the seconds of every phase as soon as it ends, e.g. to forward them to a
+        monitoring system, defaults to None
+    :type sink: Callable[[str, float], None], optional
+    """
+
+    def __init__(self, sink: Callable[[str, float], None] = None):
+        self.sink = sink
+        self.timings: Dict[str, float] = {}
+        self.counters: Dict[str, int] = {}
+
+    @contextmanager
+    def timer(self, phase: str):
+        """Context manager adding the time spent in its block to the phase."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - started
+            self.timings[phase] = self.timings.get(phase, 0.) + seconds
+            if self.sink is not None:
+                self.sink(phase, seconds)
+
+    def count(self, name: str, value: int = 1):
+        """Adds ``value`` to the counter."""
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def update(self, counters: Dict[str, int]):
+        """Adds counters, such as those collected in another process."""
+        for name, value in counters.items():
+            self.count(name, value)
+
+    def to_dict(self) -> dict:
+        """Returns the timings and the counters, e.g. to log them as JSON."""
+        return {'timings': dict(self.timings), 'counters': dict(self.counters)}
+
+    def __repr__(self):
+        return f'Metrics(timings={self.timings}, counters={self.counters})'
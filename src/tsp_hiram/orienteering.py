@@ -0,0 +1,486 @@
+import heapq
+import logging
+import random
+import time
+from collections import deque
+from typing import List, Tuple
+
+import numpy as np
+
+from tsp_hiram.candidates import DEFAULT_K, CandidateGraph, knn_candidates, knn_candidates_from_matrix
+from tsp_hiram.local_search import LocalSearch, distance_function
+from tsp_hiram.tour import Tour
+
+logger = logging.getLogger(__name__)
+
+# Minimum number of nearest neighbor routes built when the route may start anywhere
+DEFAULT_STARTS = 32
+
+# More routes are built as long as they visit fewer nodes than this in total, which covers every start of small inputs
+CONSTRUCTION_STEPS = 20000
+
+# Number of the best routes built which are then improved
+REFINED_ROUTES = 3
+
+
+def _symmetric_neighbors(candidates: CandidateGraph) -> List[List[int]]:
+    """Returns the neighbors of every node in the undirected version of the candidate graph."""
+    edges = candidates.edges()
+    from_nodes = np.concatenate([edges[:, 0], edges[:, 1]])
+    to_nodes = np.concatenate([edges[:, 1], edges[:, 0]])
+    order = np.argsort(from_nodes, kind='stable')
+    indptr = np.searchsorted(from_nodes[order], np.arange(len(candidates) + 1)).tolist()
+    to_nodes = to_nodes[order].tolist()
+    return [to_nodes[indptr[i]:indptr[i + 1]] for i in range(len(candidates))]
+
+
+class _Route:
+    """A route through some of the nodes as a loop of successor and predecessor lists, supporting O(1) insertions.
+
+    Open routes are loops through an extra depot node, at distance 0 from every node, the route going from the
+    successor of the depot to its predecessor. A fixed `start` is never removed, and an open route keeps it right
+    after the depot. Closed routes are read from `start`, which moves to another node if it is removed.
+    """
+
+    def __init__(self, n: int, closed: bool, start: int = None):
+        self.n = n
+        self.closed = closed
+        self.start = start
+        self.depot = None if closed else n
+        size = n if closed else n + 1
+        self.succ = [-1] * size
+        self.pred = [-1] * size
+        self.in_route = [False] * size
+        self.length = 0
+        self.count = 0
+        if not closed:
+            self.succ[n] = self.pred[n] = n
+            self.in_route[n] = True
+
+    def copy(self) -> '_Route':
+        route = _Route.__new__(_Route)
+        route.__dict__.update(self.__dict__)
+        route.succ, route.pred, route.in_route = self.succ[:], self.pred[:], self.in_route[:]
+        return route
+
+    def better_than(self, other: '_Route') -> bool:
+        """Whether the route visits more nodes, or as many with a shorter distance."""
+        return other is None or (self.count, -self.length) > (other.count, -other.length)
+
+    def insert(self, node: int, after: int, cost):
+        if self.count == 0 and self.closed:
+            self.succ[node] = self.pred[node] = node
+            self.start = node
+        else:
+            before = self.succ[after]
+            self.succ[after], self.pred[node], self.succ[node], self.pred[before] = node, after, before, node
+        self.in_route[node] = True
+        self.length += cost
+        self.count += 1
+
+    def remove(self, node: int, cost):
+        before, after = self.pred[node], self.succ[node]
+        if before == node:
+            self.succ[node] = self.pred[node] = -1
+        else:
+            self.succ[before], self.pred[after] = after, before
+            self.succ[node] = self.pred[node] = -1
+        self.in_route[node] = False
+        self.length -= cost
+        self.count -= 1
+        if self.closed and node == self.start:
+            self.start = after if after != node else None
+
+    def nodes(self) -> List[int]:
+        """Returns the nodes in the order they are visited, without the depot."""
+        first = self.start if self.closed else self.succ[self.depot]
+        if first is None or first == self.depot:
+            return []
+        order = [first]
+        node = self.succ[first]
+        while node != first and node != self.depot:
+            order.append(node)
+            node = self.succ[node]
+        return order
+
+    def tour(self) -> Tour:
+        order = self.nodes()
+        # a single node is a route without edges, like the routes of nearest_neighbor_path
+        return Tour.from_order(order, self.n, closed=self.closed and len(order) > 1)
+
+
+class _Orienteering:
+    """Builds and improves routes visiting as many nodes as possible within a distance budget."""
+
+    def __init__(self, distance, n: int, candidates: CandidateGraph, max_distance, closed: bool, start: int,
+                 rng: random.Random, deadline: float, distance_matrix=None, coordinates=None):
+        self.n = n
+        self.distance_matrix = None if distance_matrix is None else np.asarray(distance_matrix)
+        self.points = None if coordinates is None else np.asarray(coordinates, dtype=np.float64).reshape(-1, 2)
+        self.max_distance = max_distance
+        self.closed = closed
+        self.start = start
+        self.rng = rng
+        self.deadline = deadline
+        self.neighbors = _symmetric_neighbors(candidates)
+        self.real_distance = distance
+
+        depot = n
+        if closed:
+            self.distance = distance
+            self.search_distance = distance
+        else:
+            def depot_distance(a, b):
+                if a == depot or b == depot:
+                    return 0
+                return distance(a, b)
+
+            # while local search moves the nodes of an open route with a fixed start, every edge between the depot
+            # and another node than the start costs more than any route, so the start stays next to the depot
+            penalty = max_distance + 1
+
+            def search_distance(a, b):
+                if a == depot or b == depot:
+                    other = b if a == depot else a
+                    return 0 if start is None or other == start or other == depot else penalty
+                return distance(a, b)
+
+            self.distance = depot_distance
+            self.search_distance = search_distance if start is not None else depot_distance
+
+        self.reachable = self._reachable()
+
+    def _reachable(self) -> List[bool]:
+        """Prunes the nodes which can't be part of any route within the budget, using the triangle inequality."""
+        distance, budget = self.real_distance, self.max_distance
+        factor = 2 if self.closed else 1
+        if self.start is not None:
+            reachable = [factor * distance(self.start, v) <= budget for v in range(self.n)]
+        else:
+            # a node must at least reach its nearest neighbor and, for closed routes, come back
+            reachable = [
+                bool(self.neighbors[v]) and factor * min(distance(v, c) for c in self.neighbors[v]) <= budget
+                for v in range(self.n)
+            ]
+        if self.start is not None:
+            reachable[self.start] = True
+        return reachable
+
+    def seeds(self) -> List[int]:
+        """Returns the starting nodes to build routes from, in the densest areas first."""
+        if self.start is not None:
+            return [self.start]
+        nodes = [v for v in range(self.n) if self.reachable[v]]
+        if not nodes:
+            return [0] if self.n else []
+        spread = [max(self.real_distance(v, c) for c in self.neighbors[v]) for v in nodes]
+        return [nodes[i] for i in np.argsort(spread, kind='stable').tolist()]
+
+    def _distances_from(self, node: int) -> np.ndarray:
+        """Returns the distances from ``node`` to every node."""
+        if self.distance_matrix is not None:
+            return self.distance_matrix[node]
+        dx = self.points[:, 0] - self.points[node, 0]
+        dy = self.points[:, 1] - self.points[node, 1]
+        return np.trunc(np.sqrt(dx * dx + dy * dy))
+
+    def nearest_neighbor_route(self, seed: int) -> _Route:
+        """Builds a route from ``seed`` always going to the nearest node, until the next one would exceed the budget.
+
+        The nearest node is looked for among the candidates of the last node first, and among all nodes otherwise.
+        """
+        route = self.new_route(seed)
+        distance = self.real_distance
+        available = np.array(self.reachable, dtype=bool)
+        available[seed] = False
+        last = seed
+        while True:
+            nearest = [c for c in self.neighbors[last] if available[c]]
+            if nearest:
+                to_node = min(nearest, key=lambda c: (distance(last, c), c))
+            elif available.any():
+                to_node = int(np.argmin(np.where(available, self._distances_from(last), np.inf)))
+            else:
+                break
+
+            cost = distance(last, to_node)
+            if self.closed:
+                cost += distance(to_node, seed) - distance(last, seed)
+            if route.length + cost > self.max_distance:
+                break
+            route.insert(to_node, last, cost)
+            available[to_node] = False
+            last = to_node
+        return route
+
+    def new_route(self, seed: int) -> _Route:
+        route = _Route(self.n, self.closed, self.start)
+        if self.closed:
+            route.insert(seed, seed, 0)
+        else:
+            route.insert(seed, route.depot, 0)
+        return route
+
+    def _best_insertion(self, route: _Route, node: int):
+        """Returns the cheapest (cost, after) insertion of ``node`` next to one of its candidates in the route."""
+        distance, succ, pred = self.distance, route.succ, route.pred
+        best = None
+        for c in self.neighbors[node]:
+            if not route.in_route[c]:
+                continue
+            for a, b in ((pred[c], c), (c, succ[c])):
+                if a == route.depot and self.start is not None:
+                    continue  # nothing goes before a fixed start
+                cost = distance(a, node) + distance(node, b) - distance(a, b)
+                if best is None or cost < best[0]:
+                    best = (cost, a)
+        return best
+
+    def insert_greedily(self, route: _Route):
+        """Inserts the cheapest node next to one of its candidates in the route until the budget is exhausted."""
+        heap = []
+
+        def push(node):
+            if not route.in_route[node] and self.reachable[node]:
+                best = self._best_insertion(route, node)
+                if best is not None:
+                    heapq.heappush(heap, (best[0], node, best[1], route.succ[best[1]]))
+
+        pushed = set()
+        for c in route.nodes():
+            for node in self.neighbors[c]:
+                if node not in pushed:
+                    pushed.add(node)
+                    push(node)
+
+        while heap:
+            cost, node, a, b = heapq.heappop(heap)
+            if route.in_route[node]:
+                continue
+            if route.succ[a] != b:
+                # the edge was split by another insertion since
+                push(node)
+                continue
+            if route.length + cost > self.max_distance:
+                break
+            route.insert(node, a, cost)
+            for c in (a, node, b):
+                for neighbor in self.neighbors[c] if c < self.n else ():
+                    push(neighbor)
+
+    def shorten(self, route: _Route) -> _Route:
+        """Shortens the route with 2-opt and Or-opt moves, which leaves budget to insert more nodes.
+
+        The local search runs on the nodes of the route only, relabelled from 0, so its cost doesn't depend on the
+        number of nodes left out of the route.
+        """
+        if route.count < 4:
+            return route
+        labels = route.nodes() + ([] if self.closed else [route.depot])
+        local = {node: i for i, node in enumerate(labels)}
+        distance, search_distance = self.real_distance, self.search_distance
+
+        indptr, indices = [0], []
+        for node in labels:
+            if node < self.n:
+                neighbors = sorted((c for c in self.neighbors[node] if c in local), key=lambda c: (distance(node, c), c))
+                indices += [local[c] for c in neighbors]
+            indptr.append(len(indices))
+
+        search = LocalSearch(Tour.from_order(range(len(labels)), len(labels), closed=True),
+                             lambda a, b: search_distance(labels[a], labels[b]), CandidateGraph(indptr, indices))
+        if not search.run(deadline=self.deadline):
+            return route
+
+        route = route.copy()
+        order = [labels[i] for i in search.tour().order().tolist()]
+        if not self.closed and order[-1] != route.depot and order[1] == route.depot:
+            # the loop may come back travelled the other way, an open route must still start after the depot
+            order = order[:1] + order[1:][::-1]
+        for before, after in zip(order, order[1:] + order[:1]):
+            route.succ[before], route.pred[after] = after, before
+        nodes = route.nodes()
+        route.length = sum(distance(a, b) for a, b in zip(nodes[:-1], nodes[1:]))
+        if self.closed:
+            route.length += distance(nodes[-1], nodes[0])
+        return route
+
+    def perturb(self, route: _Route) -> _Route:
+        """Removes the nodes whose removal saves the most, or a random section of the route."""
+        route = route.copy()
+        nodes = [v for v in route.nodes() if v != self.start]
+        if not nodes:
+            return route
+        distance = self.distance
+
+        def saving(v):
+            return distance(route.pred[v], v) + distance(v, route.succ[v]) - distance(route.pred[v], route.succ[v])
+
+        if self.rng.random() < 0.5:
+            savings = sorted(nodes, key=saving, reverse=True)
+            removed = [self.rng.choice(savings[:5])]
+        else:
+            first = self.rng.choice(nodes)
+            removed = [first]
+            for _ in range(self.rng.randint(0, 2)):
+                following = route.succ[removed[-1]]
+                if following == route.depot or following == self.start or following == first:
+                    break
+                removed.append(following)
+
+        for v in removed:
+            route.remove(v, saving(v))
+        return route
+
+    def expired(self) -> bool:
+        return self.deadline is not None and time.monotonic() >= self.deadline
+
+    def improve(self, route: _Route, max_iterations: int, n_reachable: int) -> _Route:
+        """Shortens the route to insert more nodes, then tries removing a few nodes and inserting others instead."""
+        route = self.shorten(route)
+        self.insert_greedily(route)
+        current = route
+        for _ in range(max_iterations):
+            if current.count == n_reachable or self.expired():
+                break
+            route = self.shorten(self.perturb(current))
+            self.insert_greedily(route)
+            if route.better_than(current):
+                current = route
+        return current
+
+    def solve(self, starts: int, max_iterations: int) -> _Route:
+        n_reachable = sum(self.reachable)
+        steps = 0
+        routes = []
+        covered = set()
+        deferred = []
+        seeds = deque(self.seeds())
+        # the first route is built even when out of time, so there is always one to return
+        while seeds and not (routes and self.expired()):
+            if len(routes) >= (starts or DEFAULT_STARTS) and (starts is not None or steps >= CONSTRUCTION_STEPS):
+                break
+            seed = seeds.popleft()
+            # a route from a node already visited by another one would mostly visit the same nodes, so those are
+            # only tried once every other node was
+            if seed in covered:
+                deferred.append(seed)
+            else:
+                routes.append(self.nearest_neighbor_route(seed))
+                steps += routes[-1].count
+                if routes[-1].count == n_reachable:
+                    break
+                covered.update(routes[-1].nodes())
+            if not seeds:
+                seeds, deferred, covered = deque(deferred), [], set()
+
+        routes.sort(key=lambda route: (-route.count, route.length))
+        best = None
+        for route in routes[:REFINED_ROUTES]:
+            if self.expired() and best is not None:
+                break
+            route = self.improve(route, max_iterations, n_reachable)
+            logger.info(f'Route from node {route.nodes()[0]} visits {route.count} nodes for distance {route.length}.')
+            if route.better_than(best):
+                best = route
+        return best
+
+
+def orienteering(distance_matrix=None, max_distance=None, closed: bool = False, start: int = None,
+                 coordinates=None, candidates: CandidateGraph = None, starts: int = None,
+                 max_iterations: int = 50, max_seconds: float = None, exact: bool = False,
+                 rng: random.Random = None) -> Tuple[Tour, int]:
+    """Finds a route visiting as many nodes as possible with a total distance of at most `max_distance`.
+
+    Nodes which can't be reached within the budget are pruned first. Nearest neighbor routes are then built from
+    up to `starts` nodes, in the densest areas first, and the best ones are improved: shortening them with 2-opt and
+    Or-opt moves leaves budget to insert the nodes lengthening the route the least next to one of their candidate
+    neighbors, and removing a few nodes before doing so again often fits in more nodes or visits as many for less
+    distance.
+
+    :param distance_matrix: Symmetric distance matrix such as returned from `compute_euclidean_distance_matrix`, or
+        None to compute truncated euclidean distances from `coordinates`, defaults to None
+    :type distance_matrix: Matrix, optional
+    :param max_distance: The maximum distance of the route
+    :type max_distance: int
+    :param closed: Whether the route returns to its start, defaults to False
+    :type closed: bool, optional
+    :param start: The node the route starts from, defaults to any node
+    :type start: int, optional
+    :param coordinates: Coordinates of the nodes, only used when `distance_matrix` is None, defaults to None
+    :type coordinates: CoordinatesVector, optional
+    :param candidates: The neighbors each node may be inserted next to, defaults to its DEFAULT_K nearest neighbors
+    :type candidates: CandidateGraph, optional
+    :param starts: The number of routes built when there is no fixed start, defaults to DEFAULT_STARTS or more while
+        they visit less than CONSTRUCTION_STEPS nodes in total
+    :type starts: int, optional
+    :param max_iterations: The number of removals and reinsertions tried on each improved route, defaults to 50
+    :type max_iterations: int, optional
+    :param max_seconds: Return the best route found after this time, defaults to None
+    :type max_seconds: float, optional
+    :param exact: Also solve the problem exactly with a MIP warm started from the best route found, which is only
+        practical for a few dozen nodes. The MIP stops after max_seconds, defaults to False
+    :type exact: bool, optional
+    :param rng: Random number generator choosing the removed nodes, defaults to the `random` module
+    :type rng: random.Random, optional
+    :return: The route, its distance
+    :rtype: Tuple[Tour, int]
+    """
+    assert max_distance is not None, 'A max distance is required.'
+    deadline = None if max_seconds is None else time.monotonic() + max_seconds
+    distance, n = distance_function(distance_matrix, coordinates)
+    if start is not None:
+        assert 0 <= start < n, f'Starting node ({start}) must be within range 0 to {n}'
+    if n == 0:
+        return Tour(np.empty(0, dtype=np.int32)), 0
+    if candidates is None:
+        if distance_matrix is None:
+            candidates = knn_candidates(coordinates, DEFAULT_K)
+        else:
+            candidates = knn_candidates_from_matrix(distance_matrix, DEFAULT_K)
+
+    search = _Orienteering(distance, n, candidates, max_distance, closed, start, rng or random, deadline,
+                           distance_matrix=distance_matrix, coordinates=coordinates)
+    route = search.solve(starts, max_iterations)
+    tour, length = route.tour(), route.length
+
+    if exact:
+        if distance_matrix is None:
+            from tsp_hiram.distance import euclidean_distance_matrix
+            distance_matrix = euclidean_distance_matrix(coordinates)
+        tour, length = _solve_exact(distance_matrix, max_distance, closed, start, tour, length, max_seconds)
+
+    return tour, length
+
+
+def _solve_exact(distance_matrix, max_distance, closed: bool, start: int, tour: Tour, length,
+                 max_seconds: float) -> Tuple[Tour, int]:
+    """Solves the orienteering MIP warm started from `tour`, returning `tour` unless a better route is found."""
+    from mip import OptimizationStatus
+
+    from tsp_hiram.formulations import orienteering_model, tour_from_orienteering_solution
+
+    distance_matrix = np.asarray(distance_matrix)
+    n = len(distance_matrix)
+    model, x, y = orienteering_model(distance_matrix, max_distance, closed=closed, start=start)
+
+    order = tour.order().tolist()
+    used = set(tour.edges())
+    if not closed and order:
+        used |= {(n, order[0]), (order[-1], n)}
+    elif closed and len(order) == 1:
+        order = []  # a single node isn't a loop in the model
+    model.start = [(var, float(arc in used)) for arc, var in x.items()] + [(y[v], float(v in order)) for v in y]
+    root = model.var_by_name(f'root({order[0]})') if closed and start is None and order else None
+    if root is not None:
+        model.start += [(root, 1.0)]
+
+    model.optimize(max_seconds=max_seconds if max_seconds is not None else np.inf)
+    if model.status not in [OptimizationStatus.OPTIMAL, OptimizationStatus.FEASIBLE]:
+        return tour, length
+
+    exact_tour = tour_from_orienteering_solution(x, y, n, closed, start)
+    exact_length = exact_tour.length(distance_matrix)
+    if (len(exact_tour), -exact_length) > (len(tour), -length):
+        return exact_tour, exact_length
+    return tour, length
@@ -0,0 +1,67 @@
+import os
+
+import numpy as np
+
+
+def resolve_workers(workers: int = None) -> int:
+    """Returns the number of worker processes to use, all available CPUs if `workers` is None.
+
+    :param workers: The requested number of workers
+    :type workers: int, optional
+    :return: The number of workers, at least 1
+    :rtype: int
+    """
+    if workers is None:
+        workers = len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else os.cpu_count()
+    if workers < 1:
+        raise ValueError(f'The number of workers must be at least 1, not {workers}.')
+    return workers
+
+
+def share_array(array: np.ndarray):
+    """Copies an array into a new block of shared memory so worker processes can map it without copying.
+
+    The caller owns the block and must ``close()`` and ``unlink()`` it once the workers are done.
+
+    :param array: The array to share
+    :type array: np.ndarray
+    :return: The shared memory block, a picklable spec to pass to `attach_array` in the workers
+    :rtype: Tuple[multiprocessing.shared_memory.SharedMemory, Tuple]
+    """
+    from multiprocessing import shared_memory
+
+    array = np.ascontiguousarray(array)
+    shm = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+    np.ndarray(array.shape, dtype=array.dtype, buffer=shm.buf)[...] = array
+    return shm, (shm.name, array.shape, array.dtype.str)
+
+
+def attach_array(spec):
+    """Maps an array shared with `share_array` into the current process without copying it.
+
+    :param spec: The spec returned by `share_array`
+    :type spec: Tuple
+    :return: The shared memory block, which must be kept alive as long as the array is used, and the read-only array
+    :rtype: Tuple[multiprocessing.shared_memory.SharedMemory, np.ndarray]
+    """
+    from multiprocessing import shared_memory
+
+    name, shape, dtype = spec
+    shm = shared_memory.SharedMemory(name=name)
+    array = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+    array.flags.writeable = False
+    return shm, array
+
+
+def spawn_seed(seed: int, index: int) -> int:
+    """Derives the seed of the ``index``-th independent random stream of `seed`, such as the stream of one worker or one
+    instance of a batch, so results don't depend on how the work is scheduled.
+
+    :param seed: The seed of the whole run
+    :type seed: int
+    :param index: The number of the stream
+    :type index: int
+    :return: A seed below 2**31, which CBC accepts too
+    :rtype: int
+    """
+    return int(np.random.SeedSequence(seed, spawn_key=(index,)).generate_state(1)[0]) >> 1
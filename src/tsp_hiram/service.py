@@ -0,0 +1,284 @@
+import asyncio
+import hashlib
+import json
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Tuple
+
+import numpy as np
+
+from tsp_hiram.batch import _Worker
+from tsp_hiram.parallel import resolve_workers
+
+# Default number of distinct requests solved or waiting for a worker before new ones are rejected
+DEFAULT_MAX_PENDING = 64
+
+# Largest request body accepted by the HTTP endpoint, in bytes
+MAX_BODY_BYTES = 64 * 2 ** 20
+
+# Keyword arguments of `optimize` which HTTP requests may set
+REQUEST_OPTIONS = frozenset([
+    'max_distance', 'starting_node', 'closed', 'use_nearest_neighbors', 'matrix_free', 'candidate_neighbors', 'improve',
+    'max_seconds', 'anytime', 'seed', 'metric', 'construction', 'max_gap', 'dynamic_programming',
+])
+
+_REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed', 413: 'Payload Too Large',
+            500: 'Internal Server Error', 503: 'Service Unavailable'}
+
+
+class ServiceOverloaded(RuntimeError):
+    """Raised when a `SolverService` already has as many pending requests as it accepts."""
+
+
+def request_key(coordinates, options: dict) -> str:
+    """Returns the hex digest identifying a request, the same for equal coordinates and options."""
+    points = np.ascontiguousarray(coordinates, dtype=np.float64).reshape(-1, 2)
+    digest = hashlib.sha256()
+    digest.update(repr((sorted(options.items()), points.shape)).encode())
+    digest.update(points.tobytes())
+    return digest.hexdigest()
+
+
+class _Job:
+    """A request being solved and the number of callers waiting for it."""
+
+    __slots__ = ('task', 'waiters')
+
+    def __init__(self, task: asyncio.Future):
+        self.task = task
+        self.waiters = 0
+
+
+class SolverService:
+    """Solves requests with `optimize` in a pool of worker processes, for use from asyncio code.
+
+    Requests wait in a queue bounded by `max_pending` for a free worker, and are rejected with `ServiceOverloaded` once
+    it is full. Identical requests made while one is in flight share its result. A request is cancelled once every
+    caller waiting for it is cancelled, which kills its worker, so branch and cut and the heuristics stop right away
+    and a fresh worker takes its place.
+
+    :param workers: Number of worker processes, all available CPUs if None, defaults to None
+    :type workers: int, optional
+    :param max_pending: Number of distinct requests accepted at once, defaults to DEFAULT_MAX_PENDING
+    :type max_pending: int, optional
+    """
+
+    def __init__(self, workers: int = None, max_pending: int = DEFAULT_MAX_PENDING):
+        assert max_pending > 0, 'max_pending must be positive.'
+        self.workers = resolve_workers(workers)
+        self.max_pending = max_pending
+        self._context = multiprocessing.get_context()
+        self._idle = None
+        self._threads = None
+        self._jobs = {}
+        self._tasks = set()
+
+    async def __aenter__(self) -> 'SolverService':
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def start(self):
+        """Starts the worker processes."""
+        self._idle = asyncio.Queue()
+        # one thread per worker waits for its result, so the event loop never blocks
+        self._threads = ThreadPoolExecutor(self.workers)
+        for _ in range(self.workers):
+            self._idle.put_nowait(_Worker(self._context))
+
+    async def close(self):
+        """Cancels the pending requests and stops the worker processes."""
+        tasks = list(self._tasks)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        while not self._idle.empty():
+            self._idle.get_nowait().stop()
+        self._threads.shutdown()
+
+    def pending(self) -> int:
+        """Returns the number of distinct requests being solved or waiting for a worker."""
+        return len(self._jobs)
+
+    async def solve(self, coordinates, **options) -> Tuple[List[Tuple[int, int]], int]:
+        """Solves the coordinates with `optimize` in a worker process.
+
+        :param coordinates: A sequence or array of 2D coordinates
+        :type coordinates: CoordinatesVector or np.ndarray
+        :param options: Keyword arguments of `optimize`, which must be picklable
+        :raises ServiceOverloaded: If `max_pending` other requests are pending
+        :return: The edges of the route, the distance of the route
+        :rtype: Tuple[List[Tuple[int, int]], int]
+        """
+        key = request_key(coordinates, options)
+        job = self._jobs.get(key)
+        if job is None:
+            if len(self._jobs) >= self.max_pending:
+                raise ServiceOverloaded(f'{len(self._jobs)} requests are already pending.')
+            job = self._jobs[key] = _Job(asyncio.ensure_future(self._run(coordinates, options)))
+            self._tasks.add(job.task)
+            job.task.add_done_callback(self._tasks.discard)
+            job.task.add_done_callback(lambda _: self._forget(key, job))
+
+        job.waiters += 1
+        try:
+            return await asyncio.shield(job.task)
+        finally:
+            job.waiters -= 1
+            if job.waiters == 0 and not job.task.done():
+                # later identical requests start over instead of sharing the cancelled job
+                self._forget(key, job)
+                job.task.cancel()
+
+    def _forget(self, key: str, job: _Job):
+        if self._jobs.get(key) is job:
+            del self._jobs[key]
+
+    async def _run(self, coordinates, options: dict):
+        worker = await self._idle.get()
+        try:
+            worker.submit(0, coordinates, options, None)
+        except BaseException:
+            self._idle.put_nowait(worker)
+            raise
+
+        future = self._threads.submit(worker.result)
+        try:
+            result = await asyncio.wrap_future(future)
+        except asyncio.CancelledError:
+            # the waiting thread returns once the process is gone, then the pipe can be closed
+            worker.process.kill()
+            future.add_done_callback(lambda _: worker.kill())
+            self._idle.put_nowait(_Worker(self._context))
+            raise
+
+        if result.error is not None and not worker.process.is_alive():
+            worker.kill()
+            worker = _Worker(self._context)
+        self._idle.put_nowait(worker)
+
+        if result.error is not None:
+            raise result.error
+        return result.route, result.distance
+
+    async def start_server(self, host: str = '127.0.0.1', port: int = 8000) -> asyncio.AbstractServer:
+        """Starts the HTTP endpoint solving the JSON requests posted to ``/solve``.
+
+        The body of a request is an object with the ``coordinates`` as a list of [x, y] pairs and any of the
+        REQUEST_OPTIONS, and the response an object with the ``route`` as a list of [from_node, to_node] edges and its
+        ``distance``. ``GET /health`` returns the number of pending requests. Closing the connection before the response
+        is sent cancels the request.
+
+        :param host: The interface to listen on, defaults to '127.0.0.1'
+        :type host: str, optional
+        :param port: The port to listen on, 0 for any free port, defaults to 8000
+        :type port: int, optional
+        :rtype: asyncio.AbstractServer
+        """
+        return await asyncio.start_server(self._handle, host, port)
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            response = await self._respond(reader)
+            if response is not None:
+                status, payload = response
+                body = json.dumps(payload).encode()
+                head = [f'HTTP/1.1 {status} {_REASONS[status]}', 'Content-Type: application/json',
+                        f'Content-Length: {len(body)}', 'Connection: close']
+                if status == 503:
+                    head.append('Retry-After: 1')
+                writer.write(('\r\n'.join(head) + '\r\n\r\n').encode('latin-1') + body)
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _respond(self, reader: asyncio.StreamReader):
+        """Returns the status and the payload of the response, or None if the client went away."""
+        try:
+            method, path, _ = (await reader.readline()).decode('latin-1').split(' ', 2)
+            headers = {}
+            while True:
+                line = (await reader.readline()).decode('latin-1').strip()
+                if not line:
+                    break
+                name, _, value = line.partition(':')
+                headers[name.strip().lower()] = value.strip()
+            length = int(headers.get('content-length', 0))
+        except ValueError:
+            return 400, {'error': 'Malformed request.'}
+
+        if path.split('?')[0] == '/health':
+            return 200, {'pending': self.pending(), 'max_pending': self.max_pending}
+        if path.split('?')[0] != '/solve':
+            return 404, {'error': f'No such path {path}.'}
+        if method != 'POST':
+            return 405, {'error': 'Use POST to solve.'}
+        if length > MAX_BODY_BYTES:
+            return 413, {'error': f'The body is larger than {MAX_BODY_BYTES} bytes.'}
+
+        try:
+            request = json.loads(await reader.readexactly(length))
+            coordinates = request.pop('coordinates')
+            unknown = set(request) - REQUEST_OPTIONS
+            if unknown:
+                raise ValueError(f'Unknown options {sorted(unknown)}.')
+        except (ValueError, KeyError, TypeError, AttributeError) as e:
+            return 400, {'error': f'Invalid request: {e}'}
+
+        solving = asyncio.ensure_future(self.solve(coordinates, **request))
+        try:
+            while not solving.done():
+                received = asyncio.ensure_future(reader.read(2 ** 16))
+                try:
+                    await asyncio.wait([solving, received], return_when=asyncio.FIRST_COMPLETED)
+                finally:
+                    received.cancel()
+                if received.done() and not received.cancelled() and not received.result() and not solving.done():
+                    # the client closed the connection
+                    solving.cancel()
+                    return None
+        except asyncio.CancelledError:
+            solving.cancel()
+            raise
+
+        try:
+            route, distance = solving.result()
+        except ServiceOverloaded as e:
+            return 503, {'error': str(e)}
+        except (ValueError, AssertionError, TypeError) as e:
+            return 400, {'error': f'{type(e).__name__}: {e}'}
+        except Exception as e:
+            return 500, {'error': f'{type(e).__name__}: {e}'}
+        return 200, {'route': route, 'distance': distance}
+
+
+async def solve(coordinates, service: SolverService = None, **options) -> Tuple[List[Tuple[int, int]], int]:
+    """Solves the coordinates with `optimize` in a worker process without blocking the event loop.
+
+    Cancelling the call stops the solver. Pass a running `SolverService` to reuse its workers and share identical
+    requests, otherwise a single worker is started for this call.
+
+    :param coordinates: A sequence or array of 2D coordinates
+    :type coordinates: CoordinatesVector or np.ndarray
+    :param service: The service solving the request, defaults to None
+    :type service: SolverService, optional
+    :param options: Keyword arguments of `optimize`
+    :return: The edges of the route, the distance of the route
+    :rtype: Tuple[List[Tuple[int, int]], int]
+    """
+    if service is not None:
+        return await service.solve(coordinates, **options)
+    async with SolverService(workers=1) as service:
+        return await service.solve(coordinates, **options)
+
+
+async def serve(host: str = '127.0.0.1', port: int = 8000, workers: int = None, max_pending: int = DEFAULT_MAX_PENDING):
+    """Runs the HTTP endpoint of a `SolverService` until cancelled, see `SolverService.start_server`."""
+    async with SolverService(workers, max_pending=max_pending) as service:
+        server = await service.start_server(host, port)
+        async with server:
+            await server.serve_forever()
@@ -0,0 +1,253 @@
+import math
+
+import numpy as np
+
+
+class GridIndex:
+    """Uniform grid over 2D coordinates answering nearest-neighbor queries without a distance matrix.
+
+    Points are bucketed into square cells holding about ``points_per_cell`` points each and can be removed
+    from the index, e.g. once they have been visited. A query scans rings of cells around the query point and
+    stops as soon as no unscanned cell can hold a closer point, so memory stays O(n) and queries on evenly
+    spread points take constant time.
+
+    Distances match `tsp_hiram.distance.euclidean_distance_matrix`, including the truncation to integers.
+
+    :param coordinates: A sequence or array of 2D coordinates
+    :type coordinates: CoordinatesVector or np.ndarray
+    :param truncate: Truncate distances to integers, defaults to True
+    :type truncate: bool, optional
+    :param points_per_cell: Average number of points per cell, defaults to 2
+    :type points_per_cell: int, optional
+    """
+
+    def __init__(self, coordinates, truncate: bool = True, points_per_cell: int = 2):
+        self.points = np.asarray(coordinates, dtype=np.float64).reshape(-1, 2)
+        self.truncate = truncate
+        n = len(self.points)
+
+        # plain lists are much faster than ndarrays for the scalar lookups done in distance()
+        self._x = self.points[:, 0].tolist()
+        self._y = self.points[:, 1].tolist()
+
+        if n:
+            self.origin = self.points.min(axis=0)
+            extent = self.points.max(axis=0) - self.origin
+        else:
+            self.origin = np.zeros(2)
+            extent = np.zeros(2)
+        # cells hold about points_per_cell points when spread evenly, also when all points lie on a line
+        density = points_per_cell / max(n, 1)
+        self.cell_size = max(math.sqrt(extent[0] * extent[1] * density), extent.max() * density) or 1.0
+        self.shape = tuple(int(extent[axis] // self.cell_size) + 1 for axis in range(2))
+
+        cells = ((self.points - self.origin) // self.cell_size).astype(np.int64)
+        self._cell_x = cells[:, 0].tolist()
+        self._cell_y = cells[:, 1].tolist()
+        cell_ids = cells[:, 0] * self.shape[1] + cells[:, 1]
+
+        # points sorted by cell, cell c holding order[cell_start[c]:cell_start[c + 1]]
+        self._order = np.argsort(cell_ids, kind='stable')
+        self._cell_start = np.searchsorted(cell_ids[self._order], np.arange(self.shape[0] * self.shape[1] + 1))
+        self._alive_in_cell = np.diff(self._cell_start)
+        self._alive = np.ones(n, dtype=bool)
+        self._alive_points = np.arange(n)
+        self._n_alive = n
+        self._ring_offsets = {}
+
+    def __len__(self):
+        return len(self.points)
+
+    @property
+    def n_alive(self) -> int:
+        """Number of points which have not been removed."""
+        return self._n_alive
+
+    def distance(self, a: int, b: int):
+        """Distance between the points ``a`` and ``b``."""
+        dx = self._x[a] - self._x[b]
+        dy = self._y[a] - self._y[b]
+        d = math.sqrt(dx * dx + dy * dy)
+        return int(d) if self.truncate else d
+
+    def remove(self, i: int):
+        """Removes point ``i`` from the index so it is no longer returned by `nearest`."""
+        if not self._alive[i]:
+            return
+        self._alive[i] = False
+        self._n_alive -= 1
+        self._alive_in_cell[self._cell_x[i] * self.shape[1] + self._cell_y[i]] -= 1
+
+        # drop removed points from the brute force candidates once they make up half of them
+        if self._n_alive <= len(self._alive_points) // 2:
+            self._alive_points = self._alive_points[self._alive[self._alive_points]]
+
+    def _distances_to(self, i: int, candidates: np.ndarray) -> np.ndarray:
+        dx = self.points[candidates, 0] - self._x[i]
+        dy = self.points[candidates, 1] - self._y[i]
+        d = np.sqrt(dx * dx + dy * dy)
+        return np.trunc(d) if self.truncate else d
+
+    def _ring(self, cx: int, cy: int, radius: int) -> np.ndarray:
+        """Returns the alive points in the cells at Chebyshev distance ``radius`` from cell (cx, cy)."""
+        if radius not in self._ring_offsets:
+            side = np.arange(-radius, radius + 1)
+            inner = side[1:-1]
+            self._ring_offsets[radius] = (
+                np.concatenate([side, side, np.full(len(inner), -radius), np.full(len(inner), radius)]) if radius else side,
+                np.concatenate([np.full(len(side), -radius), np.full(len(side), radius), inner, inner]) if radius else side,
+            )
+        xs, ys = self._ring_offsets[radius]
+
+        if radius <= 2:
+            # NumPy overhead dominates for the few cells of the innermost rings
+            width, height = self.shape
+            cells = [
+                x * height + y for x, y in zip((xs + cx).tolist(), (ys + cy).tolist())
+                if 0 <= x < width and 0 <= y < height
+            ]
+            cells = [c for c in cells if self._alive_in_cell[c] > 0]
+        else:
+            xs = xs + cx
+            ys = ys + cy
+            inside = (xs >= 0) & (xs < self.shape[0]) & (ys >= 0) & (ys < self.shape[1])
+            cells = xs[inside] * self.shape[1] + ys[inside]
+            cells = cells[self._alive_in_cell[cells] > 0].tolist()
+
+        if not cells:
+            return np.empty(0, dtype=self._order.dtype)
+        cell_start = self._cell_start
+        points = np.concatenate([self._order[cell_start[c]:cell_start[c + 1]] for c in cells])
+        return points[self._alive[points]]
+
+    def nearest(self, i: int):
+        """Finds the alive points nearest to point ``i``.
+
+        :param i: The point to search from. It is only a candidate itself if it has not been removed.
+        :type i: int
+        :return: The indices of all alive points tied for the shortest distance in ascending order, the distance
+        :rtype: Tuple[np.ndarray, float]
+        """
+        if self._n_alive == 0:
+            raise ValueError('All points have been removed from the index.')
+
+        cx, cy = self._cell_x[i], self._cell_y[i]
+        max_radius = max(cx, cy, self.shape[0] - 1 - cx, self.shape[1] - 1 - cy)
+        found = []
+        found_distances = []
+        candidates = None
+        best = math.inf
+        radius = 0
+        while radius <= max_radius:
+            # scanning a ring costs more than checking every alive point once the rings get too wide
+            if 8 * radius > self._n_alive:
+                candidates = self._alive_points[self._alive[self._alive_points]]
+                break
+
+            points = self._ring(cx, cy, radius)
+            if len(points):
+                distances = self._distances_to(i, points)
+                found.append(points)
+                found_distances.append(distances)
+                best = min(best, distances.min())
+
+            # every point outside the rings scanned so far is at least radius * cell_size away
+            if self.truncate and radius * self.cell_size >= best + 1:
+                break
+            elif not self.truncate and radius * self.cell_size > best:
+                break
+            radius += 1
+
+        if candidates is None:
+            candidates = np.concatenate(found)
+            distances = np.concatenate(found_distances)
+        else:
+            distances = self._distances_to(i, candidates)
+        shortest = distances.min()
+        ties = np.sort(candidates[distances == shortest])
+        return ties, (int(shortest) if self.truncate else float(shortest))
+
+    def k_nearest(self, k: int):
+        """Finds the ``k`` nearest other points of every point, ignoring removals.
+
+        :param k: The number of neighbors, reduced to n - 1 if there are not enough points
+        :type k: int
+        :return: An (n, k) array of neighbors sorted by increasing distance then index, and their untruncated distances
+        :rtype: Tuple[np.ndarray, np.ndarray]
+        """
+        n = len(self.points)
+        k = min(k, n - 1)
+        neighbors = np.empty((n, max(k, 0)), dtype=np.int64)
+        distances = np.empty((n, max(k, 0)), dtype=np.float64)
+        if k <= 0:
+            return neighbors, distances
+
+        width, height = self.shape
+        for cell in np.flatnonzero(np.diff(self._cell_start)).tolist():
+            members = self._order[self._cell_start[cell]:self._cell_start[cell + 1]]
+            cx, cy = divmod(cell, height)
+
+            # widen the square of cells around this one until no point outside it can be among the k nearest
+            radius = 0
+            while True:
+                x_cells = np.arange(max(cx - radius, 0), min(cx + radius, width - 1) + 1)
+                y_cells = np.arange(max(cy - radius, 0), min(cy + radius, height - 1) + 1)
+                cells = (x_cells[:, None] * height + y_cells[None, :]).ravel()
+                candidates = np.concatenate([self._order[self._cell_start[c]:self._cell_start[c + 1]] for c in cells.tolist()])
+                if len(candidates) > k:
+                    delta = self.points[members, None, :] - self.points[None, candidates, :]
+                    d = np.sqrt(np.einsum('ijk,ijk->ij', delta, delta))
+                    d[members[:, None] == candidates[None, :]] = np.inf
+                    nearest = np.argpartition(d, k - 1, axis=1)[:, :k]
+                    kth = np.take_along_axis(d, nearest, axis=1).max()
+                    covers_grid = radius >= max(cx, cy, width - 1 - cx, height - 1 - cy)
+                    if kth < radius * self.cell_size or covers_grid:
+                        break
+                radius += 1
+
+            # sort each row by distance, breaking ties by index
+            order = np.lexsort((np.broadcast_to(candidates, d.shape), d), axis=1)[:, :k]
+            neighbors[members] = candidates[order]
+            distances[members] = np.take_along_axis(d, order, axis=1)
+
+        return neighbors, distances
+
+
+def hilbert_order(coordinates, bits: int = 16) -> np.ndarray:
+    """Sorts the coordinates along a Hilbert curve, so points close in the order are close in the plane.
+
+    The bounding square of the points is divided into a ``2**bits`` by ``2**bits`` grid and the cells are numbered in
+    the order the curve visits them. Any contiguous run of the order covers a compact region, which is what makes it
+    a good partition into cells and a good route through them.
+
+    :param coordinates: A sequence or array of 2D coordinates
+    :type coordinates: CoordinatesVector or np.ndarray
+    :param bits: Resolution of the grid in bits per axis, at most 31, defaults to 16
+    :type bits: int, optional
+    :return: The nodes in the order the curve visits them, points in the same cell kept in their original order
+    :rtype: np.ndarray
+    """
+    assert 0 < bits < 32, 'The grid must have between 1 and 31 bits per axis.'
+    points = np.asarray(coordinates, dtype=np.float64).reshape(-1, 2)
+    if not len(points):
+        return np.empty(0, dtype=np.int64)
+
+    side = 2 ** bits
+    origin = points.min(axis=0)
+    extent = (points.max(axis=0) - origin).max() or 1.0
+    cells = np.minimum(((points - origin) / extent * side).astype(np.int64), side - 1)
+    x, y = cells[:, 0], cells[:, 1]
+
+    keys = np.zeros(len(points), dtype=np.int64)
+    s = side // 2
+    while s:
+        rx = (x & s) > 0
+        ry = (y & s) > 0
+        keys += s * s * ((3 * rx) ^ ry)
+        # rotate the quadrant so the curve inside it has the orientation of the whole curve
+        flip = ~ry & rx
+        x = np.where(flip, side - 1 - x, x)
+        y = np.where(flip, side - 1 - y, y)
+        x, y = np.where(ry, x, y), np.where(ry, y, x)
+        s //= 2
+    return np.argsort(keys, kind='stable')
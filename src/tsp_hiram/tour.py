@@ -0,0 +1,142 @@
+from typing import List, Tuple
+
+import numpy as np
+
+
+class Tour:
+    """A route through a subset of the nodes, stored as the successor of each node.
+
+    ``successors[i]`` is the node visited after node ``i``, or -1 if ``i`` has no successor because it is the
+    last node of an open route or is not part of the route. A closed route returns to its start, so every node
+    of it has a successor. Converting to and from edges or visiting orders takes O(n).
+
+    :param successors: The successor of each node, -1 for nodes without one
+    :type successors: np.ndarray
+    :param start: The first node of the route, defaults to the node without a predecessor for open routes and the
+        lowest node of the route for closed ones
+    :type start: int, optional
+    """
+
+    __slots__ = ('successors', 'start')
+
+    def __init__(self, successors, start: int = None):
+        self.successors = np.ascontiguousarray(successors, dtype=np.int32)
+        if start is None:
+            from_nodes = np.flatnonzero(self.successors >= 0)
+            if len(from_nodes):
+                # an open route starts at the only node which is not the successor of another one
+                has_predecessor = np.zeros(len(self.successors), dtype=bool)
+                has_predecessor[self.successors[from_nodes]] = True
+                heads = from_nodes[~has_predecessor[from_nodes]]
+                start = int(heads[0]) if len(heads) else int(from_nodes[0])
+        self.start = start
+
+    @classmethod
+    def from_order(cls, order, n: int, closed: bool = True) -> 'Tour':
+        """Creates a route visiting the nodes in the given order.
+
+        :param order: The nodes in the order they are visited, without repeating the first one
+        :type order: Sequence[int]
+        :param n: The total number of nodes
+        :type n: int
+        :param closed: Whether the route returns from the last node to the first one, defaults to True
+        :type closed: bool, optional
+        :rtype: Tour
+        """
+        order = np.asarray(order, dtype=np.int32)
+        successors = np.full(n, -1, dtype=np.int32)
+        if len(order):
+            successors[order[:-1]] = order[1:]
+            if closed:
+                successors[order[-1]] = order[0]
+        return cls(successors, start=int(order[0]) if len(order) else None)
+
+    @classmethod
+    def from_edges(cls, edges: List[Tuple], n: int, start: int = None) -> 'Tour':
+        """Creates a route from its (from_node, to_node) edges.
+
+        :param edges: The edges of the route in any order
+        :type edges: List[Tuple]
+        :param n: The total number of nodes
+        :type n: int
+        :param start: The first node of the route, defaults to the first node of a path or the lowest node of a loop
+        :type start: int, optional
+        :rtype: Tour
+        """
+        successors = np.full(n, -1, dtype=np.int32)
+        if len(edges):
+            edges = np.asarray(edges, dtype=np.int32).reshape(-1, 2)
+            successors[edges[:, 0]] = edges[:, 1]
+        return cls(successors, start=start)
+
+    @classmethod
+    def from_matrix(cls, route_matrix) -> 'Tour':
+        """Creates a route from a matrix indicating which edges are used, such as returned by older versions.
+
+        :param route_matrix: A matrix with a 1 at (i, j) if the route goes from node i to node j
+        :type route_matrix: Matrix
+        :raises ValueError: If a node is left more than once
+        :rtype: Tour
+        """
+        route_matrix = np.asarray(route_matrix)
+        n = len(route_matrix)
+        nodes_in_row = route_matrix.sum(axis=1)
+        if np.any(nodes_in_row > 1):
+            raise ValueError(f'Invalid number of nodes in row: {nodes_in_row.max()}')
+        successors = np.where(nodes_in_row == 1, route_matrix.argmax(axis=1) if n else 0, -1)
+        return cls(successors)
+
+    def __len__(self):
+        """Number of edges in the route."""
+        return int(np.count_nonzero(self.successors >= 0))
+
+    def __eq__(self, other):
+        if not isinstance(other, Tour):
+            return NotImplemented
+        return self.start == other.start and np.array_equal(self.successors, other.successors)
+
+    def __repr__(self):
+        return f'Tour({self.order().tolist()}, closed={self.closed})'
+
+    @property
+    def closed(self) -> bool:
+        """Whether the route returns to its start."""
+        from_nodes = self.successors[self.successors >= 0]
+        return len(from_nodes) > 0 and bool(np.all(self.successors[from_nodes] >= 0))
+
+    def order(self) -> np.ndarray:
+        """Returns the nodes in the order they are visited from the start, without repeating the start."""
+        if self.start is None:
+            return np.empty(0, dtype=np.int32)
+        successors = self.successors.tolist()
+        order = [self.start]
+        node = successors[self.start]
+        while node >= 0 and node != self.start:
+            order.append(node)
+            node = successors[node]
+        return np.array(order, dtype=np.int32)
+
+    def edges(self) -> List[Tuple]:
+        """Returns the (from_node, to_node) edges in the order they are travelled from the start."""
+        order = self.order().tolist()
+        edges = list(zip(order[:-1], order[1:]))
+        if self.closed:
+            edges.append((order[-1], order[0]))
+        return edges
+
+    def to_matrix(self):
+        """Returns the n x n matrix with a 1 at (i, j) if the route goes from node i to node j.
+
+        :rtype: Matrix
+        """
+        n = len(self.successors)
+        route_matrix = np.zeros((n, n), dtype=int)
+        from_nodes = np.flatnonzero(self.successors >= 0)
+        route_matrix[from_nodes, self.successors[from_nodes]] = 1
+        return route_matrix.tolist()
+
+    def length(self, distance_matrix) -> int:
+        """Returns the total distance of the route's edges."""
+        distance_matrix = np.asarray(distance_matrix)
+        from_nodes = np.flatnonzero(self.successors >= 0)
+        return distance_matrix[from_nodes, self.successors[from_nodes]].sum().item()
@@ -1,39 +1,57 @@
 import logging
 import math
 import random
-from typing import List, Tuple
+import time
+from typing import TYPE_CHECKING, Callable, List, NamedTuple, Tuple
 
 import numpy as np
-from mip import BINARY, Model, OptimizationStatus, minimize, xsum
 
-logging.basicConfig(format='%(process)d-%(levelname)s-%(message)s', level=logging.DEBUG)
+from tsp_hiram.anytime import iterated_local_search
+from tsp_hiram.bounds import held_karp_bound, optimality_gap
+from tsp_hiram.cache import DistanceCache
+from tsp_hiram.candidates import DEFAULT_K, CandidateGraph, edge_candidates, knn_candidates, knn_candidates_from_matrix
+from tsp_hiram.construct import CONSTRUCTIONS, construct
+from tsp_hiram.decompose import solve_decomposed
+from tsp_hiram.distance import distance_matrix as metric_distance_matrix
+from tsp_hiram.distance import euclidean_distance_matrix, from_sparse, get_metric
+from tsp_hiram.dp import DP_MAX_NODES, held_karp
+from tsp_hiram.local_search import improve_tour
+from tsp_hiram.metrics import Metrics
+from tsp_hiram.orienteering import orienteering
+from tsp_hiram.parallel import attach_array, resolve_workers, share_array, spawn_seed
+from tsp_hiram.spatial import GridIndex
+from tsp_hiram.tour import Tour
+
+if TYPE_CHECKING:
+    from mip import OptimizationStatus
+
+logger = logging.getLogger(__name__)
 
 Coordinate = Tuple[int, int]
 CoordinatesVector = List[Coordinate]
 Matrix = List[List[int]]
 
+# Share of the time budget of `optimize` spent on the lower bound of max_gap and full_output
+BOUND_BUDGET_SHARE = 0.1
 
-def compute_euclidean_distance_matrix(coordinates: CoordinatesVector) -> Matrix:
+
+def compute_euclidean_distance_matrix(coordinates: CoordinatesVector, dtype=None, truncate: bool = True,
+                                      block_size: int = None) -> np.ndarray:
     """Creates a matrix of euclidian distances between the coordinates.
     Modified from https://developers.google.com/optimization/routing/tsp#euclid_distance
 
     :param coordinates: A list of 2D coordinates
     :type coordinates: CoordinatesVector
+    :param dtype: dtype of the matrix (e.g. int32, float32, float64), defaults to int32 when truncating and float64 otherwise
+    :type dtype: np.dtype, optional
+    :param truncate: Truncate distances to integers the same way as ``int(math.hypot(dx, dy))``, defaults to True
+    :type truncate: bool, optional
+    :param block_size: Number of rows computed at once to bound peak memory, defaults to an automatic size
+    :type block_size: int, optional
     :return: 2D matrix of euclidean distance between each coordinate
-    :rtype: Matrix
+    :rtype: np.ndarray
     """
-    V = range(len(coordinates))
-    distances = [[0 for j in V] for i in V]
-    for from_counter, from_node in enumerate(coordinates):
-        for to_counter, to_node in enumerate(coordinates):
-            if from_counter == to_counter:
-                pass
-            else:
-                # Euclidean distance
-                distances[from_counter][to_counter] = (int(
-                    math.hypot((from_node[0] - to_node[0]),
-                               (from_node[1] - to_node[1]))))
-    return distances
+    return euclidean_distance_matrix(coordinates, dtype=dtype, truncate=truncate, block_size=block_size)
 
 
 def get_edges_from_route_matrix(route_matrix: Matrix) -> List[Tuple]:
@@ -41,106 +59,210 @@ def get_edges_from_route_matrix(route_matrix: Matrix) -> List[Tuple]:
 
     :param route_matrix: A matrix indicating which edges contain the optimal route
     :type route_matrix: Matrix
-    :return: The row and column for the edge in the matrix
-    :rtype: Tuple
-    :yield: List of tuples for each edge connecting two nodes
+    :return: List of tuples for each edge connecting two nodes, in the order they are travelled
     :rtype: List[Tuple]
     """
+    return Tour.from_matrix(route_matrix).edges()
 
-    def get_first_row(route_matrix):
-        for row in range(len(route_matrix)):
-            nodes_in_row = sum(route_matrix[row])
-            if nodes_in_row == 1:
-                return row
-            elif nodes_in_row == 0:
-                continue
-            else:
-                raise ValueError(f'Invalid number of nodes in row: {nodes_in_row}')
-
-    def get_next_node_from_row(i, route_matrix):
-        for j in range(len(route_matrix)):
-            if route_matrix[i][j] == 1:
-                return (i, j)
-        raise ValueError(f"Node {i} is not connected to another node.")
 
-    edges = []
-    route_length = np.sum(route_matrix)
-    row = get_first_row(route_matrix)
+class BranchAndCutResult(NamedTuple):
+    """The outcome of `branch_and_cut` with ``full_output=True``.
 
-    while len(edges) < route_length:
-        try:
-            to_node = get_next_node_from_row(row, route_matrix)
-            row = to_node[1]
-            edges.append(to_node)
-        except ValueError:
-            logging.info('End of open route found.')
-            # transpose the matrix
-            route_matrix = [[route_matrix[j][i] for j in range(len(route_matrix))] for i in range(len(route_matrix))]
-            # reverse the edges
-            edges = [(edges[-1][1], edges[-1][0])]
-            row = edges[0][1]
-    return edges
+    :param tour: The best route found, a route matrix if `as_matrix` was set
+    :param distance: The distance of the route
+    :param status: The status of the last model solved
+    :param bound: Lower bound on the distance of any route over the candidate edges, or None if no route was found
+    :param gap: Relative gap between `distance` and `bound`, inf if no route was found
+    :param solutions: The distinct routes of the solution pool and their distances, shortest first
+    :param rounds: The seconds since the start, number of edges, bound and distance after each model solved, the
+        model being solved again with more candidate edges when it has no route
+    """
+    tour: Tour
+    distance: int
+    status: 'OptimizationStatus'
+    bound: float
+    gap: float
+    solutions: List[Tuple[Tour, int]]
+    rounds: List[Tuple[float, int, float, float]]
+
+
+class OptimizeResult(NamedTuple):
+    """The outcome of `optimize` with ``full_output=True``.
+
+    :param route: The edges of the route
+    :param distance: The distance of the route
+    :param bound: Lower bound on the distance of any closed route through every node, or None if the route is not one
+        or no distance matrix was computed
+    :param gap: Relative gap between `distance` and `bound`, see `tsp_hiram.bounds.optimality_gap`, or None
+    """
+    route: Matrix
+    distance: int
+    bound: float
+    gap: float
 
 
-def branch_and_cut(distance_matrix: Matrix, max_seconds=20) -> Tuple[Matrix, int]:
+def branch_and_cut(distance_matrix: Matrix, max_seconds=20, as_matrix: bool = False, formulation: str = None,
+                   candidates: CandidateGraph = None, initial_tour: Tour = None, cutoff: float = None,
+                   max_gap: float = None, full_output: bool = False, seed: int = None, metrics: Metrics = None,
+                   construction: str = 'nearest_neighbors'):
     """Solves a distance matrix for the shortest path
 
     :param distance_matrix: Distance maxtrix such as returned from `compute_euclidean_distance_matrix`
     :type distance_matrix: Matrix
-    :param max_seconds: The max execution time in seconds
+    :param max_seconds: The max execution time in seconds, or None to search until the optimal route is found
     :type max_seconds: int
-    :return:  A matrix indicating which edges contain the optimal route, the distance of the route
-    :rtype: Tuple[Matrix, int]
+    :param as_matrix: Return the route as the legacy n x n route matrix instead of a `Tour`, defaults to False
+    :type as_matrix: bool, optional
+    :param formulation: 'mtz' for arc variables with Miller-Tucker-Zemlin constraints, or 'symmetric' for edge variables
+        with subtour elimination cuts generated lazily, which builds much faster and has a tighter relaxation but
+        requires a symmetric distance matrix, defaults to 'symmetric' for symmetric matrices and 'mtz' otherwise
+    :type formulation: str, optional
+    :param candidates: Only create variables for the edges of this graph, such as returned from `knn_candidates`,
+        plus the edges of the initial route. If no route is found within them, the k nearest neighbors of every node
+        are added with k doubling until one is found or the graph is complete. Defaults to every edge
+    :type candidates: CandidateGraph, optional
+    :param initial_tour: A closed route through every node to start from, such as the route of a previous solve or one
+        improved with `improve_tour`, defaults to a route built with `construction`
+    :type initial_tour: Tour, optional
+    :param cutoff: Prune every branch which can't lead to a route shorter than this, such as the distance of a known
+        route. The initial route is returned if no shorter one exists, defaults to None
+    :type cutoff: float, optional
+    :param max_gap: Stop once the best route found is within this fraction of the lower bound, e.g. 0.01 for 1%,
+        defaults to None to search for the optimal route
+    :type max_gap: float, optional
+    :param full_output: Return a `BranchAndCutResult` with the bound, the gap and the solution pool, defaults to False
+    :type full_output: bool, optional
+    :param seed: Seed of CBC and of the nearest neighbors route, so runs finishing before max_seconds are reproducible,
+        defaults to None
+    :type seed: int, optional
+    :param metrics: Times building the initial route, building and optimizing the models and reading the route back,
+        and counts the models solved, defaults to None
+    :type metrics: Metrics, optional
+    :param construction: The heuristic of `tsp_hiram.construct.construct` building the initial route when none is
+        given, among 'nearest_neighbors', 'greedy' and 'mst', defaults to 'nearest_neighbors'
+    :type construction: str, optional
+    :raises ValueError: If the initial route is not a closed route through every node
+    :return:  The optimal route, or the best one found within max_seconds, the distance of the route
+    :rtype: Tuple[Tour, int] or BranchAndCutResult
     """
+    # loading CBC takes longer than the heuristics on small inputs, so only branch and cut pays for it
+    from mip import OptimizationStatus
 
-    n = len(distance_matrix)
-    model = Model()
-
-    # binary variables indicating if arc (i,j) is used on the route or not
-    x = [[model.add_var(name=f'x({i},{j})', var_type=BINARY) for j in range(n)] for i in range(n)]
-
-    # continuous variable to prevent subtours: each city will have a
-    # different sequential id in the planned route except the first one
-    y = [model.add_var(name=f'y({i})') for i in range(n)]
-
-    # objective function: minimize the distance
-    model.objective = minimize(xsum(distance_matrix[i][j]*x[i][j] for i in range(n) for j in range(n)))
-
-    # constraint : enter each city coming from another city
-    for i in range(n):
-        model += xsum(x[j][i] for j in range(n) if j != i) == 1
-
-    # constraint : leave each city coming from another city
-    for i in range(n):
-        model += xsum(x[i][j] for j in range(n) if j != i) == 1
-
-    # subtour elimination
-    for i in range(1, n):
-        for j in [x for x in range(1, n) if x != i]:
-            model += y[i] - (n+1)*x[i][j] >= y[j]-n, 'noSub({},{})'.format(i, j)
-
-    # Use nearest neighbors to find an initial feasible solution
-    feasible_rm, feasible_distance = nearest_neighbor_path(distance_matrix, closed=True)
-    model.start = [(x[i][j], float(feasible_rm[i][j])) for i in range(n) for j in range(n)]
-
-    # optimizing
-    model.optimize(max_seconds=max_seconds)
-    if model.status in [OptimizationStatus.OPTIMAL, OptimizationStatus.FEASIBLE]:
-        logging.info(f'Best route found has length {model.objective_value}.')
-
-        route_matrix = [[int(x[i][j].x) for j in range(n)] for i in range(n)]
-        return route_matrix, model.objective_value
+    from tsp_hiram.formulations import mtz_model, symmetric_model, tour_from_solution
 
+    distance_matrix = np.asarray(distance_matrix)
+    n = len(distance_matrix)
+    if formulation is None:
+        symmetric = n > 2 and np.array_equal(distance_matrix, distance_matrix.T)
+        formulation = 'symmetric' if symmetric else 'mtz'
+    if formulation not in ('mtz', 'symmetric'):
+        raise ValueError(f'Unknown formulation: {formulation}')
+    directed = formulation == 'mtz'
+    if metrics is None:
+        metrics = Metrics()
+
+    if initial_tour is None:
+        # Use a construction heuristic to find an initial feasible solution
+        with metrics.timer('construction'):
+            feasible_tour, feasible_distance = construct(construction, distance_matrix, candidates=candidates,
+                                                         rng=None if seed is None else random.Random(seed), metrics=metrics)
+    elif not initial_tour.closed or len(initial_tour) != n:
+        raise ValueError(f'The initial route must be a closed route through the {n} nodes.')
     else:
-        logging.info('No solution found.')
-        route_matrix = [[0 for j in range(n)] for i in range(n)]
-        return route_matrix, 0
+        feasible_tour, feasible_distance = initial_tour, initial_tour.length(distance_matrix)
+    used = {edge if directed else tuple(sorted(edge)) for edge in feasible_tour.edges()}
+    if candidates is not None:
+        candidates = candidates.with_edges(feasible_tour.edges(), distance_matrix)
+
+    started = time.monotonic()
+    deadline = None if max_seconds is None else started + max_seconds
+    rounds = []
+    k = None
+    while True:
+        with metrics.timer('mip_build'):
+            edges = None
+            if candidates is not None:
+                edges = [(i, j) for i, j in candidates.edges().tolist()]
+                if directed:
+                    edges += [(j, i) for i, j in edges]
+
+            model, x = mtz_model(distance_matrix, edges) if directed else symmetric_model(distance_matrix, edges)
+            model.start = [(var, float(edge in used)) for edge, var in x.items()]
+            if cutoff is not None:
+                model.cutoff = cutoff
+            if max_gap is not None:
+                model.max_mip_gap = max_gap
+            if seed is not None:
+                model.seed = spawn_seed(seed, len(rounds))
+
+        # optimizing
+        with metrics.timer('mip_optimize'):
+            model.optimize(max_seconds=np.inf if deadline is None else max(deadline - time.monotonic(), 0))
+        metrics.count('mip_rounds')
+        found = model.status in [OptimizationStatus.OPTIMAL, OptimizationStatus.FEASIBLE]
+        rounds.append((time.monotonic() - started, len(x), model.objective_bound if found else None,
+                       model.objective_value if found else None))
+        complete = edges is None or len(x) >= n * (n - 1) // (1 if directed else 2)
+        # with a cutoff, no route means none is shorter than the cutoff, since the initial route is a candidate
+        if found or complete or cutoff is not None or (deadline is not None and time.monotonic() >= deadline):
+            break
+
+        # pricing: add the next nearest neighbors of every node and solve again
+        k = 2 * (k or int(np.diff(candidates.indptr).max()))
+        logger.info(f'No route found among {len(x)} candidate edges, adding the {k} nearest neighbors of each node.')
+        candidates = candidates.with_edges(knn_candidates_from_matrix(distance_matrix, k).edges(), distance_matrix)
+
+    solutions = []
+    if found:
+        logger.info(f'Best route found has length {model.objective_value}, within {model.gap:.2%} of the bound.')
+        with metrics.timer('route_extraction'):
+            tour, distance = tour_from_solution(x, n, directed), model.objective_value
+            if full_output:
+                solutions = _solution_pool(model, x, n, directed)
+
+    if not found or feasible_distance < distance:
+        # CBC can drop the initial solution when lazy constraints are used, it is still a valid route
+        logger.info(f'No shorter solution found, returning the initial route of length {feasible_distance}.')
+        tour, distance = feasible_tour, feasible_distance
+
+    if as_matrix:
+        tour = tour.to_matrix()
+    if not full_output:
+        return tour, distance
+
+    # routes read from the models start from node 0
+    initial = (Tour(feasible_tour.successors), feasible_distance)
+    if initial not in solutions:
+        solutions = sorted(solutions + [initial], key=lambda solution: solution[1])
+    bound = model.objective_bound if found else None
+    gap = abs(distance - bound) / distance if found and distance else (0. if found else math.inf)
+    return BranchAndCutResult(tour, distance, model.status, bound, gap, solutions, rounds)
+
+
+def _solution_pool(model, x, n: int, directed: bool) -> List[Tuple[Tour, int]]:
+    """Returns the distinct routes of the solution pool of a solved model and their distances, shortest first."""
+    from tsp_hiram.formulations import tour_from_solution
+
+    solutions = []
+    for i in range(model.num_solutions):
+        try:
+            tour = tour_from_solution(x, n, directed, solution=i)
+        except ValueError:
+            # solutions found before a lazy constraint cut them off
+            continue
+        solution = (tour, model.objective_values[i])
+        if solution not in solutions:
+            solutions.append(solution)
+    return sorted(solutions, key=lambda solution: solution[1])
 
 
-def nearest_neighbor_path(distance_matrix: Matrix, closed=False, start: int = None, max_distance: int = None) -> Tuple[Matrix, int]:
+def nearest_neighbor_path(distance_matrix: Matrix, closed=False, start: int = None, max_distance: int = None,
+                          as_matrix: bool = False, coordinates: CoordinatesVector = None,
+                          rng: random.Random = None, metrics: Metrics = None) -> Tuple[Tour, int]:
     """Simple nearest neighbor algorithm for finding a feasible path for the Traveling Salesman Problem.
 
-    :param distance_matrix: matrix for the cost of each edge
+    :param distance_matrix: matrix for the cost of each edge, or None to compute truncated euclidean distances from
+        `coordinates` on demand with a `GridIndex` instead of materializing the matrix
     :type distance_matrix: List
     :param closed: If a max_distance is set, whether the solution should be an open or closed loop, defaults to Open loop (False)
     :type closed: bool, optional
@@ -148,72 +270,256 @@ def nearest_neighbor_path(distance_matrix: Matrix, closed=False, start: int = No
     :type start: int, optional
     :param max_distance: If None, find full path. Otherwise, constrain cost of the path to be >= max_distance, defaults to None
     :type max_distance: int, optional
-    :return:  A matrix indicating which edges contain the optimal route, the distance of the route
-    :rtype: Tuple[Matrix, int]
+    :param as_matrix: Return the route as the legacy n x n route matrix instead of a `Tour`, defaults to False
+    :type as_matrix: bool, optional
+    :param coordinates: Coordinates of the nodes, only used when `distance_matrix` is None, defaults to None
+    :type coordinates: CoordinatesVector, optional
+    :param rng: Random number generator choosing the start and breaking ties, defaults to the `random` module
+    :type rng: random.Random, optional
+    :param metrics: Counts the nodes visited and the ties between nearest neighbors, defaults to None
+    :type metrics: Metrics, optional
+    :return:  The route found, the distance of the route
+    :rtype: Tuple[Tour, int]
     """
 
-    n = len(distance_matrix)
+    if distance_matrix is None:
+        index = GridIndex(coordinates)
+        n = len(index)
+        edge_cost = index.distance
+        visit = index.remove
+        nearest = index.nearest
+
+    else:
+        distance_matrix = np.asarray(distance_matrix)
+        n = len(distance_matrix)
+
+        # Visited nodes are left out of each row rather than masked with a large value, which the matrix may hold too,
+        # such as inf for unreachable nodes
+        visited = np.zeros(n, dtype=bool)
+
+        def edge_cost(from_node, to_node):
+            return distance_matrix[from_node, to_node].item()
+
+        def visit(node):
+            visited[node] = True
+
+        def nearest(from_node):
+            unvisited = np.flatnonzero(~visited)
+            row = distance_matrix[from_node, unvisited]
+            shortest_edge = row.min()
+            return unvisited[row == shortest_edge], shortest_edge.item()
+
+    if rng is None:
+        rng = random
 
     if start is None:
-        start = random.randrange(0, len(distance_matrix))
-        logging.info(f'Choosing random starting node: {start}.')
+        start = rng.randrange(0, n)
+        logger.debug(f'Choosing random starting node: {start}.')
 
+    # without a budget, an infinite distance to an unreachable node doesn't end the route
+    limited = max_distance is not None
     if max_distance is None:
         max_distance = math.inf
 
     # Initialize all vertices as unvisited except for self
-    visited = [False for v in range(n)]
-    visited[start] = True
+    visit(start)
+    n_visited = 1
 
     route = [start]
-
-    route_matrix = [[0 for j in range(n)] for i in range(n)]
+    successors = np.full(n, -1, dtype=np.int32)
 
     from_node = start
     distance = 0
+    ties = 0
     while distance <= max_distance:
 
         # Have we visited all the nodes?
-        if sum(visited) == len(visited):
+        if n_visited == n:
             # then let's go home
-            distance += distance_matrix[from_node][start]
-            route_matrix[from_node][start] = 1
+            distance += edge_cost(from_node, start)
+            successors[from_node] = start
             break
 
         # Find out the shortest edge connecting the current vertex and an unvisited vertex
-        shortest_edge = min([distance_matrix[from_node][to_node] for to_node in range(n) if visited[to_node] is False])
-
-        next_nodes = [node for node in range(n) if distance_matrix[from_node][node] == shortest_edge]
-        next_nodes = [node for node in next_nodes if visited[node] is False]
-        to_node = next_nodes[0]
-        go_home_cost = distance_matrix[to_node][start] + shortest_edge
+        next_nodes, shortest_edge = nearest(from_node)
+        to_node = int(next_nodes[0])
+        go_home_cost = edge_cost(to_node, start) + shortest_edge
 
         if len(next_nodes) > 1:
             # more than one nearest neighbor, choosing randomly
-            logging.info('more than one neighor found.')
-            to_node = random.choice(next_nodes)
+            ties += 1
+            to_node = rng.choice(next_nodes.tolist())
 
         # do we have enough to get home if we go the next edge?
-        if closed & (distance + go_home_cost >= max_distance):
+        if limited and closed and distance + go_home_cost >= max_distance:
             # then let's go home
-            distance += distance_matrix[from_node][start]
+            distance += edge_cost(from_node, start)
             if from_node != start:
-                route_matrix[from_node][start] = 1
+                successors[from_node] = start
             break
 
-        elif distance + shortest_edge >= max_distance:
+        elif limited and distance + shortest_edge >= max_distance:
             break
 
         else:
             # then keep going!
             distance += shortest_edge
-            visited[to_node] = True
-            route_matrix[from_node][to_node] = 1
+            visit(to_node)
+            n_visited += 1
+            successors[from_node] = to_node
             route.append(to_node)
             from_node = to_node
 
-    logging.info(f'{sum(visited)} nodes visited for distance {distance}: {route}')
-    return route_matrix, distance
+    if metrics is not None:
+        metrics.count('nodes_visited', n_visited)
+        metrics.count('ties', ties)
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(f'{n_visited} nodes visited for distance {distance}: {route}')
+    tour = Tour(successors, start=start)
+    if as_matrix:
+        return tour.to_matrix(), distance
+    return tour, distance
+
+
+class _StartResult(NamedTuple):
+    vertex: int
+    n_edges: int
+    distance: int
+    tour: Tour
+    # the counters of every start of the chunk this result is the best of
+    counters: dict = None
+
+
+# State of the multi-start worker processes, set up once per process by _init_worker
+_worker_state = {}
+
+
+def _start_rng(seed: int, vertex: int) -> random.Random:
+    """Independent random stream for one starting vertex, so results don't depend on how starts are scheduled."""
+    return random.Random((seed << 32) | vertex)
+
+
+def _is_better(candidate: _StartResult, best: _StartResult, max_distance) -> bool:
+    if best is None:
+        return True
+    if max_distance is not None:  # optimize for most number of nodes
+        return candidate.n_edges > best.n_edges
+    return candidate.distance < best.distance  # optimize for shortest path
+
+
+def _best_start(distance_matrix, coordinates, vertices, closed, max_distance, seed) -> _StartResult:
+    """Runs nearest_neighbor_path from each of the vertices in order and returns the best result."""
+    n = len(coordinates) if distance_matrix is None else len(distance_matrix)
+    metrics = Metrics()
+    best = None
+    for vertex in vertices:
+        tour, distance = nearest_neighbor_path(distance_matrix, max_distance=max_distance, start=vertex, closed=closed,
+                                               coordinates=coordinates, rng=_start_rng(seed, vertex), metrics=metrics)
+        metrics.count('starts')
+        result = _StartResult(vertex, len(tour), distance, tour)
+        logger.debug(f'Solution: {result.n_edges} for {distance} from start {vertex}')
+
+        if _is_better(result, best, max_distance):
+            best = result
+        if max_distance is not None and result.n_edges == n:
+            # no other start can visit more nodes
+            break
+    return best._replace(counters=metrics.counters)
+
+
+def _init_worker(matrix_spec, coordinates):
+    if matrix_spec is not None:
+        _worker_state['shm'], _worker_state['distance_matrix'] = attach_array(matrix_spec)
+    else:
+        _worker_state['distance_matrix'] = None
+    _worker_state['coordinates'] = coordinates
+
+
+def _worker_best_start(vertices, closed, max_distance, seed) -> _StartResult:
+    return _best_start(_worker_state['distance_matrix'], _worker_state['coordinates'], vertices, closed, max_distance, seed)
+
+
+def _parallel_best_starts(distance_matrix, coordinates, chunks, closed, max_distance, seed, workers) -> List[_StartResult]:
+    """Runs _best_start over the chunks of vertices in a process pool sharing the distance matrix."""
+    from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+    shm, matrix_spec = (None, None) if distance_matrix is None else share_array(distance_matrix)
+    try:
+        with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(matrix_spec, coordinates)) as executor:
+            futures = [executor.submit(_worker_best_start, vertices, closed, max_distance, seed) for vertices in chunks]
+            results = [None] * len(futures)
+            pending = set(futures)
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    if future.cancelled():
+                        continue
+                    k = futures.index(future)
+                    results[k] = future.result()
+                    if max_distance is not None and results[k].n_edges == len(results[k].tour.successors):
+                        # later chunks can't beat a route visiting every node
+                        for later in futures[k + 1:]:
+                            later.cancel()
+    finally:
+        if shm is not None:
+            shm.close()
+            shm.unlink()
+
+    return [result for result in results if result is not None]
+
+
+def multi_start_nearest_neighbor(distance_matrix: Matrix, closed=False, max_distance: int = None,
+                                 coordinates: CoordinatesVector = None, workers: int = 1, seed: int = None,
+                                 metrics: Metrics = None) -> Tuple[Tour, int]:
+    """Runs nearest_neighbor_path from every node and returns the best route.
+
+    The best route visits the most nodes if `max_distance` is set and is the shortest otherwise. Ties go to the lowest
+    starting node and every start breaks ties between neighbors with its own random stream, so the result is the same
+    for any number of workers. With `max_distance` set, the search stops as soon as a route visits every node.
+
+    :param distance_matrix: matrix for the cost of each edge, or None to compute distances from `coordinates` on demand
+    :type distance_matrix: Matrix
+    :param closed: Whether the routes should be closed loops when a max_distance is set, defaults to False
+    :type closed: bool, optional
+    :param max_distance: If None, find full paths. Otherwise, the maximum cost of each path, defaults to None
+    :type max_distance: int, optional
+    :param coordinates: Coordinates of the nodes, only used when `distance_matrix` is None, defaults to None
+    :type coordinates: CoordinatesVector, optional
+    :param workers: Number of processes sharing the starting nodes, all available CPUs if None, defaults to 1
+    :type workers: int, optional
+    :param seed: Seed of the random streams breaking ties, defaults to a random seed
+    :type seed: int, optional
+    :param metrics: Counts the routes built, the nodes visited and the ties between nearest neighbors in every
+        process, defaults to None
+    :type metrics: Metrics, optional
+    :return: The best route, the distance of the route
+    :rtype: Tuple[Tour, int]
+    """
+    n = len(coordinates) if distance_matrix is None else len(distance_matrix)
+    workers = resolve_workers(workers)
+    if seed is None:
+        seed = random.getrandbits(32)
+
+    # several chunks per worker keep the workers busy when some starts take longer than others
+    chunk_size = max(1, math.ceil(n / (4 * workers)))
+    chunks = [range(i, min(i + chunk_size, n)) for i in range(0, n, chunk_size)]
+
+    if workers == 1 or len(chunks) == 1:
+        results = []
+        for vertices in chunks:
+            results.append(_best_start(distance_matrix, coordinates, vertices, closed, max_distance, seed))
+            if max_distance is not None and results[-1].n_edges == n:
+                break
+    else:
+        results = _parallel_best_starts(distance_matrix, coordinates, chunks, closed, max_distance, seed, workers)
+
+    best = None
+    for result in results:
+        if metrics is not None:
+            metrics.update(result.counters)
+        if _is_better(result, best, max_distance):
+            best = result
+    return best.tour, best.distance
 
 
 def optimize(
@@ -221,12 +527,35 @@ def optimize(
     max_distance: int = None,
     starting_node: int = None,
     closed: bool = True,
-    use_nearest_neighbors: bool = False
+    use_nearest_neighbors: bool = False,
+    matrix_free: bool = False,
+    workers: int = 1,
+    candidate_neighbors: int = None,
+    improve: bool = True,
+    max_seconds: float = 20,
+    anytime: bool = False,
+    callback: Callable[[Tour, int], None] = None,
+    cache: DistanceCache = None,
+    seed: int = None,
+    metrics: Metrics = None,
+    metric: str = 'euclidean',
+    distance_matrix=None,
+    cell_size: int = None,
+    construction: str = 'nearest_neighbors',
+    max_gap: float = None,
+    full_output: bool = False,
+    dynamic_programming: bool = True
 ) -> Tuple[Matrix, int]:
     """Attepmts to find the optimal soultion to a Traveling Salesman problem given a distance matrix and an optional cost-constraint.
-    :param coordinates: List of coordinates to use for each node.
-    :type coordinates: CoordinatesVector
-    :param max_distance: The maximum distance of the solution which attempts to maximize the number of visited nodes, defaults to None
+
+    Problems of up to DP_MAX_NODES nodes are solved to optimality with `tsp_hiram.dp.held_karp` instead, whichever
+    algorithm is chosen, unless the distances are computed on demand with matrix_free. The route has the shape the
+    algorithm would have returned: closed unless max_distance is set and closed is False.
+
+    :param coordinates: List of coordinates to use for each node, or None if a `distance_matrix` is given.
+    :type coordinates: CoordinatesVector or np.ndarray
+    :param max_distance: The maximum distance of the solution which attempts to maximize the number of visited nodes with
+        `orienteering`, defaults to None
     :type max_distance: int, optional
     :param starting_node: The node to start from as the solution. Only for closed loops if to improve time to converge, defaults to None
     :type starting_node: int, optional
@@ -234,50 +563,235 @@ def optimize(
     :type closed: bool, optional
     :param use_nearest_neighbors: Use the nearest_neighbors to solve the problem, instead of branch_and_cut, if possible, defaults to False
     :type use_nearest_neighbors: bool, optional
+    :param matrix_free: Compute distances on demand from a spatial index instead of building the O(n^2) distance matrix.
+        Only supported by the nearest neighbors algorithm, defaults to False
+    :type matrix_free: bool, optional
+    :param workers: Number of processes running the nearest neighbors algorithm from every starting node,
+        all available CPUs if None, defaults to 1
+    :type workers: int, optional
+    :param candidate_neighbors: Only let branch and cut use the edges between each node and its k nearest neighbors,
+        which scales to much larger problems, and the heuristics move each node next to its k nearest neighbors only,
+        defaults to None to use every edge in branch and cut and DEFAULT_K neighbors in the heuristics
+    :type candidate_neighbors: int, optional
+    :param improve: Improve the shortest route found by the nearest neighbors algorithm, or the initial route of
+        branch and cut, with 2-opt and Or-opt moves. Routes were not improved before version 0.3.0, defaults to True
+    :type improve: bool, optional
+    :param max_seconds: Time budget of branch and cut, or of the anytime search, or None for no limit, which the anytime
+        search only accepts with a max_gap above 0, defaults to 20
+    :type max_seconds: float, optional
+    :param anytime: When no max distance is set, build a nearest neighbors route right away and keep improving it
+        with an iterated local search until max_seconds have passed, instead of running branch and cut,
+        defaults to False
+    :type anytime: bool, optional
+    :param callback: Called with every new best route and its distance found by the anytime search, defaults to None
+    :type callback: Callable[[Tour, int], None], optional
+    :param cache: Load the distance matrix and the nearest neighbors of the coordinates from this cache, and store them
+        in it when missing, defaults to None
+    :type cache: DistanceCache, optional
+    :param seed: Seed of every random choice of the algorithms, which then return the same route for the same
+        coordinates unless they run out of time, defaults to None to use the `random` module
+    :type seed: int, optional
+    :param metrics: Times each phase of the solve and counts what the algorithms did, see `Metrics`, defaults to None
+    :type metrics: Metrics, optional
+    :param metric: The name of the metric of `tsp_hiram.distance.METRICS` measuring the distances between the
+        coordinates, such as 'haversine' for (latitude, longitude) in degrees. Only euclidean distances can be computed
+        on demand with matrix_free, defaults to 'euclidean'
+    :type metric: str, optional
+    :param distance_matrix: The cost of going from each node to every other node, used as is instead of computing
+        distances from the coordinates. It may be asymmetric, in which case branch and cut solves the directed problem
+        and the nearest neighbors route isn't improved, or a ``scipy.sparse`` matrix of the costs of the allowed edges
+        only, which then are the only candidates of every algorithm. Defaults to None
+    :type distance_matrix: np.ndarray or scipy.sparse.spmatrix, optional
+    :param cell_size: Split the coordinates into cells of at most this many points, solve each cell with the other
+        options on `workers` processes and join their routes with `tsp_hiram.decompose.solve_decomposed`, which scales
+        to millions of points. Only for closed routes through every euclidean coordinate, defaults to None
+    :type cell_size: int, optional
+    :param construction: The heuristic building the first route, improved by local search or used as the start of
+        branch and cut: 'nearest_neighbors', the O(n log n) 'hilbert' curve order or 'greedy' matching, or the 'mst'
+        double-tree, see `tsp_hiram.construct`. The routes of all but nearest neighbors are closed, defaults to
+        'nearest_neighbors'
+    :type construction: str, optional
+    :param max_gap: Stop the anytime search or branch and cut once the route is within this fraction of a lower bound
+        on the optimal distance, e.g. 0.02 for 2%. The anytime search computes the Held-Karp bound of
+        `tsp_hiram.bounds` first, in at most BOUND_BUDGET_SHARE of max_seconds, defaults to None
+    :type max_gap: float, optional
+    :param full_output: Return an `OptimizeResult` with the lower bound and the gap of closed routes through every node
+        found from a distance matrix: the bound proven by branch and cut, or the Held-Karp bound, defaults to False
+    :type full_output: bool, optional
+    :param dynamic_programming: Solve problems of up to DP_MAX_NODES nodes with `tsp_hiram.dp.held_karp` instead of
+        the chosen algorithm, defaults to True
+    :type dynamic_programming: bool, optional
+    :raises ValueError: If the options are not supported by the distance matrix or the metric, or can't stop
     :return: The route of the solution in the form of a list of each edge used, along with the distance of the solution.
-    :rtype: Tuple[Matrix, int]
+    :rtype: Tuple[Matrix, int] or OptimizeResult
     """
 
-    distance_matrix = compute_euclidean_distance_matrix(coordinates)
+    use_nearest_neighbors = (max_distance is not None) or (use_nearest_neighbors is True)
+    anytime = anytime and max_distance is None
+    if matrix_free and not (use_nearest_neighbors or anytime):
+        raise ValueError('matrix_free is only supported by the nearest neighbors algorithm and the anytime search.')
+    if matrix_free and (distance_matrix is not None or metric != 'euclidean'):
+        raise ValueError('matrix_free only computes euclidean distances from the coordinates.')
+    get_metric(metric)
+    if max_gap is not None and not 0 <= max_gap < 1:
+        raise ValueError(f'max_gap must be at least 0 and below 1, not {max_gap}.')
+    if anytime and max_seconds is None and (not max_gap or matrix_free):
+        # the local search never proves a route optimal, only a positive gap to the bound of the matrix can stop it
+        raise ValueError('The anytime search requires max_seconds, unless a max_gap above 0 is given with a matrix.')
+    if construction not in CONSTRUCTIONS:
+        raise ValueError(f'Unknown construction {construction!r}, expected one of {list(CONSTRUCTIONS)}.')
+
+    if metrics is None:
+        metrics = Metrics()
+
+    if cell_size is not None:
+        if max_distance is not None or starting_node is not None or distance_matrix is not None or metric != 'euclidean':
+            raise ValueError('cell_size only finds closed routes through every node, from euclidean coordinates.')
+        tour, distance = solve_decomposed(coordinates, cell_size, workers=workers, max_seconds=max_seconds, seed=seed,
+                                          metrics=metrics, use_nearest_neighbors=use_nearest_neighbors,
+                                          matrix_free=matrix_free, candidate_neighbors=candidate_neighbors,
+                                          improve=improve, anytime=anytime, construction=construction)
+        return OptimizeResult(tour.edges(), distance, None, None) if full_output else (tour.edges(), distance)
+
+    # the nearest neighbors of the coordinates are the nearest ones in the matrix only if it measures their distances
+    knn_from_coordinates = distance_matrix is None and metric == 'euclidean'
+    allowed = None
+    with metrics.timer('matrix'):
+        if distance_matrix is not None:
+            if hasattr(distance_matrix, 'tocoo'):
+                distance_matrix, allowed = from_sparse(distance_matrix)
+            distance_matrix = np.asarray(distance_matrix)
+            if distance_matrix.ndim != 2 or distance_matrix.shape[0] != distance_matrix.shape[1]:
+                raise ValueError(f'The distance matrix must be square, not of shape {distance_matrix.shape}.')
+        elif matrix_free:
+            distance_matrix = None
+        elif cache is not None:
+            distance_matrix = cache.distance_matrix(coordinates, metric=metric)
+        else:
+            distance_matrix = metric_distance_matrix(coordinates, metric)
+    n = len(coordinates) if distance_matrix is None else len(distance_matrix)
+
+    symmetric = distance_matrix is None or np.array_equal(distance_matrix, distance_matrix.T)
+    if not symmetric and (anytime or max_distance is not None):
+        raise ValueError('The anytime search and max_distance require a symmetric distance matrix.')
+    # 2-opt moves reverse sections of the route, which changes their length when the matrix is asymmetric
+    improve = improve and symmetric
+
+    def candidates(k):
+        with metrics.timer('matrix'):
+            if allowed is not None:
+                return edge_candidates(allowed, distance_matrix)
+            if not knn_from_coordinates:
+                return knn_candidates_from_matrix(distance_matrix, k)
+            return knn_candidates(coordinates, k) if cache is None else cache.knn_candidates(coordinates, k)
 
     if starting_node is not None:
-        assert 0 <= starting_node < len(distance_matrix), \
-            f"Starting node ({starting_node}) must be within range 0 to {len(distance_matrix)}"
+        assert 0 <= starting_node < n, \
+            f"Starting node ({starting_node}) must be within range 0 to {n}"
+
+    # each algorithm draws from its own stream, so seeding one doesn't depend on how many draws another made
+    def rng(stream):
+        return None if seed is None else random.Random(spawn_seed(seed, stream))
+
+    def lower_bound(upper_bound):
+        with metrics.timer('bound'):
+            return held_karp_bound(distance_matrix, upper_bound=upper_bound,
+                                   max_seconds=None if max_seconds is None else BOUND_BUDGET_SHARE * max_seconds)
+
+    bound = None
+
+    if dynamic_programming and distance_matrix is not None and n <= DP_MAX_NODES:
+        # only routes within a max distance may be open, every other algorithm returns closed routes
+        with metrics.timer('dynamic_programming'):
+            tour, distance = held_karp(distance_matrix, closed=closed or max_distance is None, start=starting_node,
+                                       max_distance=max_distance)
+        if max_distance is None and tour.closed:
+            bound = distance
+        if anytime and callback is not None:
+            callback(tour, distance)
+
+    elif anytime:
+        neighbors = candidates(candidate_neighbors or DEFAULT_K)
+        with metrics.timer('construction'):
+            if construction == 'nearest_neighbors':
+                tour, distance = nearest_neighbor_path(distance_matrix, closed=True, start=starting_node,
+                                                       coordinates=coordinates, rng=rng(0), metrics=metrics)
+            else:
+                tour, distance = construct(construction, distance_matrix, coordinates, neighbors, rng=rng(0),
+                                           metrics=metrics)
+        target = None
+        remaining = max_seconds
+        if max_gap is not None and distance_matrix is not None:
+            started = time.monotonic()
+            bound = lower_bound(distance)
+            # gap = (distance - bound) / distance
+            target = bound / (1 - max_gap)
+            if max_seconds is not None:
+                remaining = max(max_seconds - (time.monotonic() - started), 0)
+        with metrics.timer('improvement'):
+            tour, distance = iterated_local_search(tour, distance_matrix, coordinates=coordinates, candidates=neighbors,
+                                                   max_seconds=remaining, callback=callback, rng=rng(1), metrics=metrics,
+                                                   target=target)
+
+    elif max_distance is not None:
+        neighbors = candidates(candidate_neighbors or DEFAULT_K)
+        with metrics.timer('orienteering'):
+            tour, distance = orienteering(distance_matrix, max_distance, closed=closed, start=starting_node,
+                                          coordinates=coordinates, candidates=neighbors, max_seconds=max_seconds,
+                                          rng=rng(0))
 
     # use nearest neighbors algorithm
-    if (max_distance is not None) or (use_nearest_neighbors is True):
+    elif use_nearest_neighbors:
 
-        if starting_node:
-            logging.info(f'Starting at node {starting_node}. Algorithm will not iterate to find most optimal solution.')
-            route_matrix, distance = nearest_neighbor_path(distance_matrix, max_distance=max_distance, start=starting_node, closed=closed)
+        neighbors = None
+        if improve or construction in ('greedy', 'mst'):
+            neighbors = candidates(candidate_neighbors or DEFAULT_K)
+        with metrics.timer('construction'):
+            if construction != 'nearest_neighbors':
+                tour, distance = construct(construction, distance_matrix, coordinates, neighbors, rng=rng(0),
+                                           metrics=metrics)
 
-        else:
-            most_nodes = 0
-            route_matrix = None
-            distance = None
-
-            for vertex in range(len(distance_matrix)):
-                _route_matrix, _distance = nearest_neighbor_path(distance_matrix, max_distance=max_distance, start=vertex, closed=closed)
-                logging.info(f'Solution: {np.sum(_route_matrix)} for {distance} from start {vertex}')
-                n_nodes = np.sum(_route_matrix)
-
-                if max_distance is not None:  # optimize for most number of nodes
-                    # TODO: allow for returning multiple solutions if there is more than one.
-                    if n_nodes >= most_nodes:
-                        most_nodes = n_nodes
-                        route_matrix = _route_matrix
-                        distance = _distance
-
-                else:  # optimize for shortest path
-                    if distance < _distance:
-                        distance = _distance
-                        route_matrix = _route_matrix
+            elif starting_node is not None:
+                logger.info(f'Starting at node {starting_node}. Algorithm will not iterate to find most optimal solution.')
+                tour, distance = nearest_neighbor_path(distance_matrix, start=starting_node, closed=closed,
+                                                       coordinates=coordinates, rng=rng(0), metrics=metrics)
 
-    else:  # use branch and cut
-        if closed is False:
-            logging.info('Closed loop argument is False but no max distance is specified. Running branch and cut.')
+            else:
+                tour, distance = multi_start_nearest_neighbor(distance_matrix, closed=closed, coordinates=coordinates,
+                                                              workers=workers, seed=None if seed is None else spawn_seed(seed, 0),
+                                                              metrics=metrics)
 
-        route_matrix, distance = branch_and_cut(distance_matrix)
+        if improve:
+            with metrics.timer('improvement'):
+                tour, distance = improve_tour(tour, distance_matrix, coordinates=coordinates, candidates=neighbors,
+                                              metrics=metrics)
 
-    route = get_edges_from_route_matrix(route_matrix)
-    return route, distance
+    else:  # use branch and cut
+        if closed is False:
+            logger.info('Closed loop argument is False but no max distance is specified. Running branch and cut.')
+
+        initial_tour = neighbors = None
+        if improve or construction in ('greedy', 'mst'):
+            neighbors = candidates(candidate_neighbors or DEFAULT_K)
+        if improve or construction != 'nearest_neighbors':
+            with metrics.timer('construction'):
+                initial_tour, _ = construct(construction, distance_matrix, coordinates, neighbors, rng=rng(0),
+                                            metrics=metrics)
+        if improve:
+            with metrics.timer('improvement'):
+                initial_tour, _ = improve_tour(initial_tour, distance_matrix, candidates=neighbors, metrics=metrics)
+        result = branch_and_cut(distance_matrix, max_seconds=max_seconds, initial_tour=initial_tour,
+                                candidates=None if candidate_neighbors is None and allowed is None
+                                else candidates(candidate_neighbors),
+                                seed=None if seed is None else spawn_seed(seed, 1), metrics=metrics,
+                                max_gap=max_gap, full_output=True)
+        tour, distance = result.tour, result.distance
+        # the bound of a model restricted to the nearest neighbors doesn't hold for the routes using other edges
+        if result.bound is not None and candidate_neighbors is None:
+            bound = math.ceil(result.bound - 1e-6) if distance_matrix.dtype.kind in 'iub' else result.bound
+
+    if not full_output:
+        return tour.edges(), distance
+    if bound is None and distance_matrix is not None and max_distance is None and tour.closed:
+        bound = lower_bound(distance)
+    return OptimizeResult(tour.edges(), distance, bound, None if bound is None else optimality_gap(distance, bound))
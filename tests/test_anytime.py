@@ -0,0 +1,40 @@
+import random
+
+import numpy as np
+
+from tsp_hiram import tsp
+from tsp_hiram.anytime import improving_tours, iterated_local_search
+
+
+def test_improving_tours():
+    """Test every route yielded is shorter than the previous one and visits every node once.
+    """
+    coordinates = np.random.default_rng(0).uniform(0, 1000, size=(300, 2))
+    distance_matrix = tsp.compute_euclidean_distance_matrix(coordinates)
+    tour, distance = tsp.nearest_neighbor_path(distance_matrix, closed=True, start=0)
+
+    distances = []
+    for improved, improved_distance in improving_tours(tour, distance_matrix, max_iterations=200, rng=random.Random(0)):
+        assert sorted(improved.order().tolist()) == list(range(300))
+        assert improved.length(distance_matrix) == improved_distance
+        distances.append(improved_distance)
+    assert len(distances) > 1
+    assert distances == sorted(distances, reverse=True) and distances[0] < distance
+
+
+def test_iterated_local_search():
+    """Test the search is reproducible with a seeded random number generator and reports each new best route.
+    """
+    coordinates = np.random.default_rng(1).uniform(0, 1000, size=(100, 2))
+    tour, _ = tsp.nearest_neighbor_path(None, closed=True, start=0, coordinates=coordinates)
+
+    reported = []
+    best, distance = iterated_local_search(tour, coordinates=coordinates, max_seconds=None, max_iterations=100,
+                                           rng=random.Random(0), callback=lambda *best: reported.append(best))
+    assert reported[-1] == (best, distance)
+    assert iterated_local_search(tour, coordinates=coordinates, max_seconds=None, max_iterations=100,
+                                 rng=random.Random(0)) == (best, distance)
+
+    # a route is always returned, even without time to improve it
+    best, distance = iterated_local_search(tour, coordinates=coordinates, max_seconds=0)
+    assert best.closed
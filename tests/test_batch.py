@@ -0,0 +1,83 @@
+import os
+
+import pytest
+
+from tsp_hiram import batch
+from tsp_hiram.batch import BatchSolver, optimize_many
+from tsp_hiram.distance import euclidean_distance_matrix
+
+
+class _ExitOnLoad:
+    """Kills the worker process loading it."""
+
+    def __reduce__(self):
+        return os._exit, (3,)
+
+
+@pytest.fixture
+def instances():
+    return [[(x * i % 17, (x * x + i) % 13) for x in range(8 + i)] for i in range(6)]
+
+
+def test_optimize_many(instances):
+    """Test every instance is solved once, with the same distance as solving it alone.
+    """
+    results = list(optimize_many(instances, workers=2, use_nearest_neighbors=True, improve=False, closed=True,
+                                 dynamic_programming=False))
+    assert sorted(result.index for result in results) == list(range(len(instances)))
+    for result in results:
+        assert result.error is None
+        matrix = euclidean_distance_matrix(instances[result.index])
+        assert sorted(i for i, _ in result.route) == list(range(len(instances[result.index])))
+        assert result.distance == sum(matrix[i, j] for i, j in result.route)
+
+
+def test_optimize_many_seed(instances):
+    """Test a seeded batch gives every instance the same route for any number of workers.
+    """
+    results = [
+        sorted(optimize_many(instances, workers=workers, seed=3, use_nearest_neighbors=True, starting_node=0,
+                             dynamic_programming=False))
+        for workers in [1, 2]
+    ]
+    assert [(result.index, result.route) for result in results[0]] == [(result.index, result.route) for result in results[1]]
+
+
+def test_batch_solver_errors(instances):
+    """Test instances which raise or crash their worker fail alone and the pool keeps solving the others.
+    """
+    with BatchSolver(workers=2) as solver:
+        batch_instances = [instances[0], [(0, 0), (1, 'a')], _ExitOnLoad(), lambda: None, instances[1]]
+        results = {result.index: result for result in solver.solve(batch_instances, use_nearest_neighbors=True)}
+        assert sorted(results) == list(range(5))
+        assert results[0].error is None and results[4].error is None
+        assert isinstance(results[1].error, ValueError)
+        assert isinstance(results[2].error, RuntimeError)
+        assert results[3].error is not None
+
+        # the pool is reused for the next batch
+        results = list(solver.solve(instances[:2], use_nearest_neighbors=True))
+        assert all(result.error is None for result in results)
+
+
+def test_batch_solver_unpicklable_instance(instances):
+    """Test the instances after one which can't be sent to the only worker are still solved.
+    """
+    with BatchSolver(workers=1) as solver:
+        batch_instances = [instances[0], lambda: None, instances[1], instances[2]]
+        results = {result.index: result for result in solver.solve(batch_instances, use_nearest_neighbors=True)}
+    assert sorted(results) == list(range(4))
+    assert results[1].error is not None
+    assert all(results[index].error is None for index in [0, 2, 3])
+
+
+def test_batch_solver_time_limit(monkeypatch, instances):
+    """Test a worker running past the time limit of its instance is killed without stalling the batch.
+    """
+    monkeypatch.setattr(batch, 'KILL_GRACE_SECONDS', 0)
+    slow = [(i % 50, i // 50) for i in range(1500)]
+    with BatchSolver(workers=1) as solver:
+        results = list(solver.solve([slow, instances[0]], time_limit=0.5, use_nearest_neighbors=True))
+    assert [result.index for result in results] == [0, 1]
+    assert isinstance(results[0].error, TimeoutError)
+    assert results[1].error is None
@@ -0,0 +1,110 @@
+import itertools
+
+import numpy as np
+import pytest
+
+from tsp_hiram import tsp
+from tsp_hiram.batch import optimize_many
+from tsp_hiram.bounds import held_karp_bound, one_tree, optimality_gap
+
+
+def _optimal(distance_matrix) -> int:
+    """Length of the shortest closed route, by enumerating every route from node 0."""
+    n = len(distance_matrix)
+    return min(
+        sum(distance_matrix[a, b] for a, b in zip((0,) + order, order + (0,)))
+        for order in itertools.permutations(range(1, n))
+    )
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_held_karp_bound(seed):
+    """Test the bound is at most the optimal distance, and close to it.
+    """
+    rng = np.random.default_rng(seed)
+    distance_matrix = tsp.compute_euclidean_distance_matrix(rng.uniform(0, 100, size=(8, 2)))
+    optimal = _optimal(distance_matrix)
+    bound = held_karp_bound(distance_matrix)
+
+    assert one_tree(distance_matrix)[0] <= bound <= optimal
+    assert bound >= 0.95 * optimal
+    assert held_karp_bound(distance_matrix, upper_bound=optimal) <= optimal
+
+    asymmetric = distance_matrix + rng.integers(0, 20, size=distance_matrix.shape)
+    np.fill_diagonal(asymmetric, 0)
+    assert held_karp_bound(asymmetric) <= _optimal(asymmetric)
+
+
+def test_one_tree():
+    """Test the 1-tree of points on a circle is the route around it, every node having two edges.
+    """
+    angles = np.linspace(0, 2 * np.pi, 12, endpoint=False)
+    distance_matrix = tsp.compute_euclidean_distance_matrix(np.stack([np.cos(angles), np.sin(angles)], axis=1) * 100,
+                                                            truncate=False)
+    length, degrees = one_tree(distance_matrix)
+
+    assert degrees.tolist() == [2] * 12
+    assert length == pytest.approx(12 * distance_matrix[0, 1])
+    assert held_karp_bound(distance_matrix) == pytest.approx(length)
+
+
+def test_optimality_gap():
+    """Test the gap is relative to the distance.
+    """
+    assert optimality_gap(100, 90) == pytest.approx(0.1)
+    assert optimality_gap(100, 100) == optimality_gap(0, 0) == 0
+
+
+def test_optimize_full_output():
+    """Test optimize reports the bound and the gap of closed routes, and the anytime search stops within max_gap.
+    """
+    points = np.random.default_rng(0).uniform(0, 1000, size=(200, 2))
+    for options in [dict(use_nearest_neighbors=True, starting_node=0), dict(anytime=True, max_gap=0.05, max_seconds=60)]:
+        result = tsp.optimize(points, full_output=True, **options)
+        assert result.bound <= result.distance
+        assert result.gap == optimality_gap(result.distance, result.bound)
+    assert result.gap <= 0.05
+
+    assert tsp.optimize(points, max_distance=2000, full_output=True).bound is None
+    with pytest.raises(ValueError):
+        tsp.optimize(points, anytime=True, max_gap=1)
+
+
+def test_optimize_many_full_output():
+    """Test a batch solved with full_output reports the bound of every instance.
+    """
+    instances = [np.random.default_rng(seed).uniform(0, 100, size=(10, 2)) for seed in range(3)]
+    for result in optimize_many(instances, workers=1, use_nearest_neighbors=True, full_output=True,
+                                dynamic_programming=False):
+        assert result.error is None
+        assert 0 <= result.gap < 1
+
+
+def test_optimize_branch_and_cut_bound():
+    """Test optimize reports the bound proven by branch and cut, rather than the looser Held-Karp bound.
+    """
+    points = np.random.default_rng(0).uniform(0, 1000, size=(30, 2))
+    distance_matrix = tsp.compute_euclidean_distance_matrix(points)
+    result = tsp.optimize(points, full_output=True)
+
+    assert result.bound == result.distance and result.gap == 0
+    assert held_karp_bound(distance_matrix) <= result.bound
+
+
+def test_optimize_bound_without_time_limit():
+    """Test the bound and branch and cut run without a time budget, the anytime search stopping within max_gap.
+    """
+    points = np.random.default_rng(0).uniform(0, 1000, size=(100, 2))
+    result = tsp.optimize(points, anytime=True, max_gap=0.05, max_seconds=None, full_output=True)
+    assert result.bound <= result.distance and result.gap <= 0.05
+
+    result = tsp.optimize(points, use_nearest_neighbors=True, max_seconds=None, full_output=True)
+    assert result.bound <= result.distance
+
+    result = tsp.optimize(points[:30], max_seconds=None, full_output=True)
+    assert result.gap == 0
+
+    # nothing would stop the anytime search
+    for max_gap in [None, 0]:
+        with pytest.raises(ValueError):
+            tsp.optimize(points, anytime=True, max_gap=max_gap, max_seconds=None)
@@ -0,0 +1,64 @@
+import os
+
+import numpy as np
+
+from tsp_hiram.cache import DistanceCache
+from tsp_hiram.candidates import knn_candidates
+from tsp_hiram.distance import euclidean_distance_matrix
+
+
+def test_distance_matrix(tmp_path):
+    """Test the matrix is stored once and memory mapped afterwards, for integer and float coordinates alike.
+    """
+    cache = DistanceCache(tmp_path)
+    coordinates = [(0, 0), (3, 4), (6, 8), (1, 7)]
+
+    matrix = cache.distance_matrix(coordinates)
+    assert isinstance(matrix, np.memmap)
+    assert not matrix.flags.writeable
+    assert np.array_equal(matrix, euclidean_distance_matrix(coordinates))
+    assert len(os.listdir(tmp_path)) == 1
+
+    cached = cache.distance_matrix(np.asarray(coordinates, dtype=np.float64))
+    assert np.array_equal(cached, matrix)
+    assert len(os.listdir(tmp_path)) == 1
+
+    untruncated = cache.distance_matrix(coordinates, truncate=False)
+    assert untruncated.dtype == np.float64
+    assert len(os.listdir(tmp_path)) == 2
+
+
+def test_knn_candidates(tmp_path):
+    """Test the cached candidates are the same as those computed directly.
+    """
+    cache = DistanceCache(tmp_path)
+    coordinates = np.random.default_rng(0).uniform(0, 100, size=(50, 2))
+    expected = knn_candidates(coordinates, 5)
+    for _ in range(2):
+        graph = cache.knn_candidates(coordinates, 5)
+        assert np.array_equal(graph.indptr, expected.indptr)
+        assert np.array_equal(graph.indices, expected.indices)
+
+
+def test_evict(tmp_path):
+    """Test the least recently used entries are deleted once the cache grows above its size.
+    """
+    rng = np.random.default_rng(0)
+    instances = [rng.uniform(0, 100, size=(40, 2)) for _ in range(3)]
+    cache = DistanceCache(tmp_path, max_bytes=2 * (40 * 40 * 4 + 128))
+
+    first, second, third = (cache.key(c, 'euclidean', dtype='<i4', truncate=True) for c in instances)
+    cache.distance_matrix(instances[0])
+    cache.distance_matrix(instances[1])
+    os.utime(cache.path(first), (0, 0))
+    os.utime(cache.path(second), (1, 1))
+
+    # reading the first entry makes the second one the least recently used
+    assert cache.get(first) is not None
+    cache.distance_matrix(instances[2])
+    assert cache.get(second) is None
+    assert cache.get(first) is not None and cache.get(third) is not None
+    assert cache.size() <= cache.max_bytes
+
+    cache.clear()
+    assert cache.size() == 0
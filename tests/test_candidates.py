@@ -0,0 +1,46 @@
+import numpy as np
+import pytest
+
+from tsp_hiram.candidates import CandidateGraph, knn_candidates, knn_candidates_from_matrix
+from tsp_hiram.distance import euclidean_distance_matrix
+
+
+@pytest.mark.parametrize("shape", ["square", "line", "clustered"])
+def test_knn_candidates(shape):
+    """Test the candidates found with the grid index are the same as those found from the distance matrix.
+    """
+    rng = np.random.default_rng(0)
+    if shape == "square":
+        coordinates = rng.uniform(0, 100, size=(500, 2))
+    elif shape == "line":
+        coordinates = np.stack([rng.uniform(0, 1000, size=500), np.zeros(500)], axis=1)
+    else:
+        coordinates = np.concatenate([rng.uniform(0, 10, size=(250, 2)), rng.uniform(5000, 5010, size=(250, 2))])
+
+    graph = knn_candidates(coordinates, k=8)
+    expected = knn_candidates_from_matrix(euclidean_distance_matrix(coordinates, truncate=False), k=8)
+    assert np.array_equal(graph.indptr, expected.indptr)
+    assert np.array_equal(graph.indices, expected.indices)
+
+
+def test_knn_candidates_few_points():
+    """Test k is reduced when there are not enough other points.
+    """
+    graph = knn_candidates([(0, 0), (3, 4), (6, 8)], k=10)
+    assert graph.neighbors(0).tolist() == [1, 2]
+    assert graph.neighbors(1).tolist() == [0, 2]
+    assert knn_candidates([(0, 0)]).neighbors(0).tolist() == []
+
+
+def test_candidate_graph_edges():
+    """Test edges are unique undirected pairs and added edges are sorted among each node's candidates.
+    """
+    coordinates = [(0, 0), (1, 0), (3, 0), (10, 0)]
+    distance_matrix = euclidean_distance_matrix(coordinates)
+    graph = CandidateGraph.from_neighbors([[1], [0], [1], [2]])
+    assert graph.edges().tolist() == [[0, 1], [1, 2], [2, 3]]
+
+    graph = graph.with_edges([(3, 0), (0, 2)], distance_matrix)
+    assert graph.neighbors(0).tolist() == [1, 2, 3]
+    assert graph.neighbors(3).tolist() == [2, 0]
+    assert graph.edges().tolist() == [[0, 1], [0, 2], [0, 3], [1, 2], [2, 3]]
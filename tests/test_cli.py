@@ -1,10 +1,14 @@
 import csv
+import subprocess
 import sys
 
 import pytest
 
 from tsp_hiram.cli import main
 
+# Seconds importing the CLI may take on top of numpy, which every solver needs
+IMPORT_BUDGET_SECONDS = 0.25
+
 
 @pytest.fixture
 def coordinates_list():
@@ -29,8 +33,13 @@ def coordinates_list():
     return data
 
 
-@pytest.mark.parametrize("max_distance,expected", [(None, 750), (128, 126)])
-def test_main(monkeypatch, tmp_path, coordinates_list, max_distance, expected):
+@pytest.mark.parametrize("max_distance,expected,options", [
+    (None, 750, []),
+    (None, 750, ['--anytime', '--max-seconds', '1']),
+    (None, 750, ['--anytime', '--max-gap', '0']),
+    (128, 126, []),
+])
+def test_main(monkeypatch, tmp_path, coordinates_list, max_distance, expected, options):
     """Tests the CLI with and without max distance parameter
     """
     # Create a temporary file called "coordinates.csv"
@@ -46,9 +55,27 @@ def test_main(monkeypatch, tmp_path, coordinates_list, max_distance, expected):
 
     # Test the CLI with different args
     with monkeypatch.context() as m:
-        args = ['main', filepath]
+        args = ['main', filepath] + options
         if max_distance is not None:
             args += ['--max', str(max_distance)]
         m.setattr(sys, 'argv', args)
         route, distance = main()
         assert distance == expected
+
+
+def test_import_time():
+    """Test the CLI and the heuristics start without loading python-mip or asyncio, within the import time budget.
+    """
+    code = """if True:
+        import sys, time
+        import numpy
+        started = time.perf_counter()
+        import tsp_hiram.cli
+        seconds = time.perf_counter() - started
+        loaded = [module for module in ('mip', 'asyncio') if module in sys.modules]
+        tsp_hiram.tsp.optimize([(0, 0), (0, 3), (4, 0)], use_nearest_neighbors=True)
+        print(seconds, loaded, 'mip' in sys.modules)
+    """
+    output = subprocess.check_output([sys.executable, '-c', code], universal_newlines=True).split(' ', 1)
+    assert float(output[0]) < IMPORT_BUDGET_SECONDS
+    assert output[1].strip() == '[] False'
@@ -0,0 +1,62 @@
+import random
+
+import numpy as np
+import pytest
+
+from tsp_hiram import tsp
+from tsp_hiram.candidates import knn_candidates
+from tsp_hiram.construct import CONSTRUCTIONS, construct, greedy_tour, mst_tour
+
+
+@pytest.fixture
+def points():
+    return np.random.default_rng(0).uniform(0, 1000, size=(300, 2))
+
+
+@pytest.mark.parametrize("construction", CONSTRUCTIONS)
+@pytest.mark.parametrize("with_matrix", [False, True])
+def test_construct(points, construction, with_matrix):
+    """Test every construction returns a closed route through every node with its truncated euclidean length.
+    """
+    distance_matrix = tsp.compute_euclidean_distance_matrix(points)
+    tour, distance = construct(construction, distance_matrix if with_matrix else None, points, rng=random.Random(0))
+
+    assert tour.closed
+    assert sorted(tour.order().tolist()) == list(range(len(points)))
+    assert distance == tour.length(distance_matrix)
+
+
+def test_greedy_tour(points):
+    """Test the greedy route is shorter than the nearest neighbors one, and any candidate graph gives a route.
+    """
+    greedy = greedy_tour(coordinates=points)[1]
+    assert greedy < construct('nearest_neighbors', None, points, rng=random.Random(0))[1]
+
+    # the candidates split the points into clusters of 2 and 3 which are joined nearest end first
+    tour, distance = greedy_tour(coordinates=points, candidates=knn_candidates(points, 1))
+    assert sorted(tour.order().tolist()) == list(range(len(points)))
+    assert greedy <= distance
+
+
+def test_mst_tour():
+    """Test the double-tree route visits the nodes of a line in order and is at most twice the optimal one.
+    """
+    line = [(x, 0) for x in [0, 5, 1, 9, 3]]
+    tour, distance = mst_tour(coordinates=line)
+    assert tour.order().tolist() == [0, 2, 4, 1, 3]
+    assert distance == 18
+
+    points = np.random.default_rng(1).uniform(0, 100, size=(9, 2))
+    distance_matrix = tsp.compute_euclidean_distance_matrix(points)
+    assert mst_tour(distance_matrix)[1] <= 2 * tsp.branch_and_cut(distance_matrix)[1]
+
+
+def test_construct_errors(points):
+    """Test unknown constructions and the Hilbert curve without coordinates are rejected.
+    """
+    with pytest.raises(ValueError):
+        construct('unknown', coordinates=points)
+    with pytest.raises(ValueError):
+        construct('hilbert', tsp.compute_euclidean_distance_matrix(points))
+    with pytest.raises(ValueError):
+        tsp.optimize(points, construction='unknown')
@@ -0,0 +1,53 @@
+import numpy as np
+import pytest
+
+from tsp_hiram import tsp
+from tsp_hiram.decompose import partition, solve_decomposed
+from tsp_hiram.metrics import Metrics
+
+
+@pytest.fixture
+def clustered():
+    rng = np.random.default_rng(0)
+    centers = rng.uniform(0, 10000, size=(6, 2))
+    return np.concatenate([center + rng.normal(0, 200, size=(50, 2)) for center in centers])
+
+
+def test_partition(clustered):
+    """Test every point is in exactly one cell of at most cell_size points.
+    """
+    cells = partition(clustered, cell_size=40)
+
+    assert max(len(cell) for cell in cells) <= 40
+    assert sorted(np.concatenate(cells).tolist()) == list(range(len(clustered)))
+    assert len(partition(clustered[:5], cell_size=40)) == 1
+
+
+@pytest.mark.parametrize("cell_size", [1, 4, 60, 1000])
+def test_solve_decomposed(clustered, cell_size):
+    """Test the joined route visits every point once and its distance is its truncated euclidean length.
+    """
+    metrics = Metrics()
+    tour, distance = solve_decomposed(clustered, cell_size=cell_size, workers=1, metrics=metrics,
+                                      use_nearest_neighbors=True)
+    distance_matrix = tsp.compute_euclidean_distance_matrix(clustered)
+
+    assert tour.closed
+    assert sorted(tour.order().tolist()) == list(range(len(clustered)))
+    assert distance == tour.length(distance_matrix)
+    assert {'decomposition', 'cells', 'improvement'} <= set(metrics.timings)
+
+
+def test_optimize_cell_size(clustered):
+    """Test solving cells on several processes gives the same route as in this process, close to the whole solve.
+    """
+    options = dict(use_nearest_neighbors=True, cell_size=60, seed=3)
+    route, distance = tsp.optimize(clustered, workers=1, **options)
+    whole = tsp.optimize(clustered, use_nearest_neighbors=True, seed=3)[1]
+
+    assert tsp.optimize(clustered, workers=2, **options) == (route, distance)
+    assert sorted(i for i, _ in route) == list(range(len(clustered)))
+    assert distance < 1.1 * whole
+
+    with pytest.raises(ValueError):
+        tsp.optimize(clustered, max_distance=1000, cell_size=60)
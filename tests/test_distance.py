@@ -0,0 +1,82 @@
+import math
+
+import numpy as np
+import pytest
+
+from tsp_hiram import distance
+
+POINTS = [(0, 0), (3, 4), (-2, 7), (10, -1)]
+
+
+class _Coo:
+    """The attributes of a ``scipy.sparse.coo_matrix`` used by `from_sparse`."""
+
+    def __init__(self, row, col, data, shape):
+        self.row, self.col, self.data, self.shape = np.asarray(row), np.asarray(col), np.asarray(data), shape
+
+    def tocoo(self):
+        return self
+
+
+@pytest.mark.parametrize("metric, scalar", [
+    ("euclidean", lambda a, b: math.hypot(a[0] - b[0], a[1] - b[1])),
+    ("manhattan", lambda a, b: abs(a[0] - b[0]) + abs(a[1] - b[1])),
+    ("chebyshev", lambda a, b: max(abs(a[0] - b[0]), abs(a[1] - b[1]))),
+])
+@pytest.mark.parametrize("block_size", [None, 1, 3])
+def test_distance_matrix_metrics(metric, scalar, block_size):
+    """Test the vectorized kernels of the planar metrics match their scalar formulas, truncated or not.
+    """
+    untruncated = distance.distance_matrix(POINTS, metric, truncate=False, block_size=block_size)
+    truncated = distance.distance_matrix(POINTS, metric, block_size=block_size)
+    expected = [[scalar(a, b) for b in POINTS] for a in POINTS]
+
+    assert untruncated == pytest.approx(np.array(expected))
+    assert truncated.dtype == np.int32
+    assert truncated.tolist() == [[int(d) for d in row] for row in expected]
+
+
+def test_distance_matrix_haversine():
+    """Test haversine distances are great-circle distances in meters between (latitude, longitude) in degrees.
+    """
+    paris, london, antipode = (48.8566, 2.3522), (51.5074, -0.1278), (-48.8566, -177.6478)
+    matrix = distance.distance_matrix([paris, london, antipode], 'haversine', truncate=False)
+
+    assert matrix[0, 1] == matrix[1, 0] == pytest.approx(343.5e3, rel=1e-3)
+    assert matrix[0, 2] == pytest.approx(math.pi * distance.EARTH_RADIUS)
+    assert np.all(np.diag(matrix) == 0)
+
+
+def test_distance_matrix_overflow():
+    """Test distances which do not fit in the dtype are rejected instead of wrapping around.
+    """
+    with pytest.raises(ValueError):
+        distance.distance_matrix([(0, 0), (300, 0)], dtype=np.int8)
+    with pytest.raises(ValueError):
+        distance.distance_matrix([(0, 0), (100, 100)], 'manhattan', dtype=np.int8)
+
+
+def test_register_metric():
+    """Test a registered metric can be used by name and unknown metrics are rejected.
+    """
+    with pytest.raises(ValueError):
+        distance.distance_matrix(POINTS, 'unknown')
+
+    distance.register_metric('squared', lambda a, b: distance.METRICS['euclidean'](a, b) ** 2)
+    try:
+        assert distance.distance_matrix(POINTS[:2], 'squared').tolist() == [[0, 25], [25, 0]]
+    finally:
+        del distance.METRICS['squared']
+
+
+def test_from_sparse():
+    """Test a sparse matrix is densified with a cost larger than any route for the edges it does not store.
+    """
+    sparse = _Coo(row=[0, 1, 2, 2], col=[1, 2, 0, 2], data=[5, 7, 9, 4], shape=(3, 3))
+    dense, edges = distance.from_sparse(sparse)
+
+    assert dense.tolist() == [[0, 5, 30], [30, 0, 7], [9, 30, 0]]
+    assert edges.tolist() == [[0, 1], [1, 2], [2, 0]]
+    assert distance.from_sparse(sparse, missing=100)[0][1, 0] == 100
+    with pytest.raises(ValueError):
+        distance.from_sparse(_Coo(row=[0], col=[1], data=[1], shape=(2, 3)))
@@ -0,0 +1,96 @@
+import itertools
+
+import numpy as np
+import pytest
+
+from tsp_hiram import tsp
+from tsp_hiram.dp import DP_MAX_NODES, held_karp
+from tsp_hiram.metrics import Metrics
+
+
+def _best(distance_matrix, closed, start, max_distance):
+    """The most nodes and the shortest length of a route through them, by enumerating every route."""
+    n = len(distance_matrix)
+    best = (1, 0)
+    for size in range(2, n + 1):
+        for order in itertools.permutations(range(n), size):
+            if start is not None and order[0] != start:
+                continue
+            length = sum(distance_matrix[a, b] for a, b in zip(order, order[1:]))
+            if closed:
+                length += distance_matrix[order[-1], order[0]]
+            if (max_distance is None or length <= max_distance) and (size, -length) > (best[0], -best[1]):
+                best = (size, length)
+    return best
+
+
+@pytest.mark.parametrize("seed", range(6))
+@pytest.mark.parametrize("closed", [True, False])
+@pytest.mark.parametrize("start", [None, 2])
+@pytest.mark.parametrize("max_distance", [None, 0, 80, 150])
+def test_held_karp(seed, closed, start, max_distance):
+    """Test the route visits the most nodes within the max distance, and is the shortest to do so.
+    """
+    rng = np.random.default_rng(seed)
+    distance_matrix = rng.integers(1, 50, size=(6, 6))
+    if seed % 2:
+        distance_matrix = np.minimum(distance_matrix, distance_matrix.T)
+    np.fill_diagonal(distance_matrix, 0)
+    tour, distance = held_karp(distance_matrix, closed=closed, start=start, max_distance=max_distance)
+
+    order = tour.order().tolist()
+    assert (len(order), distance) == _best(distance_matrix, closed, start, max_distance)
+    assert distance == tour.length(distance_matrix)
+    assert tour.closed == (closed and len(order) > 1)
+    if start is not None:
+        assert order[0] == start
+
+
+def test_held_karp_sizes():
+    """Test routes through no node, one node and two nodes.
+    """
+    assert held_karp(np.zeros((0, 0)))[1] == 0
+    tour, distance = held_karp(np.zeros((1, 1)))
+    assert (tour.order().tolist(), distance) == ([0], 0)
+    tour, distance = held_karp(np.array([[0, 3], [4, 0]]))
+    assert (tour.edges(), distance) == ([(0, 1), (1, 0)], 7)
+    tour, distance = held_karp(np.array([[0, 3], [4, 0]]), closed=False, max_distance=2)
+    assert (len(tour.order()), distance) == (1, 0)
+
+
+def test_optimize_dynamic_programming():
+    """Test optimize solves small problems exactly without starting branch and cut, and reports a gap of 0.
+    """
+    points = np.random.default_rng(0).uniform(0, 1000, size=(DP_MAX_NODES, 2))
+    distance_matrix = tsp.compute_euclidean_distance_matrix(points)
+    metrics = Metrics()
+    result = tsp.optimize(points, full_output=True, metrics=metrics)
+
+    assert result.distance == held_karp(distance_matrix)[1]
+    assert (result.bound, result.gap) == (result.distance, 0)
+    assert 'dynamic_programming' in metrics.timings and 'mip_optimize' not in metrics.timings
+
+    route, distance = tsp.optimize(points, max_distance=2000, closed=False, starting_node=3)
+    tour, optimal = held_karp(distance_matrix, closed=False, start=3, max_distance=2000)
+    assert route == tour.edges() and route[0][0] == 3
+    assert distance == optimal <= 2000
+
+    metrics = Metrics()
+    tsp.optimize(points, dynamic_programming=False, metrics=metrics)
+    assert 'dynamic_programming' not in metrics.timings and 'mip_optimize' in metrics.timings
+
+
+@pytest.mark.parametrize("n", [DP_MAX_NODES, DP_MAX_NODES + 1])
+@pytest.mark.parametrize("options", [dict(), dict(use_nearest_neighbors=True, closed=False),
+                                     dict(use_nearest_neighbors=True, closed=False, starting_node=3),
+                                     dict(anytime=True, max_seconds=0.1)])
+def test_optimize_dynamic_programming_shape(n, options):
+    """Test the routes of the dynamic program have the shape of those of the algorithm it replaces, closed here.
+    """
+    points = np.random.default_rng(0).uniform(0, 1000, size=(n, 2))
+    route, _ = tsp.optimize(points, **options)
+
+    assert len(route) == n
+    assert sorted(i for i, _ in route) == sorted(j for _, j in route) == list(range(n))
+    if 'starting_node' in options:
+        assert route[0][0] == options['starting_node']
@@ -0,0 +1,68 @@
+import numpy as np
+import pytest
+
+from tsp_hiram.incremental import IncrementalTour
+from tsp_hiram.tour import Tour
+
+
+def _check(incremental, removed):
+    coordinates = incremental.coordinates()
+    tour = incremental.tour()
+    order = tour.order()
+    assert tour.closed
+    assert sorted(order.tolist()) == sorted(set(range(len(coordinates))) - removed)
+    deltas = coordinates[order] - coordinates[np.roll(order, -1)]
+    assert incremental.distance == np.trunc(np.hypot(*deltas.T)).sum()
+
+
+def test_update():
+    """Test points are added and removed while the route stays valid, its distance up to date and nodes stable.
+    """
+    rng = np.random.default_rng(0)
+    incremental = IncrementalTour(rng.uniform(0, 1000, size=(200, 2)), k=6)
+    removed = set()
+    _check(incremental, removed)
+
+    for _ in range(20):
+        remove = rng.choice(sorted(set(range(len(incremental.coordinates()))) - removed), size=3, replace=False)
+        added, tour, distance = incremental.update(add=rng.uniform(0, 1000, size=(4, 2)), remove=remove)
+        removed.update(remove.tolist())
+        assert added.tolist() == list(range(len(incremental.coordinates()) - 4, len(incremental.coordinates())))
+        assert tour == incremental.tour() and distance == incremental.distance
+        _check(incremental, removed)
+    assert len(incremental) == 200 + 20 * (4 - 3)
+
+    with pytest.raises(ValueError):
+        incremental.update(remove=[sorted(removed)[0]])
+
+
+def test_update_neighbors():
+    """Test the neighbors of every point are its k nearest ones after updates.
+    """
+    rng = np.random.default_rng(1)
+    incremental = IncrementalTour(rng.uniform(0, 1000, size=(100, 2)), k=5)
+    for node in range(10):
+        incremental.update(add=rng.uniform(0, 1000, size=(5, 2)), remove=[node])
+
+    coordinates = incremental.coordinates()
+    for i in incremental.tour().order().tolist():
+        others = np.array([j for j in incremental.tour().order().tolist() if j != i])
+        distances = np.hypot(*(coordinates[others] - coordinates[i]).T)
+        neighbor_distances = np.hypot(*(coordinates[incremental._neighbors[i]] - coordinates[i]).T)
+        # removals may leave fewer neighbors, but never farther ones than the nearest points
+        assert 5 // 2 <= len(neighbor_distances) <= 5
+        assert np.allclose(neighbor_distances, np.sort(distances)[:len(neighbor_distances)])
+
+
+def test_grow_from_few_points():
+    """Test a route grows from a single point and shrinks back to it.
+    """
+    incremental = IncrementalTour([(0, 0)], tour=Tour.from_order([0], 1))
+    added, _, distance = incremental.update(add=[(0, 10), (10, 10), (10, 0), (5, 5)])
+    assert added.tolist() == [1, 2, 3, 4]
+    assert distance == 44
+    _check(incremental, set())
+
+    _, _, distance = incremental.update(remove=[1, 2, 3, 4])
+    assert distance == 0
+    _check(incremental, {1, 2, 3, 4})
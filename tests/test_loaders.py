@@ -0,0 +1,104 @@
+import numpy as np
+import pytest
+
+from tsp_hiram.loaders import load_coordinates, read_csv, read_tsplib, save_coordinates
+
+
+@pytest.mark.parametrize("text", [
+    "x,y\n8,41\n220.5,125\n\n56,89\n",
+    "8,41\n220.5,125\n56,89",
+    "# points\nx;y\n8;41\n220.5;125\n56;89\n",
+    "x y\n8 41\n220.5   125\n56\t89\n",
+    '"x","y"\n8,41\n220.5,125\n56,89\n',
+])
+def test_read_csv(tmp_path, text):
+    """Test headers, delimiters, blank lines and comments are handled and floats are kept.
+    """
+    path = tmp_path / "coordinates.csv"
+    path.write_text(text)
+    coordinates = load_coordinates(path)
+    assert coordinates.dtype == np.float64
+    assert coordinates.tolist() == [[8, 41], [220.5, 125], [56, 89]]
+
+
+def test_read_csv_chunks(tmp_path):
+    """Test the result does not depend on the chunk size.
+    """
+    expected = np.random.default_rng(0).uniform(0, 1000, size=(1001, 2)).round(3)
+    path = tmp_path / "coordinates.csv"
+    np.savetxt(path, expected, delimiter=',', header='x,y', comments='', fmt='%.3f')
+    for chunk_size in (1, 7, 1000, 5000):
+        assert np.array_equal(read_csv(path, chunk_size=chunk_size), expected)
+
+
+def test_read_csv_columns(tmp_path):
+    """Test the coordinates are read from the given columns.
+    """
+    path = tmp_path / "coordinates.csv"
+    path.write_text("id,x,y\na,1,2\nb,3,4\n")
+    assert load_coordinates(path, columns=(1, 2)).tolist() == [[1, 2], [3, 4]]
+
+
+def test_read_csv_invalid(tmp_path):
+    """Test the lines which could not be parsed are reported.
+    """
+    path = tmp_path / "coordinates.csv"
+    path.write_text("x,y\n1,2\n3,4\n5,five\n6,7\n")
+    with pytest.raises(ValueError, match="lines 4 to 5"):
+        read_csv(path, chunk_size=2)
+
+
+def test_read_csv_empty(tmp_path):
+    """Test files without coordinates give an empty array.
+    """
+    path = tmp_path / "coordinates.csv"
+    path.write_text("x,y\n")
+    assert load_coordinates(path).shape == (0, 2)
+
+
+@pytest.mark.parametrize("filename", ["coordinates.tspb", "coordinates.npy"])
+@pytest.mark.parametrize("dtype", [np.float64, np.int32])
+def test_save_coordinates(tmp_path, filename, dtype):
+    """Test the binary and .npy files are memory mapped back to the saved coordinates.
+    """
+    coordinates = np.random.default_rng(0).integers(0, 1000, size=(100, 2))
+    path = tmp_path / filename
+    save_coordinates(path, coordinates, dtype=dtype)
+
+    loaded = load_coordinates(path)
+    assert isinstance(loaded, np.memmap)
+    assert loaded.dtype == dtype
+    assert np.array_equal(loaded, coordinates)
+    assert list(tmp_path.iterdir()) == [path]
+
+
+def test_load_coordinates_invalid(tmp_path):
+    """Test arrays which are not 2D coordinates and truncated files are rejected.
+    """
+    path = tmp_path / "coordinates.npy"
+    np.save(path, np.zeros((4, 3)))
+    with pytest.raises(ValueError, match="shape"):
+        load_coordinates(path)
+
+    path = tmp_path / "coordinates.tspb"
+    save_coordinates(path, np.zeros((4, 2)))
+    path.write_bytes(path.read_bytes()[:-1])
+    with pytest.raises(ValueError, match="truncated"):
+        load_coordinates(path)
+
+
+def test_read_tsplib(tmp_path):
+    """Test the node coordinates of a TSPLIB instance are read and instances without them are rejected.
+    """
+    path = tmp_path / "tiny.tsp"
+    path.write_text("NAME : tiny\nTYPE : TSP\nDIMENSION : 3\nEDGE_WEIGHT_TYPE : EUC_2D\nNODE_COORD_SECTION\n"
+                    "1 0 0\n2 3.5 4\n3 6e2 8\nEOF\n")
+    assert np.array_equal(load_coordinates(path), [(0, 0), (3.5, 4), (600, 8)])
+
+    path.write_text("NAME : tiny\nDIMENSION : 4\nNODE_COORD_SECTION\n1 0 0\n2 3 4\nEOF\n")
+    with pytest.raises(ValueError, match="DIMENSION"):
+        read_tsplib(path)
+
+    path.write_text("NAME : tiny\nDIMENSION : 2\nEDGE_WEIGHT_TYPE : EXPLICIT\nEDGE_WEIGHT_SECTION\n0 1\n1 0\nEOF\n")
+    with pytest.raises(ValueError, match="NODE_COORD_SECTION"):
+        read_tsplib(path)
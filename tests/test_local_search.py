@@ -0,0 +1,90 @@
+import numpy as np
+import pytest
+
+from tsp_hiram import tsp
+from tsp_hiram.candidates import knn_candidates
+from tsp_hiram.local_search import LocalSearch, improve_tour
+from tsp_hiram.tour import Tour
+
+
+@pytest.mark.parametrize("n", [1, 2, 3, 4, 5, 50, 400])
+@pytest.mark.parametrize("two_opt,or_opt", [(True, False), (False, True), (True, True)])
+def test_improve_tour(n, two_opt, or_opt):
+    """Test the improved route visits every node once, starts from the same node, and is not longer.
+    """
+    coordinates = np.random.default_rng(n).uniform(0, 1000, size=(n, 2))
+    distance_matrix = tsp.compute_euclidean_distance_matrix(coordinates)
+    tour, distance = tsp.nearest_neighbor_path(distance_matrix, closed=True, start=n // 2)
+
+    candidates = knn_candidates(coordinates)
+    improved, improved_distance = improve_tour(tour, distance_matrix, candidates=candidates, two_opt=two_opt, or_opt=or_opt)
+    assert improved.closed
+    assert improved.start == n // 2
+    assert sorted(improved.order().tolist()) == list(range(n))
+    assert improved.length(distance_matrix) == improved_distance <= distance
+    if n >= 50:
+        assert improved_distance < distance
+
+    # the same distances are computed from the coordinates without a matrix
+    expected = (improved, improved_distance)
+    assert improve_tour(tour, coordinates=coordinates, candidates=candidates, two_opt=two_opt, or_opt=or_opt) == expected
+
+
+def test_improve_tour_fixes_crossing():
+    """Test 2-opt uncrosses a route around the corners of a square and Or-opt moves a misplaced node back.
+    """
+    coordinates = [(0, 0), (10, 0), (10, 10), (0, 10), (5, 0)]
+    distance_matrix = tsp.compute_euclidean_distance_matrix(coordinates)
+
+    _, distance = improve_tour(Tour.from_order([0, 1, 3, 2], 5), distance_matrix, or_opt=False)
+    assert distance == 40
+    _, distance = improve_tour(Tour.from_order([0, 1, 2, 4, 3], 5), distance_matrix, two_opt=False)
+    assert distance == 40
+
+
+def test_improve_tour_subset():
+    """Test only the nodes of a route through some of the nodes are moved.
+    """
+    coordinates = np.random.default_rng(0).uniform(0, 100, size=(60, 2))
+    distance_matrix = tsp.compute_euclidean_distance_matrix(coordinates)
+    tour, distance = tsp.nearest_neighbor_path(distance_matrix, closed=True, start=0, max_distance=300)
+
+    improved, improved_distance = improve_tour(tour, distance_matrix)
+    assert sorted(improved.order().tolist()) == sorted(tour.order().tolist())
+    assert improved.length(distance_matrix) == improved_distance <= distance
+
+
+def test_improve_tour_budget():
+    """Test the iteration budget limits the number of moves, and open routes are rejected.
+    """
+    coordinates = np.random.default_rng(0).uniform(0, 1000, size=(200, 2))
+    distance_matrix = tsp.compute_euclidean_distance_matrix(coordinates)
+    tour, distance = tsp.nearest_neighbor_path(distance_matrix, closed=True, start=0)
+
+    assert improve_tour(tour, distance_matrix, max_iterations=0)[1] == distance
+    one_move = improve_tour(tour, distance_matrix, max_iterations=1)[1]
+    assert improve_tour(tour, distance_matrix)[1] <= one_move < distance
+
+    open_tour, _ = tsp.nearest_neighbor_path(distance_matrix, start=0, max_distance=500)
+    with pytest.raises(ValueError):
+        improve_tour(open_tour, distance_matrix)
+
+
+def test_insert_remove():
+    """Test inserting and removing nodes keeps the route and its cost consistent, whichever side is shifted.
+    """
+    coordinates = np.random.default_rng(0).uniform(0, 1000, size=(30, 2))
+    distance_matrix = tsp.compute_euclidean_distance_matrix(coordinates)
+    search = LocalSearch(Tour.from_order([], 30), distance_matrix.item, knn_candidates(coordinates))
+
+    order = []
+    for node in range(30):
+        after = order[node // 2] if order else None
+        search.insert(node, after)
+        order.insert(node // 2 + 1 if order else 0, node)
+        assert search.cost == search.length() == Tour.from_order(order, 30).length(distance_matrix)
+    for node in [0, 29, 14, 3, 27]:
+        search.remove(node)
+        order.remove(node)
+        assert search.cost == search.length() == Tour.from_order(order, 30).length(distance_matrix)
+        assert sorted(search.tour().order().tolist()) == sorted(order)
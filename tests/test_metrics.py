@@ -0,0 +1,59 @@
+import logging
+import subprocess
+import sys
+
+from tsp_hiram import tsp
+from tsp_hiram.metrics import Metrics
+
+GRID = [(x, y) for x in range(5) for y in range(5)]
+
+
+def test_timer_and_counters():
+    """Test phases add up, are sent to the sink as they end, and counters add up.
+    """
+    ended = []
+    metrics = Metrics(sink=lambda phase, seconds: ended.append(phase))
+    for _ in range(2):
+        with metrics.timer('construction'):
+            pass
+    metrics.count('ties', 2)
+    metrics.update({'ties': 1, 'starts': 4})
+
+    assert ended == ['construction', 'construction']
+    assert metrics.timings['construction'] >= 0
+    assert metrics.to_dict()['counters'] == {'ties': 3, 'starts': 4}
+
+
+def test_optimize_metrics():
+    """Test every phase of each solver path of optimize is timed and its counters filled in.
+    """
+    metrics = Metrics()
+    tsp.optimize(GRID, use_nearest_neighbors=True, metrics=metrics)
+    assert set(metrics.timings) == {'matrix', 'construction', 'improvement'}
+    assert metrics.counters['starts'] == len(GRID)
+    assert metrics.counters['nodes_visited'] == len(GRID) ** 2
+    assert metrics.counters['ties'] > 0
+
+    metrics = Metrics()
+    tsp.optimize(GRID, max_seconds=5, metrics=metrics)
+    assert {'mip_build', 'mip_optimize', 'route_extraction'} <= set(metrics.timings)
+    assert metrics.counters['mip_rounds'] == 1
+
+    metrics = Metrics()
+    tsp.optimize(GRID, anytime=True, max_seconds=0.2, metrics=metrics)
+    assert metrics.counters['kicks'] >= metrics.counters['improvements']
+
+
+def test_import_leaves_logging_alone():
+    """Test importing the package leaves the logging configuration to the application.
+    """
+    code = 'import logging, tsp_hiram.tsp; print(len(logging.getLogger().handlers))'
+    assert subprocess.check_output([sys.executable, '-c', code], universal_newlines=True).strip() == '0'
+
+
+def test_nearest_neighbor_logging(caplog):
+    """Test the nearest neighbors algorithm logs nothing at INFO level, however many ties it breaks.
+    """
+    with caplog.at_level(logging.INFO, logger='tsp_hiram'):
+        tsp.nearest_neighbor_path(tsp.compute_euclidean_distance_matrix(GRID), start=0)
+    assert not caplog.records
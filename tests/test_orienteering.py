@@ -0,0 +1,89 @@
+import itertools
+import random
+
+import numpy as np
+import pytest
+
+from tsp_hiram import tsp
+from tsp_hiram.candidates import knn_candidates
+from tsp_hiram.orienteering import orienteering
+
+
+def brute_force(distance_matrix, max_distance, closed, start):
+    """Returns the most nodes any route within max_distance can visit."""
+    n = len(distance_matrix)
+    best = 1
+    for size in range(2, n + 1):
+        for order in itertools.permutations(range(n), size):
+            if start is not None and order[0] != start:
+                continue
+            edges = list(zip(order[:-1], order[1:])) + ([(order[-1], order[0])] if closed else [])
+            if sum(distance_matrix[i, j] for i, j in edges) <= max_distance:
+                best = size
+                break
+    return best
+
+
+@pytest.mark.parametrize("closed", [False, True])
+@pytest.mark.parametrize("start", [None, 3])
+def test_orienteering(closed, start):
+    """Test the route is within budget, starts from the fixed start, and visits at least as many nodes as a nearest
+    neighbor route.
+    """
+    coordinates = np.random.default_rng(0).integers(0, 1000, size=(300, 2))
+    distance_matrix = tsp.compute_euclidean_distance_matrix(coordinates)
+    for max_distance in [0, 500, 2000, 10 ** 6]:
+        tour, distance = orienteering(distance_matrix, max_distance, closed=closed, start=start, rng=random.Random(0))
+        order = tour.order().tolist()
+        assert len(order) == len(set(order))
+        assert tour.length(distance_matrix) == distance <= max_distance
+        if start is not None:
+            assert order[0] == start
+        if len(order) > 1:
+            assert tour.closed == closed
+
+        if start is None:
+            nearest, _ = tsp.multi_start_nearest_neighbor(distance_matrix, closed=closed, max_distance=max_distance, seed=0)
+        else:
+            nearest, _ = tsp.nearest_neighbor_path(distance_matrix, closed=closed, max_distance=max_distance, start=start)
+        assert len(order) >= len(nearest.order())
+        if max_distance == 10 ** 6:
+            assert len(order) == 300
+
+
+@pytest.mark.parametrize("closed", [False, True])
+@pytest.mark.parametrize("start", [None, 0])
+def test_orienteering_exact(closed, start):
+    """Test the exact solver visits as many nodes as possible on small inputs.
+    """
+    coordinates = np.random.default_rng(1).integers(0, 100, size=(7, 2))
+    distance_matrix = tsp.compute_euclidean_distance_matrix(coordinates)
+    for max_distance in [50, 150]:
+        heuristic, _ = orienteering(distance_matrix, max_distance, closed=closed, start=start)
+        tour, distance = orienteering(distance_matrix, max_distance, closed=closed, start=start, exact=True)
+        assert len(heuristic.order()) <= len(tour.order()) == brute_force(distance_matrix, max_distance, closed, start)
+        assert tour.length(distance_matrix) == distance <= max_distance
+
+
+def test_orienteering_matrix_free():
+    """Test the same route is found from the coordinates as from the distance matrix.
+    """
+    coordinates = np.random.default_rng(2).integers(0, 1000, size=(200, 2))
+    distance_matrix = tsp.compute_euclidean_distance_matrix(coordinates)
+    candidates = knn_candidates(coordinates)
+    expected = orienteering(distance_matrix, 1500, candidates=candidates, rng=random.Random(0))
+    assert orienteering(None, 1500, coordinates=coordinates, candidates=candidates, rng=random.Random(0)) == expected
+
+
+@pytest.mark.parametrize("start", [None, 5])
+def test_orienteering_out_of_time(start):
+    """Test a route within the budget is returned even when there is no time to search for one.
+    """
+    coordinates = np.random.default_rng(3).integers(0, 1000, size=(100, 2))
+    distance_matrix = tsp.compute_euclidean_distance_matrix(coordinates)
+    tour, distance = orienteering(distance_matrix, 2000, start=start, max_seconds=0)
+    assert len(tour.order()) > 1
+    assert tour.length(distance_matrix) == distance <= 2000
+
+    route, distance = tsp.optimize(coordinates, max_distance=2000, starting_node=start, max_seconds=0)
+    assert route and distance <= 2000
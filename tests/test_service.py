@@ -0,0 +1,94 @@
+import asyncio
+import json
+import time
+
+import pytest
+
+from tsp_hiram.service import ServiceOverloaded, SolverService, solve
+from tsp_hiram.tsp import optimize
+
+COORDINATES = [(8, 41), (220, 125), (56, 89), (196, 145), (196, 49), (64, 21), (124, 117), (212, 65)]
+SLOW = [(i % 50, i // 50) for i in range(1500)]
+
+
+def test_solve():
+    """Test a request is solved in a worker process like with optimize.
+    """
+    route, distance = asyncio.run(solve(COORDINATES, max_seconds=5))
+    assert sorted(i for i, _ in route) == list(range(len(COORDINATES)))
+    assert (route, distance) == optimize(COORDINATES, max_seconds=5)
+
+    # the distance is returned as optimize returns it, such as the float objective of branch and cut
+    _, distance = asyncio.run(solve(COORDINATES, max_seconds=5, dynamic_programming=False))
+    _, expected = optimize(COORDINATES, max_seconds=5, dynamic_programming=False)
+    assert distance == expected and type(distance) is type(expected)
+
+    with pytest.raises(AssertionError):
+        asyncio.run(solve(COORDINATES, starting_node=100, use_nearest_neighbors=True))
+
+
+def test_deduplicate_and_overload():
+    """Test identical requests share one job and requests above max_pending are rejected.
+    """
+    async def main():
+        async with SolverService(workers=1, max_pending=1) as service:
+            first = asyncio.ensure_future(service.solve(COORDINATES, use_nearest_neighbors=True))
+            second = asyncio.ensure_future(service.solve(COORDINATES, use_nearest_neighbors=True))
+            await asyncio.sleep(0)
+            assert service.pending() == 1
+            with pytest.raises(ServiceOverloaded):
+                await service.solve(COORDINATES[:-1], use_nearest_neighbors=True)
+            assert await first == await second
+            assert service.pending() == 0
+
+    asyncio.run(main())
+
+
+def test_cancel():
+    """Test cancelling a request kills its worker so the next request is solved right away.
+    """
+    async def main():
+        async with SolverService(workers=1) as service:
+            slow = asyncio.ensure_future(service.solve(SLOW, use_nearest_neighbors=True))
+            await asyncio.sleep(0.2)
+            slow.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await slow
+
+            started = time.monotonic()
+            await service.solve(COORDINATES, use_nearest_neighbors=True, improve=False)
+            return time.monotonic() - started
+
+    assert asyncio.run(main()) < 2
+
+
+async def _request(port, method, path, payload=None):
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    body = b'' if payload is None else json.dumps(payload).encode()
+    writer.write(f'{method} {path} HTTP/1.1\r\nHost: localhost\r\nContent-Length: {len(body)}\r\n\r\n'.encode() + body)
+    response = await reader.read()
+    writer.close()
+    head, _, body = response.partition(b'\r\n\r\n')
+    return int(head.split()[1]), json.loads(body)
+
+
+def test_server():
+    """Test the HTTP endpoint solves posted coordinates and reports invalid requests.
+    """
+    async def main():
+        async with SolverService(workers=1) as service:
+            server = await service.start_server(port=0)
+            port = server.sockets[0].getsockname()[1]
+            async with server:
+                status, response = await _request(port, 'POST', '/solve',
+                                                  {'coordinates': COORDINATES, 'use_nearest_neighbors': True})
+                assert status == 200
+                assert sorted(i for i, _ in response['route']) == list(range(len(COORDINATES)))
+
+                assert (await _request(port, 'GET', '/health'))[0] == 200
+                assert (await _request(port, 'GET', '/solve'))[0] == 405
+                assert (await _request(port, 'GET', '/nothing'))[0] == 404
+                assert (await _request(port, 'POST', '/solve', {'coordinates': COORDINATES, 'workers': 8}))[0] == 400
+                assert (await _request(port, 'POST', '/solve', {'points': COORDINATES}))[0] == 400
+
+    asyncio.run(main())
@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+
+from tsp_hiram.distance import euclidean_distance_matrix
+from tsp_hiram.spatial import GridIndex, hilbert_order
+
+
+@pytest.mark.parametrize("truncate", [True, False])
+@pytest.mark.parametrize("shape", ["square", "line", "clustered"])
+def test_grid_index_nearest(truncate, shape):
+    """Test the grid index returns the same nearest points as a scan of the distance matrix while points are removed.
+    """
+    rng = np.random.default_rng(0)
+    if shape == "square":
+        coordinates = rng.integers(0, 100, size=(300, 2))
+    elif shape == "line":
+        coordinates = np.stack([rng.integers(0, 1000, size=300), np.zeros(300, dtype=int)], axis=1)
+    else:
+        coordinates = np.concatenate([rng.integers(0, 10, size=(150, 2)), rng.integers(5000, 5010, size=(150, 2))])
+
+    distance_matrix = euclidean_distance_matrix(coordinates, truncate=truncate)
+    index = GridIndex(coordinates, truncate=truncate)
+    alive = np.ones(len(coordinates), dtype=bool)
+
+    for node in rng.permutation(len(coordinates))[:-1]:
+        index.remove(node)
+        alive[node] = False
+
+        row = np.where(alive, distance_matrix[node], np.inf)
+        ties, distance = index.nearest(node)
+        assert distance == row.min()
+        assert ties.tolist() == np.flatnonzero(row == row.min()).tolist()
+        assert index.distance(node, ties[0]) == distance
+
+    assert index.n_alive == 1
+
+
+def test_hilbert_order():
+    """Test the Hilbert curve visits every cell of a grid once, each step moving to an adjacent cell.
+    """
+    grid = np.array([(x, y) for x in range(16) for y in range(16)])
+    order = hilbert_order(grid[::-1], bits=4)
+    steps = np.abs(np.diff(grid[::-1][order], axis=0)).sum(axis=1)
+
+    assert sorted(order.tolist()) == list(range(len(grid)))
+    assert np.all(steps == 1)
+    assert len(hilbert_order(np.empty((0, 2)))) == 0
@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+
+from tsp_hiram.tour import Tour
+
+
+@pytest.mark.parametrize("closed", [True, False])
+def test_tour_conversions(closed):
+    """Test a tour converts to and from its visiting order, edges and route matrix.
+    """
+    n = 8
+    order = [5, 2, 7, 0, 3]
+    tour = Tour.from_order(order, n, closed=closed)
+
+    assert tour.successors.dtype == np.int32
+    assert tour.start == 5
+    assert tour.closed is closed
+    assert tour.order().tolist() == order
+    assert len(tour) == (5 if closed else 4)
+
+    edges = [(5, 2), (2, 7), (7, 0), (0, 3)] + ([(3, 5)] if closed else [])
+    assert tour.edges() == edges
+    assert Tour.from_edges(edges[::-1], n, start=5) == tour
+
+    # without a start, loops start from their lowest node
+    from_matrix = Tour.from_matrix(tour.to_matrix())
+    assert from_matrix.successors.tolist() == tour.successors.tolist()
+    assert from_matrix.start == (0 if closed else 5)
+
+
+def test_tour_single_node():
+    """Test routes which don't leave their start.
+    """
+    tour = Tour.from_order([4], 6, closed=False)
+    assert len(tour) == 0
+    assert tour.edges() == []
+    assert tour.order().tolist() == [4]
+
+    tour = Tour.from_order([0], 1, closed=True)
+    assert tour.edges() == [(0, 0)]
+
+
+def test_tour_from_matrix_invalid():
+    """Test a matrix leaving a node more than once is rejected.
+    """
+    with pytest.raises(ValueError):
+        Tour.from_matrix([[0, 1, 1], [0, 0, 0], [0, 0, 0]])
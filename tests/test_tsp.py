@@ -5,6 +5,9 @@ import numpy as np
 import pytest
 
 from tsp_hiram import tsp
+from tsp_hiram.cache import DistanceCache
+from tsp_hiram.candidates import knn_candidates_from_matrix
+from tsp_hiram.tour import Tour
 
 
 @pytest.fixture
@@ -89,18 +92,89 @@ def test_distance_matrix():
     """
     coordinates = [(288, 149), (288, 129), (270, 133)]
     edm = tsp.compute_euclidean_distance_matrix(coordinates)
-    assert edm == [
+    assert edm.tolist() == [
         [0, 20, 24],
         [20, 0, 18],
         [24, 18, 0],
     ]
 
 
-def test_branch_and_cut(distance_matrix_mip):
+@pytest.mark.parametrize("dtype", [np.int32, np.float32, np.float64])
+@pytest.mark.parametrize("block_size", [None, 1, 7])
+def test_distance_matrix_truncation(coordinates_google, dtype, block_size):
+    """Test the vectorized distance matrix keeps the int(math.hypot) truncation for any dtype and block size.
+    """
+    edm = tsp.compute_euclidean_distance_matrix(coordinates_google, dtype=dtype, block_size=block_size)
+    expected = [[int(math.hypot(a[0] - b[0], a[1] - b[1])) for b in coordinates_google] for a in coordinates_google]
+
+    assert edm.dtype == dtype
+    assert edm.flags['C_CONTIGUOUS']
+    assert edm.tolist() == expected
+
+
+def test_distance_matrix_untruncated():
+    """Test distances are not truncated when truncate is False.
+    """
+    edm = tsp.compute_euclidean_distance_matrix([(0, 0), (1, 1)], truncate=False)
+    assert edm.dtype == np.float64
+    assert edm[0, 1] == pytest.approx(math.sqrt(2))
+
+
+@pytest.mark.parametrize("formulation", [None, "mtz", "symmetric"])
+def test_branch_and_cut(distance_matrix_mip, formulation):
     """Test the correct solution is returned from the branch and cut algorithm according to distance of solution.
     """
-    route_matrix, distance = tsp.branch_and_cut(distance_matrix_mip)
+    tour, distance = tsp.branch_and_cut(distance_matrix_mip, formulation=formulation)
+    assert int(distance) == 547
+    assert tour.closed
+    assert tour.length(distance_matrix_mip) == 547
+
+
+@pytest.mark.parametrize("formulation", ["mtz", "symmetric"])
+def test_branch_and_cut_candidates(distance_matrix_mip, formulation):
+    """Test branch and cut restricted to candidate edges finds the optimal route when it only uses candidate edges,
+    and a route at least as short as its seeded nearest neighbor start otherwise.
+    """
+    candidates = knn_candidates_from_matrix(distance_matrix_mip, 4)
+    tour, distance = tsp.branch_and_cut(distance_matrix_mip, formulation=formulation, candidates=candidates)
     assert int(distance) == 547
+    assert tour.length(distance_matrix_mip) == 547
+
+    candidates = knn_candidates_from_matrix(distance_matrix_mip, 1)
+    tour, distance = tsp.branch_and_cut(distance_matrix_mip, formulation=formulation, candidates=candidates, seed=0)
+    _, initial_distance = tsp.nearest_neighbor_path(distance_matrix_mip, closed=True, rng=random.Random(0))
+    assert tour.closed
+    assert tour.length(distance_matrix_mip) == int(distance)
+    assert 547 <= int(distance) <= initial_distance
+
+
+@pytest.mark.parametrize("formulation", ["mtz", "symmetric"])
+def test_branch_and_cut_warm_start(distance_matrix_mip, formulation):
+    """Test branch and cut starts from a given route, prunes with a cutoff and reports the bound and solution pool.
+    """
+    optimal, distance = tsp.branch_and_cut(distance_matrix_mip, formulation=formulation)
+
+    result = tsp.branch_and_cut(distance_matrix_mip, formulation=formulation, initial_tour=optimal, full_output=True)
+    assert result.distance == 547
+    assert result.bound == pytest.approx(547) and result.gap == pytest.approx(0)
+    assert result.solutions[0][1] == 547
+    assert all(tour.length(distance_matrix_mip) == d for tour, d in result.solutions)
+    assert [d for _, d in result.solutions] == sorted(d for _, d in result.solutions)
+    assert len(result.rounds) == 1
+
+    # no route is shorter than the optimal one, which is returned
+    tour, distance = tsp.branch_and_cut(distance_matrix_mip, formulation=formulation, initial_tour=optimal, cutoff=546)
+    assert tour == optimal and distance == 547
+
+    # a 50% gap is reached by the initial route at the latest
+    initial, initial_distance = tsp.nearest_neighbor_path(distance_matrix_mip, closed=True, start=0)
+    result = tsp.branch_and_cut(distance_matrix_mip, formulation=formulation, initial_tour=initial, max_gap=0.5,
+                                full_output=True)
+    assert result.distance <= initial_distance
+    assert result.gap <= 0.5
+
+    with pytest.raises(ValueError):
+        tsp.branch_and_cut(distance_matrix_mip, initial_tour=Tour.from_order(range(14), 14, closed=False))
 
 
 def test_nearest_neighbor_shortest_full_route(distance_matrix_mip):
@@ -111,28 +185,74 @@ def test_nearest_neighbor_shortest_full_route(distance_matrix_mip):
     best_route = None
 
     for vertex in range(len(distance_matrix_mip)):
-        route_matrix, distance = tsp.nearest_neighbor_path(distance_matrix_mip, start=vertex)
+        tour, distance = tsp.nearest_neighbor_path(distance_matrix_mip, start=vertex)
 
         # Make sure the route touches all the nodes
-        assert np.sum(route_matrix) == len(distance_matrix_mip)
+        assert len(tour) == len(distance_matrix_mip)
 
         if distance < best_distance:
             best_distance = distance
-            best_route = route_matrix
+            best_route = tour
 
-    assert tsp.get_edges_from_route_matrix(best_route) == [
+    assert best_route.edges() == tsp.get_edges_from_route_matrix(best_route.to_matrix()) == [
         (0, 8), (8, 5), (5, 13), (13, 7), (7, 6), (6, 2), (2, 10), (10, 12), (12, 11), (11, 3), (3, 9), (9, 4), (4, 1), (1, 0)
     ]
 
 
+def test_nearest_neighbor_unreachable():
+    """Test nodes unreachable from each other with an infinite distance are not mistaken for visited ones.
+    """
+    distance_matrix = np.full((5, 5), np.inf)
+    np.fill_diagonal(distance_matrix, 0)
+    for i in range(5):
+        distance_matrix[i, (i + 1) % 5] = distance_matrix[(i + 1) % 5, i] = 1
+    distance_matrix[0, 2] = distance_matrix[2, 0] = 3
+
+    tour, distance = tsp.nearest_neighbor_path(distance_matrix, closed=True, start=0)
+    assert sorted(tour.order().tolist()) == list(range(5))
+    assert distance == tour.length(distance_matrix) == 5
+
+
+@pytest.mark.parametrize("closed", [True, False])
+@pytest.mark.parametrize("max_distance", [None, 150])
+def test_nearest_neighbor_as_matrix(distance_matrix_mip, closed, max_distance):
+    """Test the legacy route matrix output describes the same route as the tour.
+    """
+    for vertex in range(len(distance_matrix_mip)):
+        route_matrix, distance = tsp.nearest_neighbor_path(distance_matrix_mip, closed=closed, max_distance=max_distance, start=vertex,
+                                                           as_matrix=True, rng=random.Random(vertex))
+        tour, _distance = tsp.nearest_neighbor_path(distance_matrix_mip, closed=closed, max_distance=max_distance, start=vertex,
+                                                    rng=random.Random(vertex))
+
+        assert _distance == distance
+        assert tour.to_matrix() == route_matrix
+        assert sorted(tsp.get_edges_from_route_matrix(route_matrix)) == sorted(tour.edges())
+        assert tour.length(distance_matrix_mip) == distance
+
+
+@pytest.mark.parametrize("closed", [True, False])
+@pytest.mark.parametrize("max_distance", [None, 500])
+def test_nearest_neighbor_matrix_free(coordinates_google, closed, max_distance):
+    """Test the matrix-free nearest neighbor algorithm finds the same routes as the one using the distance matrix.
+    """
+    distance_matrix = tsp.compute_euclidean_distance_matrix(coordinates_google)
+    for vertex in range(0, len(coordinates_google), 20):
+        tour, distance = tsp.nearest_neighbor_path(distance_matrix, closed=closed, max_distance=max_distance, start=vertex,
+                                                   rng=random.Random(vertex))
+        _tour, _distance = tsp.nearest_neighbor_path(None, closed=closed, max_distance=max_distance, start=vertex,
+                                                     coordinates=coordinates_google, rng=random.Random(vertex))
+
+        assert _distance == distance
+        assert _tour == tour
+
+
 @pytest.mark.parametrize("max_distance,expected", [(0, 0), (150, 6), (200, 7), (10000, 14)])
 def test_nearest_neighbor_most_nodes_open(distance_matrix_mip, max_distance, expected):
     """Test the goal of finding the most number of nodes given a fixed distance.
     """
     most_nodes = 0
     for vertex in range(len(distance_matrix_mip)):
-        route_matrix, _ = tsp.nearest_neighbor_path(distance_matrix_mip, closed=False, max_distance=max_distance, start=vertex)
-        route = tsp.get_edges_from_route_matrix(route_matrix)
+        route, _ = tsp.nearest_neighbor_path(distance_matrix_mip, closed=False, max_distance=max_distance, start=vertex)
 
         if len(route) > most_nodes:
             most_nodes = len(route)
@@ -146,8 +266,7 @@ def test_nearest_neighbor_most_nodes_closed(distance_matrix_mip, max_distance, e
     """
     most_nodes = 0
     for vertex in range(len(distance_matrix_mip)):
-        route_matrix, _ = tsp.nearest_neighbor_path(distance_matrix_mip, closed=True, max_distance=max_distance, start=vertex)
-        route = tsp.get_edges_from_route_matrix(route_matrix)
+        route, _ = tsp.nearest_neighbor_path(distance_matrix_mip, closed=True, max_distance=max_distance, start=vertex)
 
         if len(route) > most_nodes:
             most_nodes = len(route)
@@ -175,3 +294,154 @@ def test_optimize(coordinates_google, closed, max_distance):
         assert len(route_0) == len(set(route_0))
         assert len(route_1) == len(set(route_1))
         assert distance <= max_distance
+
+
+@pytest.mark.parametrize("max_distance", [None, 300, 100000])
+def test_multi_start_nearest_neighbor_workers(coordinates_google, max_distance):
+    """Test the multi-start search returns the same route no matter how many processes run it.
+    """
+    distance_matrix = tsp.compute_euclidean_distance_matrix(coordinates_google)
+
+    results = [
+        tsp.multi_start_nearest_neighbor(distance_matrix, max_distance=max_distance, workers=workers, seed=42)
+        for workers in [1, 3]
+    ]
+    (tour, distance), (_tour, _distance) = results
+
+    assert distance == _distance
+    assert tour == _tour
+    if max_distance is not None:
+        assert distance <= max_distance
+
+
+def test_optimize_nearest_neighbors_shortest(coordinates_google):
+    """Test the multi-start nearest neighbors keeps the shortest route when no max distance is set.
+    """
+    distance_matrix = tsp.compute_euclidean_distance_matrix(coordinates_google)
+    tour, distance = tsp.multi_start_nearest_neighbor(distance_matrix, seed=42)
+
+    for vertex in range(len(coordinates_google)):
+        _, _distance = tsp.nearest_neighbor_path(distance_matrix, start=vertex, rng=tsp._start_rng(42, vertex))
+        assert distance <= _distance
+
+    route, _distance = tsp.optimize(coordinates_google, use_nearest_neighbors=True, improve=False)
+    assert len(route) == len(coordinates_google)
+    assert _distance == sum(distance_matrix[i, j] for i, j in route)
+
+    route, improved_distance = tsp.optimize(coordinates_google, use_nearest_neighbors=True)
+    assert len(route) == len(coordinates_google)
+    assert improved_distance == sum(distance_matrix[i, j] for i, j in route) < _distance
+
+
+def test_optimize_anytime(coordinates_google):
+    """Test the anytime search returns a route through every node within its time budget, with or without a matrix.
+    """
+    distance_matrix = tsp.compute_euclidean_distance_matrix(coordinates_google)
+    for matrix_free in [False, True]:
+        reported = []
+        route, distance = tsp.optimize(coordinates_google, anytime=True, max_seconds=1, matrix_free=matrix_free,
+                                       callback=lambda *best: reported.append(best))
+        assert sorted(i for i, _ in route) == list(range(len(coordinates_google)))
+        assert distance == sum(distance_matrix[i, j] for i, j in route) == reported[-1][1]
+
+
+def test_optimize_cache(tmp_path, coordinates_google):
+    """Test solving with a distance cache fills the cache once, with the matrix and the candidates.
+    """
+    cache = DistanceCache(tmp_path)
+    distance_matrix = tsp.compute_euclidean_distance_matrix(coordinates_google)
+    for _ in range(2):
+        route, distance = tsp.optimize(coordinates_google, use_nearest_neighbors=True, cache=cache)
+        assert sorted(i for i, _ in route) == list(range(len(coordinates_google)))
+        assert distance == sum(distance_matrix[i, j] for i, j in route)
+        assert len(list(tmp_path.iterdir())) == 2
+
+
+def test_optimize_seed(coordinates_google):
+    """Test the same seed gives the same route with every algorithm which finishes within its time budget.
+    """
+    grid = [(x, y) for x in range(6) for y in range(6)]
+    for options in [dict(use_nearest_neighbors=True, improve=False), dict(use_nearest_neighbors=True, starting_node=0),
+                    dict(max_distance=20), dict(max_seconds=5)]:
+        results = [tsp.optimize(grid, seed=7, **options) for _ in range(2)]
+        assert results[0] == results[1]
+
+
+def test_optimize_metric():
+    """Test the route and its distance are measured with the given metric.
+    """
+    cities = [(48.8566, 2.3522), (51.5074, -0.1278), (52.52, 13.405), (41.9028, 12.4964), (40.4168, -3.7038)]
+    distance_matrix = tsp.metric_distance_matrix(cities, 'haversine')
+    for options in [dict(use_nearest_neighbors=True), dict(max_seconds=5)]:
+        route, distance = tsp.optimize(cities, metric='haversine', dynamic_programming=False, **options)
+        assert sorted(i for i, _ in route) == list(range(len(cities)))
+        assert distance == sum(distance_matrix[i, j] for i, j in route)
+
+    with pytest.raises(ValueError):
+        tsp.optimize(cities, metric='unknown')
+    with pytest.raises(ValueError):
+        tsp.optimize(cities, metric='haversine', use_nearest_neighbors=True, matrix_free=True)
+
+
+def test_optimize_distance_matrix(distance_matrix_mip):
+    """Test a precomputed asymmetric matrix is solved as given, branch and cut finding the optimal directed route.
+    """
+    rng = np.random.default_rng(0)
+    asymmetric = np.asarray(distance_matrix_mip) + rng.integers(0, 50, size=np.shape(distance_matrix_mip))
+    np.fill_diagonal(asymmetric, 0)
+    optimal = tsp.branch_and_cut(asymmetric, formulation='mtz')[1]
+
+    route, distance = tsp.optimize(None, distance_matrix=asymmetric, max_seconds=10)
+    assert distance == optimal == sum(asymmetric[i, j] for i, j in route)
+
+    route, distance = tsp.optimize(None, distance_matrix=asymmetric, use_nearest_neighbors=True)
+    assert sorted(i for i, _ in route) == list(range(len(asymmetric)))
+    assert distance == sum(asymmetric[i, j] for i, j in route) >= optimal
+
+    with pytest.raises(ValueError):
+        tsp.optimize(None, distance_matrix=asymmetric, anytime=True)
+    with pytest.raises(ValueError):
+        tsp.optimize(None, distance_matrix=asymmetric[:-1])
+
+
+def test_optimize_sparse_distance_matrix():
+    """Test a sparse matrix restricts the route to its stored edges.
+    """
+    class Coo:
+        def __init__(self, row, col, data, n):
+            self.row, self.col, self.data, self.shape = np.asarray(row), np.asarray(col), np.asarray(data), (n, n)
+
+        def tocoo(self):
+            return self
+
+    # a ring of cheap edges plus expensive chords from each node to the fifth next one, no other edge being stored
+    n = 20
+    ring = [(i, (i + 1) % n) for i in range(n)] + [(i, (i + 5) % n) for i in range(n)]
+    rows, cols = zip(*(ring + [(j, i) for i, j in ring]))
+    costs = [10 if (j - i) % n in (1, n - 1) else 1000 for i, j in zip(rows, cols)]
+    sparse = Coo(rows, cols, costs, n)
+
+    for options in [dict(use_nearest_neighbors=True), dict(max_seconds=5)]:
+        route, distance = tsp.optimize(None, distance_matrix=sparse, **options)
+        assert all((i, j) in set(ring) or (j, i) in set(ring) for i, j in route)
+        # the optimal route goes around the ring
+        assert distance == 10 * n
+
+
+@pytest.mark.parametrize("construction", ["greedy", "mst"])
+def test_branch_and_cut_construction(distance_matrix_mip, construction):
+    """Test branch and cut starting from another construction finds the same optimal route.
+    """
+    assert tsp.branch_and_cut(distance_matrix_mip, construction=construction)[1] == tsp.branch_and_cut(distance_matrix_mip)[1]
+
+
+@pytest.mark.parametrize("construction", ["hilbert", "greedy", "mst"])
+def test_optimize_construction(coordinates_google, construction):
+    """Test every solver path accepts the construction heuristics.
+    """
+    distance_matrix = tsp.compute_euclidean_distance_matrix(coordinates_google)
+    for options in [dict(use_nearest_neighbors=True), dict(use_nearest_neighbors=True, improve=False, matrix_free=True),
+                    dict(anytime=True, max_seconds=0.5), dict(max_seconds=5)]:
+        route, distance = tsp.optimize(coordinates_google, construction=construction, seed=0, **options)
+        assert sorted(i for i, _ in route) == list(range(len(coordinates_google)))
+        assert distance == sum(distance_matrix[i, j] for i, j in route)